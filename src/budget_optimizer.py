@@ -0,0 +1,71 @@
+"""Split a fixed monthly budget across categories by preference weights."""
+import math
+
+import numpy as np
+
+# Furthest a rounded amount may move from its rounded-down value, in multiples of the largest step
+MAX_CHANGE = 2
+
+
+def water_fill(total, weights, lows, highs):
+    """Allocation maximizing sum(weight * log(amount)) with the amounts summing to ``total``.
+
+    Each amount is its weight times a common level, clipped to its
+    [low, high] range. The sum is piecewise linear in the level with kinks
+    where an amount reaches a bound, so the level is found exactly by
+    evaluating the sum at every kink and interpolating between the two
+    around ``total``. Raises ValueError if ``total`` is outside the sum of
+    the bounds.
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    lows = np.asarray(lows, dtype=np.float64)
+    highs = np.maximum(np.asarray(highs, dtype=np.float64), lows)
+    if total < lows.sum() - 1e-9 or total > highs.sum() + 1e-9:
+        raise ValueError(f"The budget must be between {lows.sum():,.0f} and {highs.sum():,.0f}")
+    # Categories with no weight stay at their minimum unless nothing else can take the money
+    free = weights > 0
+    if not free.any() or total > highs[free].sum() + lows[~free].sum():
+        weights = np.where(free, weights, 1e-12) if free.any() else np.ones_like(weights)
+        free = np.ones_like(free)
+    scaled = np.where(free, weights, 1.0)
+    kinks = np.unique(np.concatenate([[0.0], lows[free] / scaled[free], highs[free] / scaled[free]]))
+    sums = np.where(free, np.clip(kinks[:, None] * scaled, lows, highs), lows).sum(axis=1)
+    level = np.interp(total, sums, kinks)
+    return np.where(free, np.clip(level * scaled, lows, highs), lows)
+
+
+def allocate(total, weights, lows, highs, steps):
+    """Water-filled allocation rounded to each category's step.
+
+    Every amount starts rounded down and may then move, within its range,
+    by up to MAX_CHANGE times the largest step either way. A small dynamic
+    program over the leftover, counted in the greatest common divisor of
+    the steps (in cents), picks the moves whose amounts sum to ``total``
+    and stay closest (least squares) to the exact allocation. If no
+    combination hits ``total``, the closest one below it is used.
+    """
+    amounts = water_fill(total, weights, lows, highs)
+    lows = np.asarray(lows, dtype=np.float64)
+    highs = np.maximum(np.asarray(highs, dtype=np.float64), lows)
+    steps = np.asarray(steps, dtype=np.float64)
+    rounded = np.maximum(np.floor(amounts / steps) * steps, lows)
+    cents = np.rint(steps * 100).astype(np.int64)
+    unit = math.gcd(*cents.tolist()) / 100
+    step_units = (cents // math.gcd(*cents.tolist())).tolist()
+    target = int(np.floor((total - rounded.sum()) / unit + 1e-9))
+    reach = MAX_CHANGE * steps.max()
+    # Leftover units -> (squared change, moves so far), adding one category at a time
+    best = {0: (0.0, ())}
+    for i, step in enumerate(steps.tolist()):
+        down = int(min(reach, rounded[i] - lows[i]) / step + 1e-9)
+        up = int(min(reach, highs[i] - rounded[i]) / step + 1e-9)
+        options = [(k, k * step_units[i], (rounded[i] + k * step - amounts[i]) ** 2) for k in range(-down, up + 1)]
+        reached = {}
+        for offset, (cost, moves) in best.items():
+            for k, units, change in options:
+                candidate = (cost + change, moves + (k,))
+                if offset + units not in reached or candidate[0] < reached[offset + units][0]:
+                    reached[offset + units] = candidate
+        best = reached
+    closest = max(offset for offset in best if offset <= target)
+    return rounded + np.array(best[closest][1]) * steps
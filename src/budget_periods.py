@@ -0,0 +1,89 @@
+"""Budgets that repeat weekly, monthly or per semester, compared with spending."""
+from datetime import date, timedelta
+
+import numpy as np
+
+from category_tree import category_path
+from expense_ledger import shift_months
+
+# Length of each period as (days, months)
+BUDGET_PERIODS = {
+    "Weekly": (7, 0),
+    "Monthly": (0, 1),
+    "Semester": (0, 6),
+}
+
+
+def period_window(period, start, today):
+    """Inclusive (start, end) of the repetition of ``period`` from ``start`` that contains ``today``.
+
+    Returns None if the budget has not started yet.
+    """
+    if today < start:
+        return None
+    days, months = BUDGET_PERIODS[period]
+    if days:
+        window_start = start + timedelta(days=(today - start).days // days * days)
+        return window_start, window_start + timedelta(days=days - 1)
+    elapsed = (today.year - start.year) * 12 + today.month - start.month
+    count = elapsed // months
+    window_start = shift_months(start, count * months)
+    if window_start > today:
+        count -= 1
+        window_start = shift_months(start, count * months)
+    return window_start, shift_months(start, (count + 1) * months) - timedelta(days=1)
+
+
+def budget_vs_actual(ledger, budgets, today, currency=None):
+    """Spending in the current window of each budget.
+
+    ``budgets`` are dicts with ``category``, ``period``, ``amount`` and a
+    ``start`` date; spending on subcategories counts toward their parents.
+    The expenses spanning all windows are read with one date-index slice
+    and binned into a (day x category) grid whose cumulative sums give
+    every window's total by subtraction, so adding periods costs no extra
+    pass over the expenses. Budgets that have not started are left out.
+    """
+    active = []
+    for budget in budgets:
+        window = period_window(budget["period"], budget["start"], today)
+        if window is not None:
+            active.append(dict(budget, window_start=window[0], window_end=window[1]))
+    if not active:
+        return []
+
+    first = min(budget["window_start"] for budget in active)
+    last = max(budget["window_end"] for budget in active)
+    days = (last - first).days + 1
+    categories = max(len(ledger.categories), 1)
+    rows = ledger.rows_between(first, last)
+    amounts = ledger.amounts if currency is None else ledger.converted_amounts(currency)
+    day = ledger.dates[rows].astype(np.int64) - first.toordinal()
+    grid = np.bincount(
+        day * categories + ledger.category_codes[rows], weights=amounts[rows], minlength=days * categories
+    ).reshape(days, categories)
+    cumulative = np.zeros((days + 1, categories))
+    np.cumsum(grid, axis=0, out=cumulative[1:])
+
+    starts = np.array([(budget["window_start"] - first).days for budget in active])
+    ends = np.array([(budget["window_end"] - first).days + 1 for budget in active])
+    window_totals = cumulative[ends] - cumulative[starts]
+    # Which ledger categories fall under each budget's category
+    paths = [category_path(category) for category in ledger.categories]
+    members = np.array([[budget["category"] in path for path in paths] + [False] * (categories - len(paths))
+                        for budget in active])
+    spent = (window_totals * members).sum(axis=1)
+    for budget, amount in zip(active, spent.tolist()):
+        budget["spent"] = amount
+    return active
+
+
+def default_start(period, today, course_start=None):
+    """Start date a new budget of ``period`` repeats from"""
+    if period == "Weekly":
+        return today - timedelta(days=today.weekday())
+    if period == "Semester" and course_start is not None:
+        return course_start
+    if period == "Semester":
+        return date(today.year, 1 if today.month <= 6 else 7, 1)
+    return today.replace(day=1)
@@ -0,0 +1,76 @@
+"""Monte Carlo simulation of monthly and yearly living costs."""
+from functools import lru_cache
+
+import numpy as np
+
+SIMULATION_SAMPLES = 100_000
+# Typical month-to-month variation of each calculator category, as a fraction of its amount
+DEFAULT_VOLATILITY = {
+    "rent": 0.02,
+    "food": 0.15,
+    "transport": 0.2,
+    "utilities": 0.2,
+    "entertainment": 0.35,
+    "other": 0.3,
+}
+# Chance per month of a one-off expense such as a medical bill or a flight home
+DEFAULT_SHOCK_PROBABILITY = 0.05
+# The emergency fund covers this many months of costs at this percentile
+EMERGENCY_MONTHS = 3
+EMERGENCY_PERCENTILE = 95
+PERCENTILES = (10, 50, 90)
+
+
+@lru_cache(maxsize=16)
+def simulate_costs(costs, shock_probability, shock_size, samples=SIMULATION_SAMPLES, seed=0):
+    """Simulate a year of costs ``samples`` times.
+
+    ``costs`` is a tuple of (monthly amount, volatility) per category; each
+    month every category is drawn from a lognormal distribution with that
+    mean and relative spread, and a one-off ``shock_size`` expense occurs
+    with ``shock_probability``. All samples of a month are drawn as one
+    array. Results are cached by the inputs, so revisiting settings costs
+    nothing. Returns a dict with sorted (read-only) ``monthly`` and
+    ``yearly`` totals, the ``emergency_fund`` and per-category
+    ``category_ranges`` at PERCENTILES.
+    """
+    rng = np.random.default_rng(seed)
+    amounts = np.array([amount for amount, _ in costs], dtype=np.float64)
+    volatility = np.array([spread for _, spread in costs], dtype=np.float64)
+    sigma = np.sqrt(np.log1p(volatility ** 2))
+    # Choose mu so each category's mean equals its amount
+    mu = (np.log(np.maximum(amounts, 1e-9)) - sigma ** 2 / 2).astype(np.float32)
+    sigma = sigma.astype(np.float32)
+    present = amounts > 0
+
+    yearly = np.zeros(samples)
+    for month in range(12):
+        noise = rng.standard_normal((samples, len(amounts)), dtype=np.float32)
+        draws = np.where(present, np.exp(mu + sigma * noise), np.float32(0))
+        month_total = draws.sum(axis=1, dtype=np.float64) + shock_size * (rng.random(samples) < shock_probability)
+        if month == 0:
+            monthly = month_total
+            category_ranges = np.percentile(draws, PERCENTILES, axis=0).T
+        yearly += month_total
+        if month == EMERGENCY_MONTHS - 1:
+            emergency_fund = float(np.percentile(yearly, EMERGENCY_PERCENTILE))
+
+    result = {
+        "monthly": np.sort(monthly),
+        "yearly": np.sort(yearly),
+        "emergency_fund": emergency_fund,
+        "category_ranges": category_ranges,
+    }
+    for array in (result["monthly"], result["yearly"], result["category_ranges"]):
+        array.flags.writeable = False
+    return result
+
+
+def percentiles(sorted_totals):
+    """P10, P50 and P90 of sorted simulated totals"""
+    return np.percentile(sorted_totals, PERCENTILES)
+
+
+def exceed_probability(sorted_totals, budget):
+    """Share of simulated totals above ``budget``"""
+    return 1 - np.searchsorted(sorted_totals, budget, side="right") / len(sorted_totals)
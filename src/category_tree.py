@@ -0,0 +1,89 @@
+"""Nested expense categories such as "Food > Groceries" and their rollups."""
+from collections import defaultdict
+from functools import lru_cache
+
+CATEGORY_SEPARATOR = " > "
+
+
+@lru_cache(maxsize=4096)
+def category_path(category):
+    """A category and its ancestors, outermost first: "A > B" -> ("A", "A > B")"""
+    parts = [part.strip() for part in category.split(">") if part.strip()]
+    return tuple(CATEGORY_SEPARATOR.join(parts[:i]) for i in range(1, len(parts) + 1))
+
+
+def normalize_category(name):
+    """Canonical spelling of a category path, with single " > " separators"""
+    path = category_path(name or "")
+    return path[-1] if path else ""
+
+
+def parent_category(category):
+    """Parent of a category path, or "" for a top-level category"""
+    path = category_path(category)
+    return path[-2] if len(path) > 1 else ""
+
+
+def category_label(category):
+    """Last component of a category path"""
+    return category.rsplit(CATEGORY_SEPARATOR, 1)[-1]
+
+
+def rollup(amounts):
+    """Subtree totals of a category -> amount dict: each category's own amount plus its descendants'"""
+    totals = defaultdict(float)
+    for category, amount in amounts.items():
+        for node in category_path(category):
+            totals[node] += amount
+    return dict(totals)
+
+
+def budget_total(budget):
+    """Total of a budget with nested categories.
+
+    A category budgeted under a budgeted ancestor is a share of that
+    ancestor's allocation, so only the outermost budgeted categories count.
+    """
+    return sum(
+        amount for category, amount in budget.items()
+        if not any(ancestor in budget for ancestor in category_path(category)[:-1])
+    )
+
+
+class CategoryTree:
+    """Parent/child index over a set of category paths, in first-seen order.
+
+    Ancestors missing from the input (e.g. "Food" for "Food > Groceries")
+    are added, so every path hangs off a root.
+    """
+
+    def __init__(self, categories):
+        self.roots = []
+        self.children = defaultdict(list)
+        seen = set()
+        for category in categories:
+            path = category_path(category)
+            for depth, node in enumerate(path):
+                if node in seen:
+                    continue
+                seen.add(node)
+                (self.children[path[depth - 1]] if depth else self.roots).append(node)
+
+    def walk(self, nodes=None, depth=0):
+        """Yield (category, depth) depth-first"""
+        for node in self.roots if nodes is None else nodes:
+            yield node, depth
+            yield from self.walk(self.children.get(node, ()), depth + 1)
+
+    def budgets(self, budget):
+        """Allocation of every node: its own budget, or else the sum of its children's"""
+        allocations = {}
+
+        def visit(node):
+            below = sum(visit(child) for child in self.children.get(node, ()))
+            allocations[node] = budget.get(node, below)
+            return allocations[node]
+
+        for root in self.roots:
+            visit(root)
+        return allocations
@@ -0,0 +1,139 @@
+"""City-level cost-of-living estimates read once from a versioned data file."""
+import json
+import threading
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+
+from exchange_rates import get_exchange_rates, DEFAULT_CURRENCY
+
+COST_OF_LIVING_FILE = Path(__file__).parent / "data" / "cost_of_living.json"
+COST_OF_LIVING_FORMAT = "studyabroad-cost-of-living"
+SCHEMA_VERSION = 1
+
+
+class CostOfLivingError(Exception):
+    """Raised when the cost-of-living file is missing or malformed."""
+
+
+class CostOfLiving:
+    """Monthly costs held as one (city, lifestyle, category) array.
+
+    The file lists each city with its country and, per lifestyle, one cost
+    per category in the country's currency. Lookups return array views and
+    per-country questions are masks over the city axis, so nothing walks
+    nested dicts after loading. Copies converted to a common currency are
+    made in one pass and cached until the exchange rates change.
+    """
+
+    def __init__(self, path=COST_OF_LIVING_FILE):
+        try:
+            with Path(path).open(encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            raise CostOfLivingError(f"Could not read {path}: {e}")
+        if data.get("format") != COST_OF_LIVING_FORMAT or data.get("schema_version") != SCHEMA_VERSION:
+            raise CostOfLivingError(f"{path} is not a version {SCHEMA_VERSION} cost-of-living file")
+        self.data_version = data.get("data_version")
+        self.lifestyles = list(data["lifestyles"])
+        self.categories = list(data["categories"])
+        cities = data["cities"]
+        self.cities = [entry["city"] for entry in cities]
+        self.countries = list(dict.fromkeys(entry["country"] for entry in cities))
+        country_codes = {country: i for i, country in enumerate(self.countries)}
+        self.country_codes = np.array([country_codes[entry["country"]] for entry in cities], dtype=np.int16)
+        currencies = data.get("currencies", {})
+        self.country_currencies = [currencies.get(country, DEFAULT_CURRENCY) for country in self.countries]
+        try:
+            self.costs = np.array(
+                [[entry["costs"][lifestyle] for lifestyle in self.lifestyles] for entry in cities], dtype=np.float64
+            ).reshape(len(cities), len(self.lifestyles), len(self.categories))
+        except (KeyError, ValueError) as e:
+            raise CostOfLivingError(f"Malformed costs in {path}: {e}")
+        # Monthly total per (city, lifestyle)
+        self.totals = self.costs.sum(axis=2)
+        self._index = {(entry["country"], entry["city"]): i for i, entry in enumerate(cities)}
+        # Target currency -> (cache key, converted costs, converted totals)
+        self._converted = {}
+        self._lock = threading.Lock()
+
+    def city_index(self, country, city):
+        """Row of a city, or None if it is not in the data"""
+        return self._index.get((country, city))
+
+    def cities_in(self, country):
+        """Rows of a country's cities, in file order"""
+        return np.flatnonzero(self.country_codes == self.countries.index(country))
+
+    def city_costs(self, row, lifestyle):
+        """Category costs of one city and lifestyle, as a category -> amount dict"""
+        return dict(zip(self.categories, self.costs[row, self.lifestyles.index(lifestyle)].tolist()))
+
+    def converted(self, currency, day=None):
+        """(costs, totals) converted to ``currency`` at the rates in effect on ``day``.
+
+        The whole (city, lifestyle, category) array is converted with one
+        exchange-rate lookup per element and cached per currency and day
+        until the rates file changes.
+        """
+        rates = get_exchange_rates()
+        day = day or date.today()
+        key = (rates.version, day)
+        cached = self._converted.get(currency)
+        if cached is not None and cached[0] == key:
+            return cached[1], cached[2]
+        with self._lock:
+            per_city = self.costs[0].size
+            costs = rates.convert(
+                self.costs.ravel(),
+                np.repeat(self.country_codes, per_city),
+                self.country_currencies,
+                np.full(self.costs.size, day.toordinal(), dtype=np.int32),
+                currency,
+            ).reshape(self.costs.shape)
+            costs.flags.writeable = False
+            totals = costs.sum(axis=2)
+            totals.flags.writeable = False
+            self._converted[currency] = (key, costs, totals)
+        return costs, totals
+
+    def country_medians(self, lifestyle, currency=None):
+        """Median monthly total of each country's cities for a lifestyle, in ``countries`` order"""
+        totals = self.totals if currency is None else self.converted(currency)[1]
+        totals = totals[:, self.lifestyles.index(lifestyle)]
+        return np.array([np.median(totals[self.country_codes == code]) for code in range(len(self.countries))])
+
+    def compare(self, lifestyle, currency, max_total=None, countries=None, sort_by=None, top=None):
+        """Rows of the cities matching the filters, cheapest first.
+
+        ``sort_by`` is a category to order by instead of the monthly total.
+        Returns (rows, costs per category, totals) for those rows, all
+        computed as masks and slices of the converted array.
+        """
+        costs, totals = self.converted(currency)
+        lifestyle_index = self.lifestyles.index(lifestyle)
+        costs, totals = costs[:, lifestyle_index], totals[:, lifestyle_index]
+        keep = np.ones(len(self.cities), dtype=bool)
+        if max_total:
+            keep &= totals <= max_total
+        if countries:
+            keep &= np.isin(self.country_codes, [self.countries.index(country) for country in countries])
+        rows = np.flatnonzero(keep)
+        sort_key = totals if sort_by is None else costs[:, self.categories.index(sort_by)]
+        rows = rows[np.argsort(sort_key[rows], kind="stable")][:top]
+        return rows, costs[rows], totals[rows]
+
+
+_cost_of_living = None
+_cost_of_living_lock = threading.Lock()
+
+
+def get_cost_of_living():
+    """Return the process-wide cost-of-living table"""
+    global _cost_of_living
+    if _cost_of_living is None:
+        with _cost_of_living_lock:
+            if _cost_of_living is None:
+                _cost_of_living = CostOfLiving()
+    return _cost_of_living
@@ -0,0 +1,46 @@
+"""Month-by-month cost of a whole study program under inflation and exchange-rate drift."""
+from functools import lru_cache
+
+import numpy as np
+
+# Scenario -> how many spreads its rates sit above the expected ones
+SCENARIOS = {"Optimistic": -1, "Expected": 0, "Pessimistic": 1}
+# Yearly spread of the price and exchange rates between scenarios
+INFLATION_SPREAD = 0.01
+FX_SPREAD = 0.03
+
+
+def _yearly_steps(rate, shifts, months):
+    """Growth factor applied at the start of each program year after the first, per scenario"""
+    new_year = (np.arange(months) % 12 == 0) & (np.arange(months) > 0)
+    return np.where(new_year, np.maximum(1 + rate + shifts * INFLATION_SPREAD, 0), 1.0)
+
+
+@lru_cache(maxsize=32)
+def project_costs(rent, living, tuition, months, inflation, rent_increase, tuition_increase, fx_rate, fx_drift):
+    """Costs of every month of a program, one row per scenario in SCENARIOS.
+
+    ``rent`` and ``living`` are the first month's costs and ``tuition`` the
+    first year's fees, paid at the start of each program year, all in the
+    local currency. Living costs rise every month with ``inflation``, rent
+    and tuition once a year; ``fx_rate`` converts local to home currency and
+    moves by ``fx_drift`` a year. Every growth path is one cumulative product
+    along the month axis for all scenarios at once. Returns a dict of
+    read-only (scenario, month) arrays: ``local`` and ``home`` monthly costs
+    and the ``cumulative`` home-currency funding needed by each month's end.
+    """
+    shifts = np.array(list(SCENARIOS.values()), dtype=np.float64)[:, None]
+    month = np.arange(months)
+    monthly_inflation = np.maximum(1 + inflation + shifts * INFLATION_SPREAD, 0) ** (1 / 12)
+    prices = np.cumprod(np.where(month > 0, monthly_inflation, 1.0), axis=1)
+    rents = rent * np.cumprod(_yearly_steps(rent_increase, shifts, months), axis=1)
+    fees = np.where(month % 12 == 0, tuition * np.cumprod(_yearly_steps(tuition_increase, shifts, months), axis=1), 0)
+    monthly_drift = np.maximum(1 + fx_drift + shifts * FX_SPREAD, 0) ** (1 / 12)
+    fx = fx_rate * np.cumprod(np.where(month > 0, monthly_drift, 1.0), axis=1)
+
+    local = living * prices + rents + fees
+    home = local * fx
+    result = {"local": local, "home": home, "cumulative": np.cumsum(home, axis=1)}
+    for array in result.values():
+        array.flags.writeable = False
+    return result
@@ -0,0 +1,184 @@
+"""Chunked export of user data as CSV, JSONL or Parquet."""
+import csv
+import io
+import json
+import zlib
+
+from data_store import get_data_store, COLLECTIONS
+
+EXPORT_CHUNK_ROWS = 10000
+EXPORT_DATASETS = [
+    "expenses", "visa_documents", "visa_timeline", "community_posts", "job_applications", "recurring_rules",
+    "budget_periods", "expense_groups", "shared_expenses",
+]
+EXPORT_FORMATS = {"csv": "text/csv", "jsonl": "application/x-ndjson", "parquet": "application/vnd.apache.parquet"}
+# st.download_button keeps the whole file in memory and sends it in one message,
+# so exports are capped below Streamlit's default 200 MB message size
+EXPORT_MAX_BYTES = 150 * 1024 * 1024
+
+# Community posts live in session state, so their column types are listed here
+COMMUNITY_POST_COLUMNS = {
+    "id": "INTEGER",
+    "title": "TEXT",
+    "content": "TEXT",
+    "author": "TEXT",
+    "category": "TEXT",
+    "timestamp": "TEXT",
+    "likes": "INTEGER",
+    "replies": "INTEGER",
+    "tags": "TEXT",
+}
+
+
+def parquet_available():
+    """Return True if pyarrow is installed for Parquet export"""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def dataset_types(dataset):
+    """SQLite column types of a dataset, in export order"""
+    if dataset == "community_posts":
+        return COMMUNITY_POST_COLUMNS
+    return {"id": "INTEGER", **COLLECTIONS[dataset]}
+
+
+def dataset_columns(dataset):
+    """Column order used when exporting a dataset"""
+    return list(dataset_types(dataset))
+
+
+def parquet_schema(dataset):
+    """Arrow schema of a dataset, so columns that are empty in the first chunk keep their type"""
+    import pyarrow as pa
+
+    arrow_types = {"INTEGER": pa.int64(), "REAL": pa.float64(), "TEXT": pa.string()}
+    return pa.schema([(col, arrow_types[col_type]) for col, col_type in dataset_types(dataset).items()])
+
+
+def iter_record_chunks(username, dataset, community_posts=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Yield a dataset's records in lists of at most ``chunk_rows``"""
+    if dataset == "community_posts":
+        # Only the user's own posts, with tags flattened to a single column
+        posts = [post for post in community_posts or [] if post.get("author") == username]
+        for start in range(0, len(posts), chunk_rows):
+            yield [dict(post, tags=", ".join(post.get("tags", []))) for post in posts[start:start + chunk_rows]]
+        return
+    yield from get_data_store().iter_chunks(username, dataset, chunk_rows)
+
+
+def csv_chunks(chunks, columns):
+    """Encode record chunks as CSV, header first"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore", lineterminator="\n")
+    writer.writeheader()
+    for records in chunks:
+        writer.writerows(records)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate(0)
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def jsonl_chunks(chunks, columns):
+    """Encode record chunks as JSON lines"""
+    for records in chunks:
+        lines = (json.dumps({col: record.get(col) for col in columns}, default=str) for record in records)
+        yield ("\n".join(lines) + "\n").encode()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only stream that hands written bytes back to a generator"""
+
+    def __init__(self):
+        self._parts = []
+        self._written = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._written += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._written
+
+    def drain(self):
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+
+def parquet_chunks(chunks, schema):
+    """Encode record chunks as a Parquet file with one row group per chunk"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    for records in chunks:
+        table = pa.Table.from_pylist([{col: record.get(col) for col in schema.names} for record in records], schema)
+        # One row group per chunk keeps the writer's buffers small
+        writer.write_table(table)
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def gzip_chunks(chunks):
+    """Compress a byte stream chunk by chunk into gzip format"""
+    compressor = zlib.compressobj(wbits=31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def stream_export(username, dataset, file_format="csv", compress=False, community_posts=None,
+                  chunk_rows=EXPORT_CHUNK_ROWS):
+    """Yield an export of one dataset as bytes, never holding more than one chunk"""
+    columns = dataset_columns(dataset)
+    chunks = iter_record_chunks(username, dataset, community_posts, chunk_rows)
+    if file_format == "csv":
+        output = csv_chunks(chunks, columns)
+    elif file_format == "jsonl":
+        output = jsonl_chunks(chunks, columns)
+    elif file_format == "parquet":
+        output = parquet_chunks(chunks, parquet_schema(dataset))
+    else:
+        raise ValueError(f"Unsupported export format: {file_format}")
+    return gzip_chunks(output) if compress else output
+
+
+class ExportTooLargeError(Exception):
+    """Raised when an export would not fit in a single download."""
+
+
+def collect_export(chunks, max_bytes=EXPORT_MAX_BYTES):
+    """Join export chunks into the bytes st.download_button needs.
+
+    Chunks are only streamed from the database; the download itself is held
+    in memory, so exports over ``max_bytes`` raise ExportTooLargeError.
+    """
+    parts = []
+    size = 0
+    for chunk in chunks:
+        size += len(chunk)
+        if size > max_bytes:
+            raise ExportTooLargeError(
+                f"This export is over {max_bytes // (1024 * 1024)} MB. Try gzip compression or Parquet."
+            )
+        parts.append(chunk)
+    return b"".join(parts)
+
+
+def export_filename(dataset, file_format, compress=False):
+    """File name for a downloaded export"""
+    return f"{dataset}.{file_format}" + (".gz" if compress else "")
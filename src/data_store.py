@@ -0,0 +1,420 @@
+"""Per-user persistence for expenses, budgets, visa items and job applications."""
+import threading
+from pathlib import Path
+
+from utils import sqlite_connection
+
+DATA_DB = Path(__file__).parent / "app_data.db"
+
+# Collection name -> column definitions stored alongside id and username
+COLLECTIONS = {
+    "expenses": {
+        "date": "TEXT",
+        "category": "TEXT",
+        "amount": "REAL",
+        "description": "TEXT",
+        "currency": "TEXT",
+        # 1 when the category was filled in by an import rather than chosen by the user
+        "auto_category": "INTEGER",
+    },
+    "visa_documents": {"name": "TEXT", "status": "TEXT", "deadline": "TEXT", "priority": "TEXT"},
+    "visa_timeline": {"step": "TEXT", "status": "TEXT", "date": "TEXT"},
+    "job_applications": {
+        "job_id": "INTEGER",
+        "job_title": "TEXT",
+        "company": "TEXT",
+        "applied_date": "TEXT",
+        "status": "TEXT",
+    },
+    "recurring_rules": {
+        "description": "TEXT",
+        "category": "TEXT",
+        "amount": "REAL",
+        "currency": "TEXT",
+        "frequency": "TEXT",
+        "anchor_day": "INTEGER",
+        "next_date": "TEXT",
+    },
+    # Budgets that repeat weekly, monthly or per semester from a start date
+    "budget_periods": {"category": "TEXT", "period": "TEXT", "amount": "REAL", "start_date": "TEXT"},
+    # Shared expense groups; members is a JSON list of names
+    "expense_groups": {"name": "TEXT", "members": "TEXT", "currency": "TEXT"},
+    # split is a JSON object of member -> weight
+    "shared_expenses": {
+        "group_id": "INTEGER",
+        "date": "TEXT",
+        "description": "TEXT",
+        "amount": "REAL",
+        "paid_by": "TEXT",
+        "split": "TEXT",
+    },
+}
+
+# Store-wide revision of the last write to a row
+REV_COLUMN = "rev INTEGER NOT NULL DEFAULT 0"
+
+# Session state keys that hold data belonging to the logged-in user
+USER_SESSION_KEYS = list(COLLECTIONS) + ["budget"]
+
+
+class RestoreConflictError(Exception):
+    """Raised when restored records collide with another user's rows."""
+
+
+class UserDataStore:
+    """SQLite store keyed by username with one row per record.
+
+    Each page loads only the collections it shows, and every add, update or
+    delete touches a single row instead of re-serializing the whole list.
+    """
+
+    SCHEMA_VERSION = 2
+
+    def __init__(self, db_path=DATA_DB):
+        self.db_path = db_path
+        self._init_schema()
+
+    def _connection(self):
+        return sqlite_connection(self.db_path)
+
+    def _init_schema(self):
+        conn = self._connection()
+        with conn:
+            for name, columns in COLLECTIONS.items():
+                table_sql = conn.execute(
+                    "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+                ).fetchone()
+                if table_sql is not None and "AUTOINCREMENT" not in table_sql[0].upper():
+                    self._add_autoincrement(conn, name, columns)
+                conn.execute(self._create_table_sql(name, columns))
+                conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{name}_username ON {name} (username)")
+                # Columns added to COLLECTIONS after a table was created
+                existing = {row[1] for row in conn.execute(f"PRAGMA table_info({name})")}
+                for col, col_type in columns.items():
+                    if col not in existing:
+                        conn.execute(f"ALTER TABLE {name} ADD COLUMN {col} {col_type}")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS budgets ("
+                f"username TEXT NOT NULL, category TEXT NOT NULL, amount REAL NOT NULL, {REV_COLUMN}, "
+                "PRIMARY KEY (username, category))"
+            )
+            # Checked on every start, not only on the v2 upgrade, so tables
+            # created from COLLECTIONS after that upgrade get revisions too
+            for table in list(COLLECTIONS) + ["budgets"]:
+                existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+                if "rev" not in existing:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN {REV_COLUMN}")
+                conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_rev ON {table} (username, rev)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS seeded ("
+                "username TEXT NOT NULL, collection TEXT NOT NULL, "
+                "PRIMARY KEY (username, collection))"
+            )
+        if conn.execute("PRAGMA user_version").fetchone()[0] < 2:
+            self._add_revisions(conn)
+
+    @staticmethod
+    def _create_table_sql(name, columns):
+        # AUTOINCREMENT so a deleted id is never handed to a later insert;
+        # snapshots and restores identify rows by id alone
+        column_sql = ", ".join(f"{col} {col_type}" for col, col_type in columns.items())
+        return (
+            f"CREATE TABLE IF NOT EXISTS {name} ("
+            f"id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT NOT NULL, {column_sql}, {REV_COLUMN})"
+        )
+
+    def _add_autoincrement(self, conn, name, columns):
+        """Rebuild a table created before ids were AUTOINCREMENT, keeping its rows and ids"""
+        if not conn.in_transaction:
+            conn.execute("BEGIN")
+        old_columns = [row[1] for row in conn.execute(f"PRAGMA table_info({name})")]
+        conn.execute(f"ALTER TABLE {name} RENAME TO {name}_rebuild")
+        conn.execute(self._create_table_sql(name, columns))
+        new_columns = {row[1] for row in conn.execute(f"PRAGMA table_info({name})")}
+        kept = ", ".join(col for col in old_columns if col in new_columns)
+        conn.execute(f"INSERT INTO {name} ({kept}) SELECT {kept} FROM {name}_rebuild")
+        conn.execute(f"DROP TABLE {name}_rebuild")
+        # Don't reissue ids that were deleted from the top of the table before the rebuild
+        highest = conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {name}").fetchone()[0]
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'tombstones'").fetchone():
+            highest = max(highest, conn.execute(
+                "SELECT COALESCE(MAX(record_id), 0) FROM tombstones WHERE collection = ?", (name,)
+            ).fetchone()[0])
+        conn.execute("DELETE FROM sqlite_sequence WHERE name = ?", (name,))
+        conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)", (name, highest))
+
+    def _add_revisions(self, conn):
+        """Schema v2: stamp every write with a revision so changes can be found later.
+
+        The ``rev`` columns themselves are added by ``_init_schema``.
+        """
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS tombstones ("
+                "username TEXT NOT NULL, collection TEXT NOT NULL, record_id INTEGER NOT NULL, "
+                "rev INTEGER NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_tombstones_rev ON tombstones (username, rev)")
+            conn.execute("CREATE TABLE IF NOT EXISTS revision (value INTEGER NOT NULL)")
+            if conn.execute("SELECT COUNT(*) FROM revision").fetchone()[0] == 0:
+                conn.execute("INSERT INTO revision (value) VALUES (0)")
+            conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+
+    def _next_rev(self, conn):
+        """Bump and return the store-wide revision inside a write transaction"""
+        conn.execute("UPDATE revision SET value = value + 1")
+        return conn.execute("SELECT value FROM revision").fetchone()[0]
+
+    def current_rev(self):
+        """Latest revision written to the store"""
+        return self._connection().execute("SELECT value FROM revision").fetchone()[0]
+
+    def _is_seeded(self, username, collection):
+        row = self._connection().execute(
+            "SELECT 1 FROM seeded WHERE username = ? AND collection = ?", (username, collection)
+        ).fetchone()
+        return row is not None
+
+    def _mark_seeded(self, conn, username, collection):
+        conn.execute(
+            "INSERT OR IGNORE INTO seeded (username, collection) VALUES (?, ?)", (username, collection)
+        )
+
+    def ensure_seeded(self, username, collection, default):
+        """Insert ``default`` records the first time a user opens a collection"""
+        if self._is_seeded(username, collection):
+            return None
+        has_rows = self._connection().execute(
+            f"SELECT 1 FROM {collection} WHERE username = ? LIMIT 1", (username,)
+        ).fetchone()
+        if has_rows:
+            with self._connection() as conn:
+                self._mark_seeded(conn, username, collection)
+            return None
+        records = [dict(record) for record in default]
+        for record, record_id in zip(records, self.add_many(username, collection, records)):
+            record["id"] = record_id
+        return records
+
+    def load(self, username, collection, default=None):
+        """Load a user's records, seeding them with ``default`` on first use"""
+        if default is not None:
+            seeded = self.ensure_seeded(username, collection, default)
+            if seeded is not None:
+                return seeded
+        columns = ", ".join(COLLECTIONS[collection])
+        rows = self._connection().execute(
+            f"SELECT id, {columns} FROM {collection} WHERE username = ? ORDER BY id", (username,)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def load_columns(self, username, collection):
+        """Load a user's records as a dict of column lists, ``id`` included"""
+        columns = ["id"] + list(COLLECTIONS[collection])
+        cursor = self._connection().execute(
+            f"SELECT {', '.join(columns)} FROM {collection} WHERE username = ? ORDER BY id", (username,)
+        )
+        cursor.row_factory = None
+        values = list(zip(*cursor.fetchall())) or [()] * len(columns)
+        return {col: list(vals) for col, vals in zip(columns, values)}
+
+    def iter_chunks(self, username, collection, chunk_rows=10000):
+        """Yield a user's records as lists of dicts, ``chunk_rows`` at a time"""
+        return self.iter_changes(username, collection, -1, chunk_rows)
+
+    def add(self, username, collection, record):
+        """Insert one record and return its id"""
+        return self.add_many(username, collection, [record])[0]
+
+    def add_many(self, username, collection, records):
+        """Insert records in a single transaction and return their ids"""
+        return self.add_and_update(username, collection, records, ())
+
+    def add_and_update(self, username, collection, records, updates):
+        """Insert records and apply ``updates`` in one transaction. Returns the new ids.
+
+        ``updates`` yields ``(collection, record_id, fields)`` tuples, so
+        e.g. posted expenses and the rules that produced them are written
+        together or not at all.
+        """
+        conn = self._connection()
+        with conn:
+            ids = self._insert(conn, username, collection, records)
+            for other, record_id, fields in updates:
+                self._update(conn, username, other, record_id, fields)
+        return ids
+
+    def _insert(self, conn, username, collection, records):
+        columns = list(COLLECTIONS[collection])
+        sql = (
+            f"INSERT INTO {collection} (username, rev, {', '.join(columns)}) "
+            f"VALUES (?, ?, {', '.join('?' for _ in columns)})"
+        )
+        rev = self._next_rev(conn)
+        conn.executemany(sql, ([username, rev] + [record.get(col) for col in columns] for record in records))
+        # Rows inserted in one write transaction get consecutive rowids
+        last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+        self._mark_seeded(conn, username, collection)
+        return list(range(last_id - len(records) + 1, last_id + 1)) if records else []
+
+    def update(self, username, collection, record_id, **fields):
+        """Update selected fields of one record"""
+        conn = self._connection()
+        with conn:
+            self._update(conn, username, collection, record_id, fields)
+
+    def _update(self, conn, username, collection, record_id, fields):
+        columns = [col for col in fields if col in COLLECTIONS[collection]]
+        if not columns:
+            return
+        assignments = ", ".join(f"{col} = ?" for col in columns)
+        conn.execute(
+            f"UPDATE {collection} SET {assignments}, rev = ? WHERE id = ? AND username = ?",
+            [fields[col] for col in columns] + [self._next_rev(conn), record_id, username],
+        )
+
+    def delete(self, username, collection, record_id):
+        """Delete one record"""
+        conn = self._connection()
+        with conn:
+            self._delete_where(conn, username, collection, "id = ?", (record_id,))
+
+    def delete_matching(self, username, collection, column, value):
+        """Delete every record of a user whose ``column`` equals ``value``"""
+        if column not in COLLECTIONS[collection]:
+            raise ValueError(f"Unknown column {column!r} for {collection}")
+        conn = self._connection()
+        with conn:
+            self._delete_where(conn, username, collection, f"{column} = ?", (value,))
+
+    def _delete_where(self, conn, username, collection, condition, params=()):
+        """Delete a user's rows matching ``condition`` and leave tombstones for them"""
+        rev = self._next_rev(conn)
+        conn.execute(
+            f"INSERT INTO tombstones (username, collection, record_id, rev) "
+            f"SELECT username, ?, id, ? FROM {collection} WHERE username = ? AND {condition}",
+            (collection, rev, username) + tuple(params),
+        )
+        conn.execute(f"DELETE FROM {collection} WHERE username = ? AND {condition}", (username,) + tuple(params))
+
+    def replace_all(self, username, collection, records):
+        """Replace all of a user's records in a collection, e.g. when restoring a backup"""
+        conn = self._connection()
+        with conn:
+            self._delete_where(conn, username, collection, "1")
+        return self.add_many(username, collection, records)
+
+    def iter_changes(self, username, collection, since_rev=0, chunk_rows=10000):
+        """Yield chunks of records written after ``since_rev``"""
+        columns = ["id"] + list(COLLECTIONS[collection])
+        cursor = self._connection().execute(
+            f"SELECT {', '.join(columns)} FROM {collection} "
+            f"WHERE username = ? AND rev > ? ORDER BY id",
+            (username, since_rev),
+        )
+        while True:
+            rows = cursor.fetchmany(chunk_rows)
+            if not rows:
+                break
+            yield [dict(row) for row in rows]
+
+    def deleted_since(self, username, since_rev):
+        """Return (collection, record_id) pairs deleted after ``since_rev``"""
+        return self._connection().execute(
+            "SELECT collection, record_id FROM tombstones WHERE username = ? AND rev > ? ORDER BY rev",
+            (username, since_rev),
+        ).fetchall()
+
+    def budget_changed_since(self, username, since_rev):
+        """Return True if the user's budget was written after ``since_rev``"""
+        row = self._connection().execute(
+            "SELECT 1 FROM budgets WHERE username = ? AND rev > ? LIMIT 1", (username, since_rev)
+        ).fetchone()
+        return row is not None
+
+    def prune_tombstones(self, username, up_to_rev):
+        """Drop tombstones a snapshot at ``up_to_rev`` already accounts for"""
+        with self._connection() as conn:
+            conn.execute("DELETE FROM tombstones WHERE username = ? AND rev <= ?", (username, up_to_rev))
+
+    def apply_changes(self, username, operations, reset=False):
+        """Apply restore operations in a single transaction.
+
+        ``operations`` yields ``(collection, op, payload)`` tuples where op is
+        "upsert" (payload is a list of records with ids), "delete" (payload
+        is a record id) or "budget" (payload is a budget dict). Restored rows
+        are stamped with revision 0 because the snapshots already hold them.
+        If any operation raises, nothing is written; RestoreConflictError is
+        raised if a record's id belongs to another user.
+        """
+        conn = self._connection()
+        with conn:
+            if reset:
+                for collection in COLLECTIONS:
+                    conn.execute(f"DELETE FROM {collection} WHERE username = ?", (username,))
+                conn.execute("DELETE FROM budgets WHERE username = ?", (username,))
+                # Deletions since the snapshot were discarded along with the rows
+                conn.execute("DELETE FROM tombstones WHERE username = ?", (username,))
+            for collection, op, payload in operations:
+                if op == "budget":
+                    conn.execute("DELETE FROM budgets WHERE username = ?", (username,))
+                    conn.executemany(
+                        "INSERT INTO budgets (username, category, amount, rev) VALUES (?, ?, ?, 0)",
+                        ((username, category, amount) for category, amount in payload.items()),
+                    )
+                elif op == "delete":
+                    conn.execute(f"DELETE FROM {collection} WHERE id = ? AND username = ?", (payload, username))
+                else:
+                    columns = list(COLLECTIONS[collection])
+                    cursor = conn.executemany(
+                        f"INSERT INTO {collection} (id, username, rev, {', '.join(columns)}) "
+                        f"VALUES (?, ?, 0, {', '.join('?' for _ in columns)}) "
+                        f"ON CONFLICT(id) DO UPDATE SET "
+                        + ", ".join(f"{col} = excluded.{col}" for col in columns)
+                        + f", rev = 0 WHERE {collection}.username = excluded.username",
+                        ([record["id"], username] + [record.get(col) for col in columns] for record in payload),
+                    )
+                    # The upsert skips rows whose id belongs to another user; restoring without them would lose data
+                    if cursor.rowcount < len(payload):
+                        raise RestoreConflictError(
+                            f"{len(payload) - cursor.rowcount} {collection} record(s) could not be restored "
+                            "because their ids are used by another account"
+                        )
+            for collection in list(COLLECTIONS) + ["budget"]:
+                self._mark_seeded(conn, username, collection)
+
+    def load_budget(self, username, default=None):
+        """Load a user's budget as a category -> amount dict"""
+        rows = self._connection().execute(
+            "SELECT category, amount FROM budgets WHERE username = ? ORDER BY rowid", (username,)
+        ).fetchall()
+        if not rows and default is not None and not self._is_seeded(username, "budget"):
+            self.set_budget(username, default)
+            return dict(default)
+        return {row["category"]: row["amount"] for row in rows}
+
+    def set_budget(self, username, budget):
+        """Store a user's budget allocations"""
+        conn = self._connection()
+        with conn:
+            rev = self._next_rev(conn)
+            conn.execute("DELETE FROM budgets WHERE username = ?", (username,))
+            conn.executemany(
+                "INSERT INTO budgets (username, category, amount, rev) VALUES (?, ?, ?, ?)",
+                ((username, category, amount, rev) for category, amount in budget.items()),
+            )
+            self._mark_seeded(conn, username, "budget")
+
+
+_data_store = None
+_data_store_lock = threading.Lock()
+
+
+def get_data_store():
+    """Return the process-wide user data store"""
+    global _data_store
+    if _data_store is None:
+        with _data_store_lock:
+            if _data_store is None:
+                _data_store = UserDataStore()
+    return _data_store
@@ -0,0 +1,113 @@
+"""Dated exchange rates read from a local CSV table."""
+import csv
+import threading
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+
+EXCHANGE_RATES_FILE = Path(__file__).parent / "data" / "exchange_rates.csv"
+DEFAULT_CURRENCY = "USD"
+
+
+class ExchangeRates:
+    """Units of each currency per US dollar, by effective date.
+
+    The CSV has a ``date`` column followed by one column per currency code.
+    A rate applies from its date until the next row; dates before the first
+    row use the first row. The table is re-read only when the file's mtime
+    or size changes.
+    """
+
+    def __init__(self, rates_file=EXCHANGE_RATES_FILE):
+        self.rates_file = Path(rates_file)
+        self._signature = None
+        self._lock = threading.Lock()
+        self._set_table([DEFAULT_CURRENCY], [0], [[1.0]])
+
+    @property
+    def version(self):
+        """Changes whenever the rates file is reloaded, for use in cache keys"""
+        self.refresh()
+        return self._signature
+
+    @property
+    def currencies(self):
+        """Currency codes with rates, in file order"""
+        self.refresh()
+        return list(self._table[0])
+
+    def _set_table(self, currencies, ordinals, rates):
+        # Swapped in as one tuple so readers never see a half-loaded table
+        columns = {code: i for i, code in enumerate(currencies)}
+        self._table = (currencies, columns, np.asarray(ordinals, dtype=np.int32), np.asarray(rates, dtype=np.float64))
+
+    def _file_signature(self):
+        try:
+            stat = self.rates_file.stat()
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def refresh(self):
+        """Reload the table if the file changed since it was last read"""
+        signature = self._file_signature()
+        if signature == self._signature:
+            return
+        with self._lock:
+            if signature is None:
+                # Without a rates file every currency is left unconverted
+                self._set_table([DEFAULT_CURRENCY], [0], [[1.0]])
+            else:
+                with self.rates_file.open(newline="") as f:
+                    reader = csv.reader(f)
+                    header = next(reader)
+                    rows = sorted(row for row in reader if row)
+                self._set_table(
+                    [code.strip().upper() for code in header[1:]],
+                    [date.fromisoformat(row[0]).toordinal() for row in rows],
+                    [[float(value) for value in row[1:]] for row in rows],
+                )
+            self._signature = signature
+
+    def column(self, currency):
+        """Column of a currency in the rate table, or None if it has no rates"""
+        self.refresh()
+        return self._table[1].get(currency)
+
+    def convert(self, amounts, currency_codes, code_currencies, ordinals, target):
+        """Convert amounts to ``target`` at the rate in effect on each date.
+
+        ``currency_codes`` index into ``code_currencies``, as in the ledger's
+        category columns. Amounts in currencies without rates are left as is.
+        """
+        self.refresh()
+        _, columns, dates, rates = self._table
+        target_column = columns.get(target)
+        amounts = np.asarray(amounts, dtype=np.float64)
+        if target_column is None or len(amounts) == 0:
+            return amounts.copy()
+        # Map each currency code to its rate column, -1 for unknown currencies
+        lookup = np.array([columns.get(code, -1) for code in code_currencies] or [-1], dtype=np.int64)
+        source = lookup[np.asarray(currency_codes, dtype=np.int64)]
+        row = np.clip(np.searchsorted(dates, ordinals, side="right") - 1, 0, None)
+        factors = np.where(
+            source >= 0,
+            rates[row, target_column] / rates[row, np.maximum(source, 0)],
+            1.0,
+        )
+        return amounts * factors
+
+
+_exchange_rates = None
+_exchange_rates_lock = threading.Lock()
+
+
+def get_exchange_rates():
+    """Return the process-wide exchange rate table"""
+    global _exchange_rates
+    if _exchange_rates is None:
+        with _exchange_rates_lock:
+            if _exchange_rates is None:
+                _exchange_rates = ExchangeRates()
+    return _exchange_rates
@@ -0,0 +1,261 @@
+"""Flag unusual expenses and spending days with rolling robust statistics."""
+import threading
+import weakref
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from exchange_rates import get_exchange_rates
+from expense_ledger import ordinals_to_dates
+
+# Previous transactions of the same category an expense is compared with
+TRANSACTION_WINDOW = 30
+TRANSACTION_MIN_HISTORY = 5
+# Baselines are refreshed every this many rows of a category (must divide the window)
+TRANSACTION_HOP = 5
+# Previous days a day's total is compared with
+DAY_WINDOW = 28
+DAY_MIN_HISTORY = 14
+# Length of the rolling sums used to spot runs of high spending
+RUN_DAYS = 7
+# Robust z-score above which something is flagged (Iglewicz-Hoaglin cut-off)
+ANOMALY_Z = 3.5
+# Only flag amounts at least this many times the usual value
+MIN_RATIO = 2.0
+
+_anomalies = weakref.WeakKeyDictionary()
+_anomalies_lock = threading.Lock()
+
+
+def _rolling_robust(values, window, min_periods, lag=1):
+    """Rolling median and scaled MAD of ``window`` values ending ``lag`` positions back.
+
+    The MAD is taken over each value's deviation from the median in force
+    when it was seen, which keeps it to two rolling medians. Used for daily
+    totals, where the series is one value per calendar day.
+    """
+    series = pd.Series(values)
+    median = series.shift(lag).rolling(window, min_periods=min_periods).median()
+    deviation = (series - median).abs()
+    mad = deviation.shift(lag).rolling(window, min_periods=min_periods).median()
+    return median.to_numpy(), 1.4826 * mad.to_numpy()
+
+
+def _sorted_median(sorted_rows, counts):
+    """Median of the first ``counts`` values of each row of a sorted matrix"""
+    lo = np.maximum(counts - 1, 0) // 2
+    hi = counts // 2 - (counts == 0)
+    pick = lambda index: np.take_along_axis(sorted_rows, index[:, None], axis=1)[:, 0]
+    return (pick(lo) + pick(np.maximum(hi, lo))) / 2
+
+
+def _windows_robust(windows, min_periods):
+    """Median and scaled MAD of each row of a (windows x values) matrix, skipping NaNs"""
+    counts = np.count_nonzero(~np.isnan(windows), axis=1)
+    # NaNs sort to the end, so the valid values of each window come first
+    median = _sorted_median(np.sort(windows, axis=1), counts)
+    mad = 1.4826 * _sorted_median(np.sort(np.abs(windows - median[:, None]), axis=1), counts)
+    enough = counts >= min_periods
+    median[~enough] = np.nan
+    mad[~enough] = np.nan
+    return median, mad
+
+
+def _hopping_robust(values, window, hop, min_periods):
+    """Median and scaled MAD of a recent window before each position.
+
+    The baseline for position ``p`` is the ``window`` values ending at the
+    last multiple of ``hop`` at or before ``p``, so a full scan sorts only
+    ``len(values) / hop`` windows instead of one per position. NaNs are
+    skipped; positions before the first full window get NaN.
+    """
+    median = np.full(len(values), np.nan)
+    mad = np.full(len(values), np.nan)
+    if len(values) <= window:
+        return median, mad
+    window_median, window_mad = _windows_robust(sliding_window_view(values, window)[::hop], min_periods)
+    positions = np.arange(window, len(values))
+    k = positions // hop - window // hop
+    median[window:] = window_median[k]
+    mad[window:] = window_mad[k]
+    return median, mad
+
+
+def _robust_z(values, median, mad):
+    # A MAD of zero (e.g. identical rent payments) would flag any change, so
+    # scale by at least 5% of the median
+    scale = np.maximum(mad, 0.05 * np.abs(median))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = (values - median) / scale
+    return np.where(scale > 0, z, 0.0)
+
+
+def _score_rows(codes, amounts, order):
+    """Robust z-score and usual amount per row, against earlier rows of its category"""
+    n = len(order)
+    z = np.zeros(len(amounts))
+    usual = np.full(len(amounts), np.nan)
+    if n == 0:
+        return z, usual
+    # Sort by category, keeping date order inside each category, and leave a
+    # window-sized gap of NaNs between categories so windows never mix them
+    # Each category's first row sits on a multiple of the hop, so a row's
+    # baseline depends only on its own category's rows
+    by_category = order[np.argsort(codes[order], kind="stable")]
+    sorted_codes = codes[by_category]
+    starts = np.flatnonzero(np.concatenate([[True], sorted_codes[1:] != sorted_codes[:-1]]))
+    sizes = np.diff(np.append(starts, n))
+    blocks = TRANSACTION_WINDOW + -(-sizes // TRANSACTION_HOP) * TRANSACTION_HOP
+    first_pos = np.cumsum(blocks) - blocks + TRANSACTION_WINDOW
+    padded_pos = np.arange(n) + np.repeat(first_pos - starts, sizes)
+    padded = np.full(int(blocks.sum()), np.nan)
+    padded[padded_pos] = amounts[by_category]
+    median, mad = _hopping_robust(padded, TRANSACTION_WINDOW, TRANSACTION_HOP, TRANSACTION_MIN_HISTORY)
+    median, mad = median[padded_pos], mad[padded_pos]
+    z[by_category] = np.nan_to_num(_robust_z(amounts[by_category], median, mad))
+    usual[by_category] = median
+    return z, usual
+
+
+def _score_newest(codes, amounts, order, row):
+    """Score only the newest row, from the same hop-aligned window _score_rows would use"""
+    earlier = order[:-1]
+    history = amounts[earlier[codes[earlier] == codes[row]]]
+    end = len(history) - len(history) % TRANSACTION_HOP
+    window = history[max(end - TRANSACTION_WINDOW, 0):end]
+    window = np.append(np.full(TRANSACTION_WINDOW - len(window), np.nan), window)
+    median, mad = _windows_robust(window[None, :], TRANSACTION_MIN_HISTORY)
+    return float(np.nan_to_num(_robust_z(amounts[row], median[0], mad[0]))), median[0]
+
+
+def _day_totals(ledger, amounts):
+    """First date ordinal and spending per calendar day from then on, quiet days included"""
+    ordinals, inverse = np.unique(ledger.dates, return_inverse=True)
+    totals = np.bincount(inverse, weights=amounts, minlength=len(ordinals))
+    span = np.zeros(int(ordinals[-1] - ordinals[0]) + 1)
+    span[ordinals - ordinals[0]] = totals
+    return int(ordinals[0]), span
+
+
+def _add_day(first_ordinal, span, ordinal, amount):
+    """Day totals with one more expense dated on or after the last day"""
+    span = np.concatenate([span, np.zeros(ordinal - first_ordinal + 1 - len(span))])
+    span[ordinal - first_ordinal] += amount
+    return span
+
+
+def _unusual_days(first_ordinal, span):
+    """Runs of days whose spending is far above the previous weeks.
+
+    A day is flagged on its own total for users who spend most days, and
+    the ``RUN_DAYS`` days up to a date are flagged together when their sum
+    is far above the usual sum, which also catches bursts for users who
+    only spend a few times a week.
+    """
+    if len(span) == 0:
+        return []
+    first_day = ordinals_to_dates(first_ordinal)
+
+    def above(values, median, mad):
+        with np.errstate(invalid="ignore"):
+            scale = np.maximum(mad, 0.1 * median)
+            return (median > 0) & (values > median + ANOMALY_Z * scale) & (values > MIN_RATIO * median)
+
+    median, mad = _rolling_robust(span, DAY_WINDOW, DAY_MIN_HISTORY)
+    flagged = above(span, median, mad)
+    sums = pd.Series(span).rolling(RUN_DAYS, min_periods=RUN_DAYS).sum().to_numpy()
+    sum_median, sum_mad = _rolling_robust(sums, DAY_WINDOW, DAY_MIN_HISTORY, lag=RUN_DAYS)
+    # A flagged sum ending on day t covers days t - RUN_DAYS + 1 .. t, so day i
+    # is covered if any sum ending in [i, i + RUN_DAYS - 1] was flagged
+    flagged_sums = np.cumsum(above(sums, sum_median, sum_mad))
+    last = flagged_sums[np.minimum(np.arange(len(span)) + RUN_DAYS - 1, len(span) - 1)]
+    flagged |= last > np.concatenate([[0], flagged_sums[:-1]])
+    usual = pd.Series(span).shift(1).rolling(DAY_WINDOW, min_periods=1).mean().to_numpy()
+
+    runs = []
+    for start, end in _runs(np.flatnonzero(flagged)):
+        # Trim quiet days picked up from the edges of flagged rolling sums
+        spent_days = np.flatnonzero(span[start:end + 1])
+        if len(spent_days) == 0:
+            continue
+        start, end = start + int(spent_days[0]), start + int(spent_days[-1])
+        runs.append({
+            "start": (first_day + start).item(),
+            "end": (first_day + end).item(),
+            "total": float(span[start:end + 1].sum()),
+            "usual": float(np.nan_to_num(usual[start]) * (end - start + 1)),
+        })
+    return runs
+
+
+def _runs(positions):
+    """Group sorted positions into (first, last) runs of consecutive values"""
+    if len(positions) == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(positions) > 1)
+    starts = np.concatenate([[positions[0]], positions[breaks + 1]])
+    ends = np.concatenate([positions[breaks], [positions[-1]]])
+    return list(zip(starts.tolist(), ends.tolist()))
+
+
+def detect_anomalies(ledger, currency=None):
+    """Return unusual expenses and spending days.
+
+    The result has ``transactions``, a dict of expense id -> {"date",
+    "ratio" to the usual amount, robust "z"-score}, and ``days``, a list of
+    runs of unusual days. Results are cached per ledger; when the only change since the last
+    call is a new expense dated on or after all others, just that expense is
+    scored and added to the stored daily totals. Both paths compare a row
+    with the same hop-aligned window of its own category, so a flag never
+    depends on how the row was scored.
+    """
+    rates_version = get_exchange_rates().version
+    with _anomalies_lock:
+        cached = _anomalies.get(ledger)
+    if cached is not None and cached["key"] == (ledger.version, rates_version, currency):
+        return cached["result"]
+
+    amounts = ledger.amounts if currency is None else ledger.converted_amounts(currency)
+    codes = ledger.category_codes
+    order = ledger.date_index.rows
+    size = len(ledger)
+    incremental = (
+        cached is not None
+        and cached["key"] == (ledger.version - 1, rates_version, currency)
+        and cached["size"] == size - 1
+        and size > 0
+        and order[-1] == size - 1
+    )
+    if incremental:
+        z, usual = cached["z"], cached["usual"]
+        new_z, new_usual = _score_newest(codes, amounts, order, size - 1)
+        z, usual = np.append(z, new_z), np.append(usual, new_usual)
+        first_ordinal = cached["first_ordinal"]
+        span = _add_day(first_ordinal, cached["span"], int(ledger.dates[size - 1]), amounts[size - 1])
+    else:
+        z, usual = _score_rows(codes, amounts, order)
+        first_ordinal, span = _day_totals(ledger, amounts) if size else (0, np.zeros(0))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = amounts / usual
+    flagged = np.flatnonzero((z > ANOMALY_Z) & (ratio >= MIN_RATIO))
+    ids, dates = ledger.ids, ordinals_to_dates(ledger.dates[flagged])
+    result = {
+        "transactions": {
+            int(ids[row]): {"date": day.item(), "ratio": float(ratio[row]), "z": float(z[row])}
+            for row, day in zip(flagged, dates)
+        },
+        "days": _unusual_days(first_ordinal, span),
+    }
+    with _anomalies_lock:
+        _anomalies[ledger] = {
+            "key": (ledger.version, rates_version, currency),
+            "size": size,
+            "z": z,
+            "usual": usual,
+            "first_ordinal": first_ordinal,
+            "span": span,
+            "result": result,
+        }
+    return result
@@ -0,0 +1,150 @@
+"""Suggest expense categories with naive Bayes learned from the user's own expenses."""
+import math
+import re
+import threading
+
+import numpy as np
+
+_TOKEN = re.compile(r"[a-z]{2,}")
+# Amounts become one extra token per log2-sized bucket: under 1, 1-3, 3-7, ...
+AMOUNT_BUCKETS = 16
+# Additive smoothing of token counts
+SMOOTHING = 0.5
+# Labeled expenses needed before any category is suggested
+MIN_TRAINING = 5
+# Suggestions whose posterior probability is below this are not made
+MIN_CONFIDENCE = 0.5
+
+
+def tokenize(description, amount=None):
+    """Lowercase word tokens of a description, plus an amount bucket token"""
+    tokens = _TOKEN.findall((description or "").lower())
+    if amount is not None and amount > 0:
+        tokens.append(f"#amount{min(int(math.log2(amount + 1)), AMOUNT_BUCKETS - 1)}")
+    return tokens
+
+
+class ExpenseCategorizer:
+    """Multinomial naive Bayes over description tokens and amount buckets.
+
+    Token counts per category are kept in a growable (tokens x categories)
+    matrix that every learn or forget updates in place, so the model is
+    never refit. Log-probabilities are rebuilt lazily, in one vectorized
+    pass, the first time a prediction is asked for after a change.
+    """
+
+    def __init__(self, capacity=256):
+        self.categories = []
+        self._category_index = {}
+        self._vocabulary = {}
+        self._counts = np.zeros((capacity, 8))
+        self._documents = np.zeros(8)
+        self._version = 0
+        self._tables = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """Number of labeled expenses learned"""
+        return int(round(self._documents.sum()))
+
+    def _category(self, category):
+        index = self._category_index.get(category)
+        if index is None:
+            index = len(self.categories)
+            if index >= self._counts.shape[1]:
+                self._counts = np.hstack([self._counts, np.zeros_like(self._counts)])
+                self._documents = np.concatenate([self._documents, np.zeros_like(self._documents)])
+            self.categories.append(category)
+            self._category_index[category] = index
+        return index
+
+    def _token(self, token):
+        index = self._vocabulary.get(token)
+        if index is None:
+            index = len(self._vocabulary)
+            if index >= self._counts.shape[0]:
+                self._counts = np.vstack([self._counts, np.zeros_like(self._counts)])
+            self._vocabulary[token] = index
+        return index
+
+    def learn_many(self, descriptions, amounts, categories, weight=1):
+        """Add labeled expenses to the counts (``weight=-1`` removes them)"""
+        with self._lock:
+            token_rows, token_columns, document_columns = [], [], []
+            for description, amount, category in zip(descriptions, amounts, categories):
+                column = self._category(category)
+                document_columns.append(column)
+                for token in tokenize(description, amount):
+                    token_rows.append(self._token(token))
+                    token_columns.append(column)
+            if not document_columns:
+                return
+            np.add.at(self._counts, (token_rows, token_columns), weight)
+            self._documents += weight * np.bincount(document_columns, minlength=len(self._documents))
+            self._version += 1
+
+    def learn(self, description, amount, category):
+        """Add one labeled expense"""
+        self.learn_many([description], [amount], [category])
+
+    def forget(self, description, amount, category):
+        """Remove one previously learned expense, e.g. when it is edited or deleted"""
+        self.learn_many([description], [amount], [category], weight=-1)
+
+    def _log_tables(self):
+        """(log priors, log likelihoods, seen tokens) for the current counts, rebuilt once per change"""
+        with self._lock:
+            if self._tables is not None and self._tables[0] == self._version:
+                return self._tables[1:]
+            vocabulary_size = len(self._vocabulary)
+            categories = len(self.categories)
+            counts = np.maximum(self._counts[:vocabulary_size, :categories], 0)
+            documents = np.maximum(self._documents[:categories], 0)
+            # One extra slot in the denominator for tokens never seen before
+            denominators = counts.sum(axis=0) + SMOOTHING * (vocabulary_size + 1)
+            log_likelihood = np.log(counts + SMOOTHING) - np.log(denominators)
+            with np.errstate(divide="ignore"):
+                log_prior = np.log(documents / max(documents.sum(), 1))
+            # Tokens whose expenses were all forgotten say nothing about the category
+            seen = counts.sum(axis=1) > 0
+            self._tables = (self._version, log_prior, log_likelihood, seen)
+            return log_prior, log_likelihood, seen
+
+    def predict_many(self, descriptions, amounts, choices=None):
+        """Most likely category for each expense, or None where the model is unsure.
+
+        Token ids of all expenses are gathered into one array and summed per
+        expense with a cumulative sum, so scoring a batch is a handful of
+        array operations. ``choices`` limits suggestions to those categories.
+        """
+        count = len(descriptions)
+        if len(self) < MIN_TRAINING or count == 0:
+            return [None] * count
+        log_prior, log_likelihood, seen = self._log_tables()
+        known = len(log_likelihood)
+        vocabulary = self._vocabulary
+        ids, lengths = [], []
+        for description, amount in zip(descriptions, amounts):
+            tokens = map(vocabulary.get, tokenize(description, amount))
+            found = [i for i in tokens if i is not None and i < known and seen[i]]
+            ids.extend(found)
+            lengths.append(len(found))
+        lengths = np.asarray(lengths)
+        cumulative = np.zeros((len(ids) + 1, len(log_prior)))
+        np.cumsum(log_likelihood[ids], axis=0, out=cumulative[1:])
+        ends = np.cumsum(lengths)
+        scores = log_prior + cumulative[ends] - cumulative[ends - lengths]
+        if choices is not None:
+            allowed = np.array([category in choices for category in self.categories[:len(log_prior)]])
+            scores[:, ~allowed] = -np.inf
+        best = np.argmax(scores, axis=1)
+        top = scores[np.arange(count), best]
+        with np.errstate(invalid="ignore"):
+            confidence = 1 / np.exp(scores - top[:, None]).sum(axis=1)
+        # Expenses with no known tokens would only get the most common category
+        confident = (lengths > 0) & np.isfinite(top) & (confidence >= MIN_CONFIDENCE)
+        return [self.categories[b] if ok else None for b, ok in zip(best.tolist(), confident.tolist())]
+
+    def suggest(self, description, amount=None, choices=None):
+        """Suggested category for one expense, or None"""
+        return self.predict_many([description], [amount], choices)[0]
@@ -0,0 +1,111 @@
+"""Downsampled, cached Plotly figures for the expense tracker."""
+import threading
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+from category_tree import CategoryTree, category_label, parent_category, rollup
+from exchange_rates import get_exchange_rates
+
+CHART_RESOLUTIONS = ["Daily", "Weekly", "Monthly"]
+# Longest series sent to the browser; longer ones are downsampled with LTTB
+CHART_MAX_POINTS = 400
+FIGURE_CACHE_SIZE = 32
+
+# ledger -> OrderedDict of figures; entries go away with the ledger itself
+_figure_caches = weakref.WeakKeyDictionary()
+_figure_cache_lock = threading.Lock()
+
+
+def lttb(x, y, threshold=CHART_MAX_POINTS):
+    """Largest-Triangle-Three-Buckets downsampling; returns the kept indices"""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    xs = np.asarray(x, dtype=np.float64)
+    ys = np.asarray(y, dtype=np.float64)
+    every = (n - 2) / (threshold - 2)
+    kept = np.empty(threshold, dtype=np.int64)
+    kept[0] = a = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_x = xs[end:next_end].mean()
+        avg_y = ys[end:next_end].mean()
+        # Keep the point forming the largest triangle with the last kept point
+        # and the average of the next bucket
+        area = np.abs(
+            (xs[a] - avg_x) * (ys[start:end] - ys[a]) - (xs[a] - xs[start:end]) * (avg_y - ys[a])
+        )
+        a = start + int(np.argmax(area))
+        kept[i + 1] = a
+    kept[-1] = n - 1
+    return kept
+
+
+def resample(days, amounts, resolution="Daily"):
+    """Sum daily totals into weekly (Monday-start) or monthly buckets"""
+    if resolution == "Daily" or len(days) == 0:
+        return days, amounts
+    if resolution == "Weekly":
+        # 1970-01-01 was a Thursday, so (day + 3) % 7 is days since Monday
+        day_numbers = days.astype("datetime64[D]").astype(np.int64)
+        buckets = (day_numbers - (day_numbers + 3) % 7).astype("datetime64[D]")
+    else:
+        buckets = days.astype("datetime64[M]").astype("datetime64[D]")
+    starts, inverse = np.unique(buckets, return_inverse=True)
+    return starts, np.bincount(inverse, weights=amounts, minlength=len(starts))
+
+
+def cached_figure(ledger, key, build):
+    """Return the figure cached for ``key`` at the current ledger and rates version, building it if needed"""
+    with _figure_cache_lock:
+        cache = _figure_caches.setdefault(ledger, OrderedDict())
+        full_key = (ledger.version, get_exchange_rates().version) + tuple(key)
+        figure = cache.get(full_key)
+        if figure is not None:
+            cache.move_to_end(full_key)
+            return figure
+    figure = build()
+    with _figure_cache_lock:
+        cache[full_key] = figure
+        while len(cache) > FIGURE_CACHE_SIZE:
+            cache.popitem(last=False)
+    return figure
+
+
+def category_sunburst(ledger, start, end, spent_by_category, currency=None):
+    """Sunburst of spending over [start, end], with subcategories inside their parents"""
+    def build():
+        tree = CategoryTree(spent_by_category)
+        totals = rollup(spent_by_category)
+        nodes = [node for node, _ in tree.walk()]
+        fig = px.sunburst(
+            ids=nodes,
+            names=[category_label(node) for node in nodes],
+            parents=[parent_category(node) for node in nodes],
+            values=[totals[node] for node in nodes],
+            branchvalues="total",
+            color_discrete_sequence=px.colors.qualitative.Set3
+        )
+        fig.update_layout(font=dict(size=12), height=400, margin=dict(t=10, l=10, r=10, b=10))
+        return fig
+
+    return cached_figure(ledger, ("sunburst", start, end, currency), build)
+
+
+def spending_trend(ledger, rows, start, end, resolution="Daily", label="", currency=None):
+    """Line chart of spending over [start, end] with at most CHART_MAX_POINTS points"""
+    def build():
+        days, amounts = resample(*ledger.daily_totals(rows, currency), resolution)
+        kept = lttb(days.astype(np.int64), amounts)
+        trend = pd.DataFrame({"date": days[kept], "amount": amounts[kept]})
+        fig = px.line(trend, x="date", y="amount", title=f"{resolution} Spending ({label})")
+        fig.update_layout(font=dict(size=12), height=400, xaxis_title="Date", yaxis_title="Amount")
+        return fig
+
+    return cached_figure(ledger, ("trend", start, end, resolution, label, currency), build)
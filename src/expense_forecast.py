@@ -0,0 +1,133 @@
+"""Month-end and semester-end spend projections from the expense ledger."""
+import threading
+import weakref
+from datetime import timedelta
+
+import numpy as np
+
+from exchange_rates import get_exchange_rates
+from expense_ledger import EPOCH_ORDINAL, description_hash, period_bounds
+
+FORECAST_PERIODS = {"Month-end": "This month", "Semester-end": "This semester"}
+# Days of history used for the weekday profile and recurring-item detection
+FORECAST_HISTORY_DAYS = 120
+
+# ledger -> (key, forecast); recomputed only when the ledger version changes
+_forecasts = weakref.WeakKeyDictionary()
+_forecasts_lock = threading.Lock()
+
+
+def _weekday_counts(first_ordinal, last_ordinal):
+    """Number of Mondays..Sundays in [first, last]"""
+    if last_ordinal < first_ordinal:
+        return np.zeros(7)
+    ordinals = np.arange(first_ordinal, last_ordinal + 1)
+    return np.bincount((ordinals - 1) % 7, minlength=7).astype(np.float64)
+
+
+def _months_since_epoch(ordinals):
+    """Months since January 1970 for each date ordinal"""
+    days = (np.asarray(ordinals, dtype=np.int64) - EPOCH_ORDINAL).astype("datetime64[D]")
+    return days.astype("datetime64[M]").astype(np.int64)
+
+
+def _recurring_groups(ledger, rows, month_index, amounts):
+    """Find (category, description) groups seen in at least two distinct months.
+
+    Returns a boolean mask over ``rows`` plus, per recurring group, its
+    category code, average amount, usual day of month and the last month it
+    was paid in.
+    """
+    codes = ledger.category_codes[rows].astype(np.int64)
+    hashes = np.array([description_hash(ledger.descriptions[row]) for row in rows.tolist()], dtype=np.uint64)
+    _, group = np.unique(np.stack([codes.astype(np.uint64), hashes]), axis=1, return_inverse=True)
+    group = group.ravel()
+    group_count = int(group.max()) + 1 if len(group) else 0
+    pairs = np.unique(np.stack([group, month_index]), axis=1)
+    months_seen = np.bincount(pairs[0], minlength=group_count)
+    recurring = months_seen >= 2
+
+    counts = np.bincount(group, minlength=group_count)
+    amounts = np.bincount(group, weights=amounts[rows], minlength=group_count) / np.maximum(counts, 1)
+    # Rows are in date order, so the last write per group wins
+    last_row = np.zeros(group_count, dtype=np.int64)
+    last_row[group] = np.arange(len(group))
+    days = ledger.dates[rows].astype(np.int64)
+    month_starts = month_index.astype("datetime64[M]").astype("datetime64[D]").astype(np.int64) + EPOCH_ORDINAL
+    day_of_month = days - month_starts + 1
+    return (
+        recurring[group],
+        codes[last_row][recurring],
+        amounts[recurring],
+        day_of_month[last_row][recurring],
+        month_index[last_row][recurring],
+    )
+
+
+def _compute(ledger, today, period, history_days, currency):
+    start, end = period_bounds(FORECAST_PERIODS[period], today)
+    n_categories = len(ledger.categories)
+    today_ord, end_ord = today.toordinal(), end.toordinal()
+    amounts = ledger.amounts if currency is None else ledger.converted_amounts(currency)
+    period_rows = ledger.rows_between(start, today)
+    # bincount returns integers when there are no rows, so cast before adding projections
+    spent = np.bincount(
+        ledger.category_codes[period_rows], weights=amounts[period_rows], minlength=n_categories
+    ).astype(np.float64)
+
+    history_start = today - timedelta(days=history_days - 1)
+    rows = ledger.rows_between(history_start, today)
+    projected = spent.copy()
+    if len(rows) == 0 or today_ord >= end_ord:
+        return spent, projected
+
+    # Don't average over days before the first recorded expense
+    history_first = max(history_start.toordinal(), int(ledger.date_index.dates[0]))
+    dates = ledger.dates[rows].astype(np.int64)
+    month_index = _months_since_epoch(dates)
+    is_recurring, rec_codes, rec_amounts, rec_days, rec_last_month = _recurring_groups(ledger, rows, month_index, amounts)
+
+    # Everyday spending: average per category and weekday over the history,
+    # projected onto the weekdays left in the period. Nothing to project if
+    # every expense in the history is recurring (e.g. only rent payments).
+    variable = ~is_recurring
+    if variable.any():
+        weekday = (dates[variable] - 1) % 7
+        codes = ledger.category_codes[rows][variable].astype(np.int64)
+        profile = np.bincount(
+            codes * 7 + weekday, weights=amounts[rows][variable], minlength=n_categories * 7
+        ).astype(np.float64).reshape(n_categories, 7)
+        profile /= np.maximum(_weekday_counts(history_first, today_ord), 1)
+        projected += profile @ _weekday_counts(today_ord + 1, end_ord)
+
+    # Recurring items: one payment per remaining month on their usual day,
+    # skipping the current month if it has already been paid
+    if len(rec_codes):
+        first_month = np.datetime64(today, "M")
+        months = np.arange(first_month, np.datetime64(end, "M") + 1)
+        month_starts = months.astype("datetime64[D]").astype(np.int64)
+        month_lengths = (months + 1).astype("datetime64[D]").astype(np.int64) - month_starts
+        due = (month_starts[None, :] + np.minimum(rec_days[:, None], month_lengths[None, :]) - 1) + EPOCH_ORDINAL
+        expected = (due > today_ord) & (due <= end_ord)
+        paid = rec_last_month[:, None] >= months.astype(np.int64)[None, :]
+        occurrences = (expected & ~paid).sum(axis=1)
+        projected += np.bincount(rec_codes, weights=rec_amounts * occurrences, minlength=n_categories)
+
+    return spent, projected
+
+
+def forecast_spend(ledger, today, period="Month-end", currency=None, history_days=FORECAST_HISTORY_DAYS):
+    """Return {category: (spent so far, projected total)} for the period containing ``today``"""
+    key = (ledger.version, get_exchange_rates().version, today, period, currency, history_days)
+    with _forecasts_lock:
+        cached = _forecasts.get(ledger)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    spent, projected = _compute(ledger, today, period, history_days, currency)
+    result = {
+        category: (float(spent[code]), float(projected[code]))
+        for code, category in enumerate(ledger.categories)
+    }
+    with _forecasts_lock:
+        _forecasts[ledger] = (key, result)
+    return result
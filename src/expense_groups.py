@@ -0,0 +1,171 @@
+"""Shared expense groups with running balances and settle-up transfers."""
+import heapq
+import json
+import threading
+from collections import defaultdict
+
+from data_store import get_data_store
+
+
+class ExpenseGroup:
+    """A group of people sharing expenses, with each member's net balance.
+
+    Balances are kept in integer cents and updated in O(participants) as
+    expenses are added or removed, so they never have to be recomputed
+    from the group's history. A positive balance means the member is owed
+    money, a negative one that they owe.
+    """
+
+    def __init__(self, group_id, name, members, currency):
+        self.id = group_id
+        self.name = name
+        self.members = list(members)
+        self.currency = currency
+        self.balances = defaultdict(int)
+        self.expense_count = 0
+
+    def apply(self, expense, sign=1):
+        """Add (sign=1) or remove (sign=-1) one shared expense"""
+        for member, cents in split_cents(expense["amount"], expense["paid_by"], expense["split"]).items():
+            self.balances[member] += sign * cents
+        self.expense_count += sign
+
+    def balance(self, member):
+        """Net balance of a member in the group's currency"""
+        return self.balances.get(member, 0) / 100
+
+    def settle_up(self):
+        """Transfers that clear every balance, as (from, to, amount) tuples"""
+        return [(debtor, creditor, cents / 100) for debtor, creditor, cents in settle_up(self.balances)]
+
+
+def split_cents(amount, paid_by, split):
+    """Balance change per member in cents for one expense.
+
+    ``split`` maps members to weights. The payer is credited the full
+    amount and each member is charged their share; rounding leftovers go
+    to the largest shares so the changes always sum to zero.
+    """
+    total = round(float(amount) * 100)
+    weight_sum = sum(split.values())
+    changes = defaultdict(int)
+    changes[paid_by] += total
+    if weight_sum <= 0:
+        changes[paid_by] -= total
+        return changes
+    shares = {member: int(total * weight // weight_sum) for member, weight in split.items()}
+    leftover = total - sum(shares.values())
+    for member in sorted(split, key=split.get, reverse=True)[:max(leftover, 0)]:
+        shares[member] += 1
+    for member, share in shares.items():
+        changes[member] -= share
+    return changes
+
+
+def settle_up(balances):
+    """Near-minimal transfers that clear integer balances.
+
+    Greedy min-cash-flow: the largest debtor repeatedly pays the largest
+    creditor as much as possible, which zeroes at least one of them per
+    transfer, so there are at most n - 1 transfers. Two heaps keep every
+    step O(log n). Returns (debtor, creditor, cents) tuples.
+    """
+    creditors = [(-cents, member) for member, cents in balances.items() if cents > 0]
+    debtors = [(cents, member) for member, cents in balances.items() if cents < 0]
+    heapq.heapify(creditors)
+    heapq.heapify(debtors)
+    transfers = []
+    while creditors and debtors:
+        credit, creditor = heapq.heappop(creditors)
+        debt, debtor = heapq.heappop(debtors)
+        cents = min(-credit, -debt)
+        transfers.append((debtor, creditor, cents))
+        if -credit > cents:
+            heapq.heappush(creditors, (credit + cents, creditor))
+        if -debt > cents:
+            heapq.heappush(debtors, (debt + cents, debtor))
+    return transfers
+
+
+def _decode(expense):
+    return dict(expense, split=json.loads(expense["split"]))
+
+
+class ExpenseGroups:
+    """A user's groups, loaded once and kept in step with every write"""
+
+    def __init__(self, username, store=None):
+        self.username = username
+        self.store = store or get_data_store()
+        self.groups = {}
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Load the groups and replay their expenses in one pass"""
+        for group in self.store.load(self.username, "expense_groups"):
+            self.groups[group["id"]] = ExpenseGroup(
+                group["id"], group["name"], json.loads(group["members"]), group["currency"]
+            )
+        for chunk in self.store.iter_chunks(self.username, "shared_expenses"):
+            for expense in chunk:
+                group = self.groups.get(expense["group_id"])
+                if group is not None:
+                    group.apply(_decode(expense))
+        return self
+
+    def create(self, name, members, currency):
+        """Create a group and return it"""
+        members = list(dict.fromkeys(members))
+        group_id = self.store.add(self.username, "expense_groups", {
+            "name": name, "members": json.dumps(members), "currency": currency,
+        })
+        with self._lock:
+            self.groups[group_id] = ExpenseGroup(group_id, name, members, currency)
+        return self.groups[group_id]
+
+    def add_expense(self, group, date, description, amount, paid_by, split):
+        """Record a shared expense split by ``split`` (member -> weight) and update balances"""
+        expense = {
+            "group_id": group.id,
+            "date": date,
+            "description": description,
+            "amount": float(amount),
+            "paid_by": paid_by,
+            "split": json.dumps(split),
+        }
+        expense["id"] = self.store.add(self.username, "shared_expenses", expense)
+        with self._lock:
+            group.apply(_decode(expense))
+        return expense["id"]
+
+    def record_payment(self, group, date, payer, payee, amount):
+        """Record a settle-up payment from ``payer`` to ``payee``"""
+        return self.add_expense(group, date, f"Payment to {payee}", amount, payer, {payee: 1})
+
+    def delete(self, group):
+        """Delete a group and all of its expenses"""
+        with self._lock:
+            self.groups.pop(group.id, None)
+        self.store.delete_matching(self.username, "shared_expenses", "group_id", group.id)
+        self.store.delete(self.username, "expense_groups", group.id)
+
+
+_groups = {}
+_groups_lock = threading.Lock()
+
+
+def get_groups(username):
+    """Return the process-wide shared expense groups of a user"""
+    groups = _groups.get(username)
+    if groups is None:
+        with _groups_lock:
+            groups = _groups.get(username)
+            if groups is None:
+                groups = _groups[username] = ExpenseGroups(username).load()
+    return groups
+
+
+def invalidate_groups(username):
+    """Drop a user's cached groups so the next access reloads them"""
+    with _groups_lock:
+        _groups.pop(username, None)
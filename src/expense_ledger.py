@@ -0,0 +1,653 @@
+"""Columnar in-memory expense ledger backed by the user data store."""
+import hashlib
+import threading
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from category_tree import category_path
+from data_store import get_data_store
+from expense_categorizer import ExpenseCategorizer
+from exchange_rates import get_exchange_rates, DEFAULT_CURRENCY
+
+# Ordinal of 1970-01-01, used to convert between datetime64[D] and date ordinals
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def dates_to_ordinals(dates):
+    """Convert ISO date strings to int32 date ordinals in one vectorized pass"""
+    days = np.asarray(dates, dtype="datetime64[D]").astype(np.int64)
+    return (days + EPOCH_ORDINAL).astype(np.int32)
+
+
+def ordinals_to_dates(ordinals):
+    """Convert date ordinals to a datetime64[D] array"""
+    return (np.asarray(ordinals, dtype=np.int64) - EPOCH_ORDINAL).astype("datetime64[D]")
+
+
+def description_hash(description):
+    """Stable 64-bit hash of a normalized transaction description"""
+    normalized = " ".join((description or "").lower().split())
+    return int.from_bytes(hashlib.blake2b(normalized.encode(), digest_size=8).digest(), "big")
+
+
+def ordinals_to_months(ordinals):
+    """Convert date ordinals to (year, month) integer arrays"""
+    months = ordinals_to_dates(ordinals).astype("datetime64[M]").astype(np.int64)
+    return months // 12 + 1970, months % 12 + 1
+
+
+class ExpenseAggregates:
+    """Spending totals keyed by (year, month, category).
+
+    Updated in O(1) on every insert, edit and delete so consumers never
+    have to scan the ledger for totals. Subtree totals of nested categories
+    are kept alongside, updated along the category's path, so the total of
+    "Food" including "Food > Groceries" is a lookup too. Amounts are summed
+    as recorded, so they only stand on their own for a single-currency ledger.
+    """
+
+    def __init__(self):
+        self._months = defaultdict(lambda: defaultdict(float))
+        self._subtree_months = defaultdict(lambda: defaultdict(float))
+        self._counts = defaultdict(int)
+        self._subtree_counts = defaultdict(int)
+        self.month_totals = defaultdict(float)
+        self.category_totals = defaultdict(float)
+        self.subtree_totals = defaultdict(float)
+        self.total = 0.0
+
+    def apply(self, ordinal, category, amount, sign=1):
+        """Add (sign=1) or remove (sign=-1) one expense"""
+        day = date.fromordinal(int(ordinal))
+        key = (day.year, day.month)
+        amount = sign * float(amount)
+        self._months[key][category] += amount
+        self.month_totals[key] += amount
+        self.category_totals[category] += amount
+        self.total += amount
+        for node in category_path(category):
+            self._subtree_months[key][node] += amount
+            self.subtree_totals[node] += amount
+            self._subtree_counts[key + (node,)] += sign
+            if self._subtree_counts[key + (node,)] == 0:
+                del self._subtree_counts[key + (node,)]
+                del self._subtree_months[key][node]
+                if not self._subtree_months[key]:
+                    del self._subtree_months[key]
+        self._counts[key + (category,)] += sign
+        if self._counts[key + (category,)] == 0:
+            # Drop emptied keys instead of keeping float residue around
+            del self._counts[key + (category,)]
+            del self._months[key][category]
+            if not self._months[key]:
+                del self._months[key]
+                del self.month_totals[key]
+
+    def rebuild(self, ordinals, codes, amounts, categories):
+        """Recompute all totals from ledger columns in one vectorized pass"""
+        self.__init__()
+        if len(ordinals) == 0:
+            return
+        years, months = ordinals_to_months(ordinals)
+        month_index = (years * 12 + months - 1).astype(np.int64)
+        keys, inverse = np.unique(month_index * len(categories) + codes, return_inverse=True)
+        sums = np.bincount(inverse, weights=amounts)
+        counts = np.bincount(inverse)
+        for key, total, count in zip(keys.tolist(), sums.tolist(), counts.tolist()):
+            month_key, code = divmod(key, len(categories))
+            year, month = divmod(month_key, 12)
+            category = categories[code]
+            self._months[(year, month + 1)][category] += total
+            self._counts[(year, month + 1, category)] = count
+            self.month_totals[(year, month + 1)] += total
+            self.category_totals[category] += total
+            for node in category_path(category):
+                self._subtree_months[(year, month + 1)][node] += total
+                self._subtree_counts[(year, month + 1, node)] += count
+                self.subtree_totals[node] += total
+        self.total = float(np.sum(amounts))
+
+    def month(self, year, month):
+        """Spending per category in a calendar month"""
+        return dict(self._months.get((year, month), {}))
+
+    def subtree_month(self, year, month):
+        """Spending per category in a calendar month, each including its subcategories"""
+        return dict(self._subtree_months.get((year, month), {}))
+
+    def month_total(self, year, month):
+        """Total spending in a calendar month"""
+        return self.month_totals.get((year, month), 0.0)
+
+
+class DateIndex:
+    """Row positions kept sorted by date ordinal.
+
+    Range queries are a pair of binary searches plus a slice, i.e.
+    O(log n + k). In-order appends are O(1); out-of-order inserts and
+    removals shift the tail of the buffers instead of re-sorting.
+    """
+
+    def __init__(self, capacity=1024):
+        self._size = 0
+        self._dates = np.empty(capacity, dtype=np.int32)
+        self._rows = np.empty(capacity, dtype=np.int64)
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def dates(self):
+        return self._dates[:self._size]
+
+    @property
+    def rows(self):
+        return self._rows[:self._size]
+
+    def build(self, ordinals):
+        """Index all rows of a ledger column in one stable sort"""
+        order = np.argsort(ordinals, kind="stable")
+        self._size = len(order)
+        self._dates = np.empty(max(len(order) * 2, 1024), dtype=np.int32)
+        self._rows = np.empty(len(self._dates), dtype=np.int64)
+        self._dates[:self._size] = ordinals[order]
+        self._rows[:self._size] = order
+
+    def _reserve(self):
+        if self._size >= len(self._dates):
+            self._reserve_full()
+
+    def insert(self, ordinal, row):
+        """Index a row, keeping rows with equal dates in insertion order"""
+        self._reserve()
+        pos = int(np.searchsorted(self.dates, ordinal, side="right"))
+        if pos < self._size:
+            self._dates[pos + 1:self._size + 1] = self._dates[pos:self._size]
+            self._rows[pos + 1:self._size + 1] = self._rows[pos:self._size]
+        self._dates[pos] = ordinal
+        self._rows[pos] = row
+        self._size += 1
+
+    def extend(self, ordinals, rows, all_ordinals):
+        """Index a batch of rows; re-sorts only if the batch lands out of order"""
+        ordinals = np.asarray(ordinals, dtype=np.int32)
+        in_order = len(ordinals) == 0 or (
+            (self._size == 0 or ordinals[0] >= self._dates[self._size - 1])
+            and np.all(np.diff(ordinals) >= 0)
+        )
+        if not in_order:
+            self.build(all_ordinals)
+            return
+        while self._size + len(ordinals) > len(self._dates):
+            self._reserve_full()
+        self._dates[self._size:self._size + len(ordinals)] = ordinals
+        self._rows[self._size:self._size + len(ordinals)] = rows
+        self._size += len(ordinals)
+
+    def _reserve_full(self):
+        for name in ("_dates", "_rows"):
+            column = getattr(self, name)
+            grown = np.empty(len(column) * 2, dtype=column.dtype)
+            grown[:self._size] = column[:self._size]
+            setattr(self, name, grown)
+
+    def _position(self, ordinal, row):
+        lo = int(np.searchsorted(self.dates, ordinal, side="left"))
+        hi = int(np.searchsorted(self.dates, ordinal, side="right"))
+        return lo + int(np.flatnonzero(self._rows[lo:hi] == row)[0])
+
+    def remove(self, ordinal, row):
+        """Drop a row from the index"""
+        pos = self._position(ordinal, row)
+        self._dates[pos:self._size - 1] = self._dates[pos + 1:self._size]
+        self._rows[pos:self._size - 1] = self._rows[pos + 1:self._size]
+        self._size -= 1
+
+    def relocate(self, ordinal, old_row, new_row):
+        """Point an entry at a new row position after the ledger moved it"""
+        self._rows[self._position(ordinal, old_row)] = new_row
+
+    def between(self, start_ordinal, end_ordinal):
+        """Rows dated within [start, end], in ascending date order"""
+        lo = np.searchsorted(self.dates, start_ordinal, side="left")
+        hi = np.searchsorted(self.dates, end_ordinal, side="right")
+        return self._rows[lo:hi]
+
+
+class ExpenseLedger:
+    """A user's expenses held as typed columns.
+
+    Dates are int32 ordinals, categories and currencies int16 codes into
+    ``categories`` and ``currencies``, amounts float64 in each expense's own
+    currency, and descriptions live in a separate list. Columns are
+    over-allocated so appends are amortized O(1), and readers get array
+    views without any per-row conversion. Expenses whose category the user
+    chose (rather than an import) train ``categorizer`` as they come in.
+    """
+
+    def __init__(self, username, store=None, capacity=1024):
+        self.username = username
+        self.store = store or get_data_store()
+        self.categories = []
+        self._category_codes = {}
+        self._size = 0
+        self._ids = np.empty(capacity, dtype=np.int64)
+        self._dates = np.empty(capacity, dtype=np.int32)
+        self._codes = np.empty(capacity, dtype=np.int16)
+        self._amounts = np.empty(capacity, dtype=np.float64)
+        self._currencies = np.empty(capacity, dtype=np.int16)
+        # True where the category was filled in automatically
+        self._auto = np.empty(capacity, dtype=bool)
+        self.currencies = []
+        self._currency_codes = {}
+        # Reporting currency -> (cache key, converted amounts)
+        self._converted = {}
+        self.descriptions = []
+        self._positions = {}
+        self._lock = threading.RLock()
+        self.aggregates = ExpenseAggregates()
+        self.date_index = DateIndex()
+        self.categorizer = ExpenseCategorizer()
+        # Incremented on every change so derived results can be cached
+        self.version = 0
+        self._seeded = False
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def ids(self):
+        return self._ids[:self._size]
+
+    @property
+    def dates(self):
+        return self._dates[:self._size]
+
+    @property
+    def category_codes(self):
+        return self._codes[:self._size]
+
+    @property
+    def amounts(self):
+        return self._amounts[:self._size]
+
+    @property
+    def currency_codes(self):
+        return self._currencies[:self._size]
+
+    def category_code(self, category):
+        """Return the code for a category name, registering it if new"""
+        code = self._category_codes.get(category)
+        if code is None:
+            code = len(self.categories)
+            self.categories.append(category)
+            self._category_codes[category] = code
+        return code
+
+    def currency_code(self, currency):
+        """Return the code for a currency, registering it if new"""
+        currency = currency or DEFAULT_CURRENCY
+        code = self._currency_codes.get(currency)
+        if code is None:
+            code = len(self.currencies)
+            self.currencies.append(currency)
+            self._currency_codes[currency] = code
+        return code
+
+    def _reserve(self, extra):
+        needed = self._size + extra
+        capacity = len(self._ids)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name in ("_ids", "_dates", "_codes", "_amounts", "_currencies", "_auto"):
+            column = getattr(self, name)
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:self._size] = column[:self._size]
+            setattr(self, name, grown)
+
+    def _append_columns(self, ids, dates, codes, amounts, descriptions, currencies, auto):
+        count = len(ids)
+        self._reserve(count)
+        start, end = self._size, self._size + count
+        self._ids[start:end] = ids
+        self._dates[start:end] = dates
+        self._codes[start:end] = codes
+        self._amounts[start:end] = amounts
+        self._currencies[start:end] = currencies
+        self._auto[start:end] = auto
+        self.descriptions.extend(descriptions)
+        self._positions.update(zip(np.asarray(ids).tolist(), range(start, end)))
+        self._size = end
+        self.version += 1
+
+    def load(self, default=None):
+        """Load the user's expenses from the store in one columnar pass"""
+        if default is not None:
+            self.store.ensure_seeded(self.username, "expenses", default)
+            self._seeded = True
+        columns = self.store.load_columns(self.username, "expenses")
+        with self._lock:
+            categories, codes = np.unique(np.asarray(columns["category"], dtype=object), return_inverse=True)
+            codes = np.array([self.category_code(c) for c in categories], dtype=np.int16)[codes]
+            # Expenses saved before currencies were tracked count as DEFAULT_CURRENCY
+            currencies, currency_codes = np.unique(
+                np.asarray([c or DEFAULT_CURRENCY for c in columns["currency"]], dtype=object), return_inverse=True
+            )
+            currency_codes = np.array([self.currency_code(c) for c in currencies], dtype=np.int16)[currency_codes]
+            self._append_columns(
+                np.asarray(columns["id"], dtype=np.int64),
+                dates_to_ordinals(columns["date"]),
+                codes,
+                np.asarray(columns["amount"], dtype=np.float64),
+                [d or "" for d in columns["description"]],
+                currency_codes,
+                [bool(a) for a in columns["auto_category"]],
+            )
+            self.aggregates.rebuild(self.dates, self.category_codes, self.amounts, self.categories)
+            self.date_index.build(self.dates)
+            self._learn(np.flatnonzero(~self._auto[:self._size]))
+        return self
+
+    def add(self, record):
+        """Persist one expense and append it to the columns. Returns its id."""
+        record_id = self.store.add(self.username, "expenses", record)
+        with self._lock:
+            self._append_columns(
+                [record_id],
+                dates_to_ordinals([record["date"]]),
+                [self.category_code(record["category"])],
+                [float(record["amount"])],
+                [record.get("description") or ""],
+                [self.currency_code(record.get("currency"))],
+                [bool(record.get("auto_category"))],
+            )
+            row = self._size - 1
+            self.aggregates.apply(self._dates[row], record["category"], record["amount"])
+            self.date_index.insert(self._dates[row], row)
+            self._learn([row])
+        return record_id
+
+    def extend(self, records, updates=()):
+        """Persist a batch of expenses in one transaction and append them. Returns their ids.
+
+        ``updates`` are ``(collection, record_id, fields)`` writes committed
+        in the same transaction, see UserDataStore.add_and_update.
+        """
+        if not records:
+            return []
+        ids = self.store.add_and_update(self.username, "expenses", records, updates)
+        self._append_records(ids, records)
+        return ids
+
+    def _append_records(self, ids, records):
+        with self._lock:
+            start = self._size
+            self._append_columns(
+                ids,
+                dates_to_ordinals([record["date"] for record in records]),
+                [self.category_code(record["category"]) for record in records],
+                [float(record["amount"]) for record in records],
+                [record.get("description") or "" for record in records],
+                [self.currency_code(record.get("currency")) for record in records],
+                [bool(record.get("auto_category")) for record in records],
+            )
+            for row, record in enumerate(records, start):
+                self.aggregates.apply(self._dates[row], record["category"], record["amount"])
+            self.date_index.extend(self._dates[start:self._size], np.arange(start, self._size), self.dates)
+            self._learn(start + np.flatnonzero(~self._auto[start:self._size]))
+
+    def _learn(self, rows, weight=1):
+        """Train (or with ``weight=-1`` untrain) the categorizer on user-labeled rows"""
+        rows = np.asarray(rows, dtype=np.int64)
+        self.categorizer.learn_many(
+            [self.descriptions[row] for row in rows.tolist()],
+            self._amounts[rows],
+            [self.categories[code] for code in self._codes[rows].tolist()],
+            weight,
+        )
+
+    def seed(self, default):
+        """Add ``default`` expenses if the user has never stored any"""
+        records = self.store.ensure_seeded(self.username, "expenses", default)
+        if records:
+            self._append_records([record["id"] for record in records], records)
+        self._seeded = True
+
+    def update(self, expense_id, **fields):
+        """Edit one expense in place, keeping the aggregates and categorizer in step"""
+        if "category" in fields:
+            # A category set by hand is a label the categorizer can learn from
+            fields["auto_category"] = 0
+        with self._lock:
+            row = self._positions[expense_id]
+            old = self.record(row)
+            new = dict(old, **fields)
+            new["amount"] = float(new["amount"])
+            self.store.update(self.username, "expenses", expense_id, **fields)
+            self.aggregates.apply(self._dates[row], old["category"], old["amount"], sign=-1)
+            self.date_index.remove(self._dates[row], row)
+            if not self._auto[row]:
+                self._learn([row], weight=-1)
+            self._dates[row] = dates_to_ordinals([new["date"]])[0]
+            self._codes[row] = self.category_code(new["category"])
+            self._amounts[row] = new["amount"]
+            self.descriptions[row] = new.get("description") or ""
+            self._currencies[row] = self.currency_code(new["currency"])
+            self._auto[row] = self._auto[row] and "category" not in fields
+            self.aggregates.apply(self._dates[row], new["category"], new["amount"])
+            self.date_index.insert(self._dates[row], row)
+            if not self._auto[row]:
+                self._learn([row])
+            self.version += 1
+
+    def delete(self, expense_id):
+        """Delete one expense; the last row is moved into its slot"""
+        with self._lock:
+            row = self._positions.pop(expense_id)
+            self.store.delete(self.username, "expenses", expense_id)
+            self.aggregates.apply(
+                self._dates[row], self.categories[self._codes[row]], self._amounts[row], sign=-1
+            )
+            self.date_index.remove(self._dates[row], row)
+            if not self._auto[row]:
+                self._learn([row], weight=-1)
+            last = self._size - 1
+            if row != last:
+                self.date_index.relocate(self._dates[last], last, row)
+                for name in ("_ids", "_dates", "_codes", "_amounts", "_currencies", "_auto"):
+                    column = getattr(self, name)
+                    column[row] = column[last]
+                self.descriptions[row] = self.descriptions[last]
+                self._positions[int(self._ids[row])] = row
+            self.descriptions.pop()
+            self._size = last
+            self.version += 1
+
+    def record(self, row):
+        """Return the expense at a row position as a dict"""
+        return {
+            "id": int(self._ids[row]),
+            "date": str(ordinals_to_dates(self._dates[row])),
+            "category": self.categories[self._codes[row]],
+            "amount": float(self._amounts[row]),
+            "description": self.descriptions[row],
+            "currency": self.currencies[self._currencies[row]],
+        }
+
+    def records(self, rows):
+        """Return the expenses at the given row positions as dicts"""
+        return [self.record(row) for row in rows]
+
+    def uses_only(self, currency):
+        """True if every expense is in ``currency``, so the aggregates need no conversion"""
+        return not self.currencies or self.currencies == [currency]
+
+    def converted_amounts(self, currency):
+        """Amounts converted to ``currency`` at each expense's date.
+
+        Converted in one vectorized pass and cached until the ledger or the
+        exchange rates file changes.
+        """
+        if self.uses_only(currency):
+            return self.amounts
+        rates = get_exchange_rates()
+        key = (self.version, rates.version)
+        cached = self._converted.get(currency)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        with self._lock:
+            converted = rates.convert(self.amounts, self.currency_codes, self.currencies, self.dates, currency)
+        self._converted[currency] = (key, converted)
+        return converted
+
+    def total(self, currency=None):
+        """Total amount over all expenses, converted to ``currency`` if given"""
+        if currency is None or self.uses_only(currency):
+            return self.aggregates.total
+        return float(self.converted_amounts(currency).sum())
+
+    def dedup_keys(self, rows=None):
+        """Count the expenses per (date ordinal, amount in cents, description hash) key"""
+        rows = np.arange(self._size) if rows is None else rows
+        cents = np.rint(self.amounts[rows] * 100).astype(np.int64)
+        hashes = [description_hash(self.descriptions[row]) for row in rows.tolist()]
+        return Counter(zip(self.dates[rows].tolist(), cents.tolist(), hashes))
+
+    def rows_between(self, start, end):
+        """Row positions of expenses dated within [start, end], oldest first"""
+        return self.date_index.between(start.toordinal(), end.toordinal())
+
+    def newest_page(self, offset=0, limit=10, category=None, search=None):
+        """Return up to ``limit`` expenses, newest first, and the offset of the next page.
+
+        ``offset`` counts date-index entries from the newest one, so paging
+        only scans the entries it passes over rather than sorting the ledger.
+        The next offset is None when there is nothing older left to scan.
+        """
+        with self._lock:
+            size = len(self.date_index)
+            code = None
+            if category:
+                code = self._category_codes.get(category)
+                if code is None:
+                    return [], None
+            needle = search.strip().lower() if search else ""
+            found = []
+            scan_block = max(limit * 4, 256)
+            while offset < size:
+                end = size - offset
+                start = max(end - scan_block, 0)
+                rows = self.date_index.rows[start:end][::-1]
+                offsets = np.arange(offset, offset + len(rows))
+                if code is not None:
+                    keep = self._codes[rows] == code
+                    rows, offsets = rows[keep], offsets[keep]
+                for row, row_offset in zip(rows.tolist(), offsets.tolist()):
+                    if needle and needle not in self.descriptions[row].lower():
+                        continue
+                    found.append(row)
+                    if len(found) == limit:
+                        next_offset = row_offset + 1
+                        return self.records(found), next_offset if next_offset < size else None
+                offset = size - start
+            return self.records(found), None
+
+    def spent_by_category(self, rows=None, currency=None):
+        """Sum amounts per category name, optionally over selected rows and converted"""
+        codes = self.category_codes
+        amounts = self.amounts if currency is None else self.converted_amounts(currency)
+        if rows is not None:
+            codes, amounts = codes[rows], amounts[rows]
+        sums = np.bincount(codes, weights=amounts, minlength=len(self.categories))
+        return {self.categories[code]: float(sums[code]) for code in np.flatnonzero(sums)}
+
+    def daily_totals(self, rows=None, currency=None):
+        """Return (dates as datetime64[D], summed amounts) per distinct day"""
+        dates = self.dates
+        amounts = self.amounts if currency is None else self.converted_amounts(currency)
+        if rows is not None:
+            dates, amounts = dates[rows], amounts[rows]
+        days, inverse = np.unique(dates, return_inverse=True)
+        return ordinals_to_dates(days), np.bincount(inverse, weights=amounts, minlength=len(days))
+
+    def to_frame(self):
+        """Return the ledger as a DataFrame built directly from the columns"""
+        return pd.DataFrame({
+            "id": self.ids,
+            "date": ordinals_to_dates(self.dates),
+            "category": pd.Categorical.from_codes(self.category_codes, categories=self.categories)
+            if self.categories else pd.Categorical([]),
+            "amount": self.amounts,
+            "description": self.descriptions,
+            "currency": pd.Categorical.from_codes(self.currency_codes, categories=self.currencies)
+            if self.currencies else pd.Categorical([]),
+        })
+
+
+PERIOD_OPTIONS = ["This month", "Last 30 days", "This semester", "This year", "Custom range"]
+
+
+def shift_years(day, years):
+    """Move a date by whole years, clamping 29 February to the 28th"""
+    try:
+        return day.replace(year=day.year + years)
+    except ValueError:
+        return day.replace(year=day.year + years, day=28)
+
+
+def shift_months(day, months, anchor_day=None):
+    """Move a date by whole months, keeping ``anchor_day`` (default: its own day) where the month allows"""
+    year, month = divmod(day.year * 12 + day.month - 1 + months, 12)
+    month_start = date(year, month + 1, 1)
+    month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    return month_start.replace(day=min(anchor_day or day.day, month_end.day))
+
+
+def period_bounds(period, today, custom_range=None):
+    """Return the inclusive (start, end) dates of a reporting period"""
+    if period == "This month":
+        start = today.replace(day=1)
+        return start, (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    if period == "Last 30 days":
+        return today - timedelta(days=29), today
+    if period == "This semester":
+        if today.month <= 6:
+            return today.replace(month=1, day=1), today.replace(month=6, day=30)
+        return today.replace(month=7, day=1), today.replace(month=12, day=31)
+    if period == "This year":
+        return today.replace(month=1, day=1), today.replace(month=12, day=31)
+    if period == "Custom range" and custom_range:
+        return custom_range
+    raise ValueError(f"Unknown period: {period}")
+
+
+_ledgers = {}
+_ledgers_lock = threading.Lock()
+
+
+def get_ledger(username, default=None):
+    """Return the process-wide ledger for a user, loading it on first use"""
+    ledger = _ledgers.get(username)
+    if ledger is None:
+        with _ledgers_lock:
+            ledger = _ledgers.get(username)
+            if ledger is None:
+                ledger = ExpenseLedger(username).load(default)
+                _ledgers[username] = ledger
+    if default is not None and not ledger._seeded:
+        # Loaded earlier by a page without defaults, e.g. the Dashboard
+        with _ledgers_lock:
+            if not ledger._seeded:
+                ledger.seed(default)
+    return ledger
+
+
+def invalidate_ledger(username):
+    """Drop a cached ledger so the next access reloads it from the store"""
+    with _ledgers_lock:
+        _ledgers.pop(username, None)
@@ -1,7 +1,32 @@
 import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
-from utils import load_css, check_authentication, format_currency, get_country_info, render_sidebar
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+from utils import (
+    load_css,
+    check_authentication,
+    format_currency,
+    get_country_info,
+    get_reporting_currency,
+    render_sidebar,
+)
+from budget_simulation import (
+    simulate_costs,
+    percentiles,
+    exceed_probability,
+    DEFAULT_VOLATILITY,
+    DEFAULT_SHOCK_PROBABILITY,
+    EMERGENCY_MONTHS,
+    EMERGENCY_PERCENTILE,
+    SIMULATION_SAMPLES,
+)
+from cost_of_living import get_cost_of_living
+from budget_optimizer import allocate
+from cost_projection import project_costs, SCENARIOS
+from exchange_rates import get_exchange_rates, DEFAULT_CURRENCY
+from expense_ledger import get_ledger
 
 # Page configuration
 st.set_page_config(page_title="Expense Calculator", page_icon="🧮", layout="wide")
@@ -15,34 +40,27 @@ check_authentication()
 if st.session_state.get("logged_in", False):
     render_sidebar()
 
-# Cost data by country and lifestyle
-COST_DATA = {
-    "United States": {
-        "budget": {"rent": 800, "food": 250, "transport": 80, "utilities": 100, "entertainment": 100, "other": 120},
-        "moderate": {"rent": 1200, "food": 400, "transport": 120, "utilities": 150, "entertainment": 200, "other": 180},
-        "comfortable": {"rent": 1800, "food": 600, "transport": 200, "utilities": 200, "entertainment": 400, "other": 300}
-    },
-    "United Kingdom": {
-        "budget": {"rent": 700, "food": 200, "transport": 100, "utilities": 120, "entertainment": 80, "other": 100},
-        "moderate": {"rent": 1000, "food": 350, "transport": 150, "utilities": 180, "entertainment": 150, "other": 170},
-        "comfortable": {"rent": 1500, "food": 500, "transport": 250, "utilities": 250, "entertainment": 300, "other": 250}
-    },
-    "Canada": {
-        "budget": {"rent": 600, "food": 200, "transport": 70, "utilities": 80, "entertainment": 70, "other": 80},
-        "moderate": {"rent": 900, "food": 300, "transport": 100, "utilities": 120, "entertainment": 150, "other": 130},
-        "comfortable": {"rent": 1300, "food": 450, "transport": 180, "utilities": 180, "entertainment": 250, "other": 200}
-    },
-    "Australia": {
-        "budget": {"rent": 800, "food": 250, "transport": 90, "utilities": 100, "entertainment": 100, "other": 110},
-        "moderate": {"rent": 1200, "food": 400, "transport": 140, "utilities": 150, "entertainment": 180, "other": 180},
-        "comfortable": {"rent": 1700, "food": 600, "transport": 220, "utilities": 220, "entertainment": 350, "other": 280}
-    },
-    "Germany": {
-        "budget": {"rent": 500, "food": 180, "transport": 60, "utilities": 80, "entertainment": 60, "other": 70},
-        "moderate": {"rent": 750, "food": 280, "transport": 90, "utilities": 120, "entertainment": 120, "other": 120},
-        "comfortable": {"rent": 1100, "food": 400, "transport": 150, "utilities": 180, "entertainment": 200, "other": 180}
-    }
-}
+# Per-city costs by lifestyle, loaded once per process from data/cost_of_living.json
+cost_of_living = get_cost_of_living()
+
+# (category, label, max, step, help, column) of each expense slider
+EXPENSE_SLIDERS = [
+    ("rent", "🏠 Rent & Accommodation", 3000, 50, "Monthly rent, utilities may be separate", 0),
+    ("transport", "🚌 Transportation", 400, 10, "Public transport, bike, occasional taxi", 0),
+    ("entertainment", "🎉 Entertainment & Social", 500, 25, "Movies, dining out, social activities", 0),
+    ("food", "🍽️ Food & Groceries", 800, 25, "Groceries and dining out", 1),
+    ("utilities", "⚡ Utilities", 300, 10, "Electricity, water, internet, phone", 1),
+    ("other", "🛍️ Other Expenses", 400, 25, "Shopping, personal care, miscellaneous", 1),
+]
+# Starting preference weights for the budget optimizer
+DEFAULT_WEIGHTS = {"rent": 8, "food": 6, "transport": 3, "utilities": 3, "entertainment": 2, "other": 2}
+
+
+def apply_allocation(keys, amounts):
+    """Set the expense sliders to an optimized allocation before they are drawn"""
+    for key, amount in zip(keys, amounts):
+        st.session_state[key] = amount
+
 
 def main():
     st.markdown("""
@@ -59,7 +77,7 @@ def main():
         st.markdown("""
         **This calculator helps you estimate living costs for studying abroad:**
         
-        - **Pre-built estimates** for 5 popular study destinations with lifestyle options
+        - **Pre-built estimates** for hundreds of cities in 5 popular study destinations, with lifestyle options
         - **Customizable sliders** to adjust costs based on your personal preferences  
         - **Comparison tool** to see costs across different countries side by side
         - **Custom budget mode** where you can set your own budget ranges
@@ -86,15 +104,26 @@ def main():
         
         with col1:
             with st.expander("📍 Select Destination & Lifestyle", expanded=False):
+                countries = cost_of_living.countries
                 country = st.selectbox(
                     "Country",
-                    list(COST_DATA.keys()),
-                    index=list(COST_DATA.keys()).index(st.session_state.selected_country) if st.session_state.selected_country in COST_DATA else 0,
+                    countries,
+                    index=countries.index(st.session_state.selected_country) if st.session_state.selected_country in countries else 0,
                     help="Select your study destination"
                 )
                 country_info = get_country_info()
                 currency_symbol = country_info[country]['symbol']
 
+                city_rows = cost_of_living.cities_in(country)
+                city_names = [cost_of_living.cities[row] for row in city_rows]
+                city_name = st.selectbox(
+                    "City",
+                    city_names,
+                    index=city_names.index(st.session_state.selected_city) if st.session_state.selected_city in city_names else 0,
+                    help="Costs vary a lot between cities, especially rent"
+                )
+                city_row = cost_of_living.city_index(country, city_name)
+
                 lifestyle = st.selectbox(
                     "Lifestyle Preference",
                     ["budget", "moderate", "comfortable"],
@@ -112,68 +141,81 @@ def main():
                 )
 
                 # Get base costs
-                base_costs = COST_DATA[country][lifestyle].copy()
+                base_costs = {
+                    category: int(amount) for category, amount in cost_of_living.city_costs(city_row, lifestyle).items()
+                }
 
     
-                # Custom adjustments
+                # Custom adjustments, keyed per city and lifestyle so changing either resets them
                 custom_costs = {}
-
-                col_a, col_b = st.columns(2)
-
-                with col_a:
-                    custom_costs["rent"] = st.slider(
-                        "🏠 Rent & Accommodation",
-                        min_value=0,
-                        max_value=3000,
-                        value=base_costs["rent"],
-                        step=50,
-                        help="Monthly rent, utilities may be separate",
-                    )
-
-                    custom_costs["transport"] = st.slider(
-                        "🚌 Transportation",
-                        min_value=0,
-                        max_value=400,
-                        value=base_costs["transport"],
-                        step=10,
-                        help="Public transport, bike, occasional taxi",
-                    )
-
-                    custom_costs["entertainment"] = st.slider(
-                        "🎉 Entertainment & Social",
-                        min_value=0,
-                        max_value=500,
-                        value=base_costs["entertainment"],
-                        step=25,
-                        help="Movies, dining out, social activities",
-                    )
-
-                with col_b:
-                    custom_costs["food"] = st.slider(
-                        "🍽️ Food & Groceries",
-                        min_value=0,
-                        max_value=800,
-                        value=base_costs["food"],
-                        step=25,
-                        help="Groceries and dining out",
+                slider_keys = {
+                    category: f"calc_{category}_{city_row}_{lifestyle}" for category, *_ in EXPENSE_SLIDERS
+                }
+
+                slider_columns = st.columns(2)
+                for category, label, max_value, step, help_text, column in EXPENSE_SLIDERS:
+                    if slider_keys[category] not in st.session_state:
+                        st.session_state[slider_keys[category]] = min(base_costs[category], max_value)
+                    with slider_columns[column]:
+                        custom_costs[category] = st.slider(
+                            label,
+                            min_value=0,
+                            max_value=max_value,
+                            step=step,
+                            help=help_text,
+                            key=slider_keys[category],
+                        )
+
+            with st.expander("🎛️ Optimize for a Budget", expanded=False):
+                st.markdown(
+                    "Set a monthly total and how much each category matters to you. Money is shared out in "
+                    "proportion to the weights, within each slider's range."
+                )
+                target_total = st.number_input(
+                    f"Monthly budget ({currency_symbol})",
+                    min_value=0,
+                    value=int(sum(custom_costs.values())),
+                    step=50,
+                    key="optimizer_total",
+                )
+                locked = st.multiselect(
+                    "Keep at their current amount",
+                    list(custom_costs),
+                    default=["rent"],
+                    format_func=str.title,
+                    key="optimizer_locked",
+                )
+                weight_columns = st.columns(3)
+                weights = [
+                    weight_columns[i % 3].slider(
+                        f"{category.title()} weight", 0, 10, DEFAULT_WEIGHTS[category], key=f"optimizer_weight_{category}"
                     )
-
-                    custom_costs["utilities"] = st.slider(
-                        "⚡ Utilities",
-                        min_value=0,
-                        max_value=300,
-                        value=base_costs["utilities"],
-                        step=10,
-                        help="Electricity, water, internet, phone",
+                    for i, (category, *_) in enumerate(EXPENSE_SLIDERS)
+                ]
+                lows = [custom_costs[category] if category in locked else 0 for category, *_ in EXPENSE_SLIDERS]
+                highs = [
+                    custom_costs[category] if category in locked else max_value
+                    for category, _, max_value, *_ in EXPENSE_SLIDERS
+                ]
+                try:
+                    allocation = allocate(target_total, weights, lows, highs, [step for _, _, _, step, *_ in EXPENSE_SLIDERS])
+                except ValueError as e:
+                    st.warning(str(e))
+                else:
+                    st.dataframe(
+                        pd.DataFrame({
+                            "Category": [category.title() for category, *_ in EXPENSE_SLIDERS],
+                            "Current": [custom_costs[category] for category, *_ in EXPENSE_SLIDERS],
+                            "Optimized": allocation.astype(int),
+                        }),
+                        hide_index=True,
+                        use_container_width=True,
                     )
-
-                    custom_costs["other"] = st.slider(
-                        "🛍️ Other Expenses",
-                        min_value=0,
-                        max_value=400,
-                        value=base_costs["other"],
-                        step=25,
-                        help="Shopping, personal care, miscellaneous",
+                    st.button(
+                        "Apply to sliders",
+                        on_click=apply_allocation,
+                        args=([slider_keys[category] for category, *_ in EXPENSE_SLIDERS], allocation.astype(int).tolist()),
+                        key="optimizer_apply",
                     )
     else:  # Custom Budget mode
         col1, col2 = st.columns([1, 1])
@@ -281,6 +323,15 @@ def main():
             </div>
             """, unsafe_allow_html=True)
 
+        # Compare with what the user actually tracked, in this country's currency
+        ledger = get_ledger(st.session_state.username)
+        if len(ledger) > 0:
+            today = datetime.now().date()
+            recent_rows = ledger.rows_between(today - timedelta(days=29), today)
+            actual_spent = float(ledger.converted_amounts(get_reporting_currency(country))[recent_rows].sum())
+            share = f" ({actual_spent / total_monthly * 100:.0f}% of this estimate)" if total_monthly else ""
+            st.caption(f"Your tracked spending over the last 30 days: {format_currency(actual_spent, country)}{share}")
+
         with st.expander("Monthly Budget Breakdown", expanded=False):
             st.subheader("📊 Expense Breakdown")
 
@@ -339,38 +390,235 @@ def main():
                 """, unsafe_allow_html=True)
     
     with st.expander("🌍 Country Comparison", expanded=False):
-        st.markdown("Compare costs across different countries for the same lifestyle")
-
-        # Create comparison data
-        comparison_data = []
-        for country_name, lifestyle_data in COST_DATA.items():
-            total_cost = sum(lifestyle_data[lifestyle].values())
-            comparison_data.append({
-                'Country': country_name,
-                'Monthly Cost': total_cost,
-                'Yearly Cost': total_cost * 12
-            })
-
-        # Sort by monthly cost
-        comparison_data.sort(key=lambda x: x['Monthly Cost'])
+        reporting_currency = get_reporting_currency()
+        st.markdown(
+            f"Compare costs across countries and cities, converted to {reporting_currency} at today's rates"
+        )
 
-        # Display comparison
-        cols = st.columns(len(comparison_data))
+        # Custom budgets have no city data, so compare them at the moderate level
+        compare_lifestyle = lifestyle if lifestyle in cost_of_living.lifestyles else "moderate"
+        medians = cost_of_living.country_medians(compare_lifestyle, reporting_currency)
+        order = np.argsort(medians, kind="stable")
 
-        for i, data in enumerate(comparison_data):
+        # Display comparison of each country's typical (median) city, cheapest first
+        cols = st.columns(len(order))
+        for i, code in enumerate(order.tolist()):
             with cols[i]:
-                is_selected = data['Country'] == country
-                card_class = "comparison-card selected" if is_selected else "comparison-card"
-
+                country_name = cost_of_living.countries[code]
+                card_class = "comparison-card selected" if country_name == country else "comparison-card"
                 st.markdown(f"""
                 <div class="{card_class}">
-                    <h4>{data['Country']}</h4>
-                    <div class="comparison-monthly">{get_country_info()[data['Country']]['symbol']}{data['Monthly Cost']:,.0f}/month</div>
-                    <div class="comparison-yearly">{get_country_info()[data['Country']]['symbol']}{data['Yearly Cost']:,.0f}/year</div>
-                    <div class="comparison-lifestyle">{lifestyle.title()} lifestyle</div>
+                    <h4>{country_name}</h4>
+                    <div class="comparison-monthly">{format_currency(medians[code])}/month</div>
+                    <div class="comparison-yearly">{format_currency(medians[code] * 12)}/year</div>
+                    <div class="comparison-lifestyle">{compare_lifestyle.title()} lifestyle</div>
                 </div>
                 """, unsafe_allow_html=True)
-    
+
+        st.markdown("#### 🏙️ Cheapest Cities")
+        col_filters, col_sort = st.columns(2)
+        with col_filters:
+            compare_countries = st.multiselect(
+                "Countries", cost_of_living.countries, placeholder="All countries", key="compare_countries"
+            )
+            max_total = st.number_input(
+                f"Max monthly total ({reporting_currency}, 0 for no limit)",
+                min_value=0,
+                value=0,
+                step=100,
+                key="compare_max_total",
+            )
+        with col_sort:
+            sort_by = st.selectbox(
+                "Sort by", ["Monthly total"] + cost_of_living.categories,
+                format_func=str.title, key="compare_sort_by",
+            )
+            top_n = st.slider("Cities to show", min_value=5, max_value=100, value=20, step=5, key="compare_top_n")
+        rows, city_costs, city_totals = cost_of_living.compare(
+            compare_lifestyle,
+            reporting_currency,
+            max_total=max_total,
+            countries=compare_countries,
+            sort_by=None if sort_by == "Monthly total" else sort_by,
+            top=top_n,
+        )
+        if len(rows) == 0:
+            st.info("No cities match these filters.")
+        else:
+            city_labels = [f"{cost_of_living.cities[row]}, {cost_of_living.countries[cost_of_living.country_codes[row]]}"
+                           for row in rows.tolist()]
+            view = st.radio("View", ["Table", "Heatmap"], horizontal=True, key="compare_view")
+            if view == "Table":
+                table = pd.DataFrame(city_costs, columns=[category.title() for category in cost_of_living.categories])
+                table.insert(0, "City", city_labels)
+                table["Monthly total"] = city_totals
+                table["Yearly total"] = city_totals * 12
+                st.dataframe(
+                    table,
+                    hide_index=True,
+                    use_container_width=True,
+                    column_config={
+                        column: st.column_config.NumberColumn(format="%.0f")
+                        for column in table.columns if column != "City"
+                    },
+                )
+            else:
+                fig_heatmap = px.imshow(
+                    city_costs,
+                    x=[category.title() for category in cost_of_living.categories],
+                    y=city_labels,
+                    color_continuous_scale="RdYlGn_r",
+                    aspect="auto",
+                    labels={"color": f"{reporting_currency}/month"},
+                )
+                fig_heatmap.update_layout(height=max(300, 22 * len(rows)), font=dict(size=11))
+                st.plotly_chart(fig_heatmap, use_container_width=True)
+
+    with st.expander("🎲 Cost Simulation", expanded=False):
+        st.markdown(
+            f"Costs vary from month to month. {SIMULATION_SAMPLES:,} simulated years show the range "
+            "your spending is likely to fall in."
+        )
+        col_settings, col_results = st.columns([1, 2])
+        with col_settings:
+            volatility = {}
+            for category in custom_costs:
+                volatility[category] = st.slider(
+                    f"{category.title()} variation (%)",
+                    min_value=0,
+                    max_value=100,
+                    value=int(DEFAULT_VOLATILITY.get(category, 0.2) * 100),
+                    step=5,
+                    key=f"sim_volatility_{category}",
+                ) / 100
+            shock_probability = st.slider(
+                "Chance of a one-off expense each month (%)",
+                min_value=0,
+                max_value=50,
+                value=int(DEFAULT_SHOCK_PROBABILITY * 100),
+                key="sim_shock_probability",
+                help="e.g. a medical bill, a laptop repair or a flight home",
+            ) / 100
+            shock_size = st.number_input(
+                f"One-off expense size ({get_country_info()[country]['symbol']})",
+                min_value=0,
+                value=500,
+                step=50,
+                key="sim_shock_size",
+            )
+        simulation = simulate_costs(
+            tuple((float(custom_costs[category]), volatility[category]) for category in custom_costs),
+            shock_probability,
+            float(shock_size),
+        )
+        with col_results:
+            monthly_p10, monthly_p50, monthly_p90 = percentiles(simulation["monthly"])
+            yearly_p10, yearly_p50, yearly_p90 = percentiles(simulation["yearly"])
+            col_p10, col_p50, col_p90 = st.columns(3)
+            col_p10.metric("Good month (P10)", format_currency(monthly_p10, country))
+            col_p50.metric("Typical month (P50)", format_currency(monthly_p50, country))
+            col_p90.metric("Bad month (P90)", format_currency(monthly_p90, country))
+            col_p10.metric("Good year (P10)", format_currency(yearly_p10, country))
+            col_p50.metric("Typical year (P50)", format_currency(yearly_p50, country))
+            col_p90.metric("Bad year (P90)", format_currency(yearly_p90, country))
+            test_budget = st.number_input(
+                "Monthly budget to test",
+                min_value=0,
+                value=int(round(total_monthly)),
+                step=50,
+                key="sim_test_budget",
+            )
+            st.write(
+                f"Chance a month costs more than {format_currency(test_budget, country)}: "
+                f"**{exceed_probability(simulation['monthly'], test_budget):.0%}**. "
+                f"Chance a year costs more than {format_currency(test_budget * 12, country)}: "
+                f"**{exceed_probability(simulation['yearly'], test_budget * 12):.0%}**."
+            )
+            counts, edges = np.histogram(simulation["monthly"], bins=60)
+            fig_hist = go.Figure(go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=counts / counts.sum() * 100))
+            fig_hist.add_vline(x=test_budget, line_dash="dash", line_color="red")
+            fig_hist.update_layout(
+                height=300, xaxis_title="Monthly total", yaxis_title="% of simulated months", bargap=0
+            )
+            st.plotly_chart(fig_hist, use_container_width=True)
+
+    with st.expander("📈 Cost of Your Whole Program", expanded=False):
+        st.markdown(
+            "Prices, rent and tuition rise over a degree, and exchange rates drift against the currency "
+            "you pay from. This projects every month of your program under three scenarios."
+        )
+        local_currency = get_reporting_currency(country)
+        rates = get_exchange_rates()
+        col_program, col_rates = st.columns(2)
+        with col_program:
+            program_years = st.slider("Program length (years)", min_value=1, max_value=5, value=2, key="projection_years")
+            tuition = st.number_input(
+                f"Tuition per year ({currency_symbol})", min_value=0, value=0, step=1000, key="projection_tuition"
+            )
+            home_currency = st.selectbox(
+                "Currency you pay from",
+                rates.currencies,
+                index=rates.currencies.index(DEFAULT_CURRENCY) if DEFAULT_CURRENCY in rates.currencies else 0,
+                key="projection_home_currency",
+            )
+        with col_rates:
+            inflation = st.slider("Price inflation per year (%)", 0.0, 10.0, 3.0, 0.5, key="projection_inflation") / 100
+            rent_increase = st.slider("Rent increase per year (%)", 0.0, 15.0, 4.0, 0.5, key="projection_rent") / 100
+            tuition_increase = st.slider(
+                "Tuition increase per year (%)", 0.0, 15.0, 3.0, 0.5, key="projection_tuition_increase"
+            ) / 100
+            fx_drift = st.slider(
+                f"{local_currency} change against {home_currency} per year (%)",
+                -15.0, 15.0, 0.0, 0.5,
+                key="projection_fx_drift",
+                help="Positive if the destination currency gets more expensive for you",
+            ) / 100
+
+        program_start = st.session_state.get("course_start_date") or datetime.now().date()
+        fx_rate = float(rates.convert([1.0], [0], [local_currency], [program_start.toordinal()], home_currency)[0])
+        projection = project_costs(
+            float(custom_costs.get("rent", 0)),
+            float(total_monthly - custom_costs.get("rent", 0)),
+            float(tuition),
+            program_years * 12,
+            inflation,
+            rent_increase,
+            tuition_increase,
+            fx_rate,
+            fx_drift,
+        )
+        expected = list(SCENARIOS).index("Expected")
+        col_total, col_range, col_naive = st.columns(3)
+        col_total.metric("Expected total", f"{projection['cumulative'][expected, -1]:,.0f} {home_currency}")
+        col_range.metric(
+            "Optimistic – pessimistic",
+            f"{projection['cumulative'][0, -1]:,.0f} – {projection['cumulative'][-1, -1]:,.0f}",
+        )
+        flat_total = (total_yearly + tuition) * program_years * fx_rate
+        col_naive.metric(
+            "Without any increases",
+            f"{flat_total:,.0f} {home_currency}",
+            help="Today's yearly cost and tuition times the program length",
+        )
+
+        months = pd.date_range(program_start.replace(day=1), periods=program_years * 12, freq="MS")
+        fig_projection = go.Figure()
+        for i, scenario in enumerate(SCENARIOS):
+            fig_projection.add_trace(go.Scatter(
+                x=months,
+                y=projection["cumulative"][i],
+                name=scenario,
+                mode="lines",
+                line=dict(dash="solid" if i == expected else "dot"),
+            ))
+        fig_projection.update_layout(
+            height=350,
+            xaxis_title="Month",
+            yaxis_title=f"Funding needed ({home_currency})",
+            hovermode="x unified",
+        )
+        st.plotly_chart(fig_projection, use_container_width=True)
+
     # Tips and recommendations
     with st.expander("💡 Money-Saving Tips", expanded=False):
         tips_by_lifestyle = {
@@ -397,7 +645,7 @@ def main():
         ]
     }
     
-        current_tips = tips_by_lifestyle[lifestyle]
+        current_tips = tips_by_lifestyle.get(lifestyle, tips_by_lifestyle["moderate"])
 
         for tip in current_tips:
             st.markdown(f"""
@@ -407,15 +655,17 @@ def main():
             """, unsafe_allow_html=True)
     
     with st.expander("🚨 Emergency Fund Recommendation", expanded=False):
-        emergency_fund = total_monthly * 3  # 3 months of expenses
+        # Enough for EMERGENCY_MONTHS in all but the worst simulated outcomes
+        emergency_fund = simulation["emergency_fund"]
 
         st.markdown(f"""
         <div class="emergency-fund-card">
             <h4>💰 Recommended Emergency Fund</h4>
             <div class="emergency-amount">{format_currency(emergency_fund, country)}</div>
             <div class="emergency-description">
-                Having 3 months of expenses saved can help you handle unexpected situations like
-                medical emergencies, travel costs, or temporary income loss.
+                Covers {EMERGENCY_MONTHS} months of expenses in {EMERGENCY_PERCENTILE}% of simulated outcomes,
+                helping you handle unexpected situations like medical emergencies, travel costs,
+                or temporary income loss.
             </div>
         </div>
         """, unsafe_allow_html=True)
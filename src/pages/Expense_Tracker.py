@@ -1,9 +1,25 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from datetime import datetime, timedelta
-from utils import load_css, check_authentication, format_currency, get_country_info, render_sidebar
+from datetime import date as calendar_date, datetime
+from utils import (
+    load_css,
+    check_authentication,
+    format_currency,
+    get_country_info,
+    get_reporting_currency,
+    render_sidebar,
+)
+from budget_periods import budget_vs_actual, default_start, BUDGET_PERIODS
+from category_tree import CategoryTree, budget_total, category_label, normalize_category, rollup
+from data_store import get_data_store
+from expense_ledger import get_ledger, period_bounds, shift_years, PERIOD_OPTIONS
+from expense_forecast import forecast_spend, FORECAST_PERIODS
+from expense_anomalies import detect_anomalies
+from expense_groups import get_groups
+from recurring import detect_recurring, confirm_rule, post_due_expenses
+from expense_charts import category_sunburst, spending_trend, CHART_RESOLUTIONS
+from exchange_rates import get_exchange_rates
+from statement_import import import_statement, read_csv_header, StatementImportError
 
 # Page configuration
 st.set_page_config(page_title="Expense Tracker", page_icon="💰", layout="wide")
@@ -19,26 +35,74 @@ if st.session_state.get("logged_in", False):
 
 country_info = get_country_info()
 currency_symbol = country_info[st.session_state.selected_country]['symbol']
+# Totals are shown in the selected country's currency, converted per expense date
+reporting_currency = get_reporting_currency()
 
-# Initialize expense data in session state
-if 'expenses' not in st.session_state:
-    st.session_state.expenses = [
-        {"date": "2024-01-01", "category": "Rent", "amount": 800.00, "description": "Monthly rent payment"},
-        {"date": "2024-01-02", "category": "Food", "amount": 45.50, "description": "Groceries"},
-        {"date": "2024-01-03", "category": "Travel", "amount": 25.00, "description": "Bus pass"},
-        {"date": "2024-01-04", "category": "Utilities", "amount": 120.00, "description": "Electricity and water"},
-        {"date": "2024-01-05", "category": "Food", "amount": 12.50, "description": "Lunch"},
-    ]
+DEFAULT_EXPENSES = [
+    {"date": "2024-01-01", "category": "Rent", "amount": 800.00, "description": "Monthly rent payment"},
+    {"date": "2024-01-02", "category": "Food > Groceries", "amount": 45.50, "description": "Groceries"},
+    {"date": "2024-01-03", "category": "Travel > Local", "amount": 25.00, "description": "Bus pass"},
+    {"date": "2024-01-04", "category": "Utilities", "amount": 120.00, "description": "Electricity and water"},
+    {"date": "2024-01-05", "category": "Food > Dining", "amount": 12.50, "description": "Lunch"},
+]
+
+# Nested categories are written "Parent > Child"; a child's budget is a share of its parent's
+DEFAULT_BUDGET = {
+    "Rent": 800,
+    "Food": 300,
+    "Food > Groceries": 200,
+    "Food > Dining": 100,
+    "Travel": 100,
+    "Travel > Local": 60,
+    "Travel > Flights": 40,
+    "Utilities": 150,
+    "Entertainment": 100,
+    "Other": 50
+}
+
+TRANSACTIONS_PAGE_SIZE = 10
+
+store = get_data_store()
+username = st.session_state.username
+
+# Columnar expense ledger, loaded once per process and shared across sessions
+ledger = get_ledger(username, default=DEFAULT_EXPENSES)
 
 if 'budget' not in st.session_state:
-    st.session_state.budget = {
-        "Rent": 800,
-        "Food": 300,
-        "Travel": 100,
-        "Utilities": 150,
-        "Entertainment": 100,
-        "Other": 50
-    }
+    st.session_state.budget = store.load_budget(username, default=DEFAULT_BUDGET)
+
+def format_amount(amount, currency):
+    """Format an amount with the country symbol, or its code if it's in another currency"""
+    if currency == reporting_currency:
+        return format_currency(amount)
+    return f"{amount:,.2f} {currency}"
+
+
+def category_tree_html(tree, nodes, spent, allocations, scale):
+    """Nested, collapsible budget cards for ``nodes`` and their subcategories"""
+    parts = []
+    for node in nodes:
+        amount = spent.get(node, 0)
+        budget = allocations.get(node, 0) * scale
+        percentage = (amount / budget * 100) if budget > 0 else 0
+        status = "positive" if percentage <= 80 else "negative" if percentage > 100 else "neutral"
+        card = (
+            f'<div class="category-card"><h4>{category_label(node)}</h4>'
+            f'<div class="category-amount">{format_currency(amount)} / {format_currency(budget)}</div>'
+            f'<div class="progress-bar"><div class="progress-fill {status}" style="width: {min(percentage, 100):.1f}%"></div></div>'
+            f'<div class="category-percentage">{percentage:.1f}% used</div></div>'
+        )
+        children = tree.children.get(node)
+        if children:
+            parts.append(
+                f'<details class="category-node"><summary>{card}</summary>'
+                f'<div class="category-children">{category_tree_html(tree, children, spent, allocations, scale)}</div>'
+                f'</details>'
+            )
+        else:
+            parts.append(card)
+    return "".join(parts)
+
 
 def main():
     st.markdown("""
@@ -55,8 +119,8 @@ def main():
     st.markdown("Track your daily expenses and monitor your budget")
     
     # Welcome message with progress
-    if 'expenses' in st.session_state and len(st.session_state.expenses) > 0:
-        total_expenses = len(st.session_state.expenses)
+    if len(ledger) > 0:
+        total_expenses = len(ledger)
         st.success(f"Great job! You've tracked {total_expenses} expenses so far. Keep it up!")
     else:
         st.info("Welcome to your expense tracker! Start by adding your first expense below.")
@@ -64,16 +128,46 @@ def main():
     # Budget overview cards
     st.subheader("Budget Overview")
     
+    # Reporting period
+    today = datetime.now().date()
+    col_period, col_range, col_compare = st.columns([1, 1, 1])
+    with col_period:
+        period = st.selectbox("Period", PERIOD_OPTIONS, key="expense_period")
+    custom_range = None
+    with col_range:
+        if period == "Custom range":
+            picked = st.date_input("Date range", (today.replace(day=1), today), key="expense_range")
+            custom_range = (picked[0], picked[-1]) if picked else (today, today)
+    start, end = period_bounds(period, today, custom_range)
+    period_rows = ledger.rows_between(start, end)
+
     # Calculate totals
-    df_expenses = pd.DataFrame(st.session_state.expenses)
-    if not df_expenses.empty:
-        df_expenses['date'] = pd.to_datetime(df_expenses['date'])
-        current_month_expenses = df_expenses[df_expenses['date'].dt.month == datetime.now().month]
-        spent_by_category = current_month_expenses.groupby('category')['amount'].sum().to_dict()
+    if period == "This month" and ledger.uses_only(reporting_currency):
+        spent_by_category = ledger.aggregates.month(today.year, today.month)
+        spent_by_node = ledger.aggregates.subtree_month(today.year, today.month)
     else:
-        spent_by_category = {}
-    
-    total_budget = sum(st.session_state.budget.values())
+        spent_by_category = ledger.spent_by_category(period_rows, reporting_currency)
+        spent_by_node = rollup(spent_by_category)
+    if period == "This month":
+        budget_scale = 1.0
+    else:
+        # Budgets are monthly allocations; scale them to the length of the period
+        budget_scale = ((end - start).days + 1) / (365.25 / 12)
+    budget_label = "Monthly allocation" if budget_scale == 1.0 else f"{start:%b %d, %Y} - {end:%b %d, %Y}"
+
+    with col_compare:
+        last_year_rows = ledger.rows_between(shift_years(start, -1), shift_years(end, -1))
+        last_year_spent = float(ledger.converted_amounts(reporting_currency)[last_year_rows].sum())
+        period_spent = sum(spent_by_category.values())
+        change = ((period_spent - last_year_spent) / last_year_spent * 100) if last_year_spent else None
+        st.metric(
+            "Same period last year",
+            format_currency(last_year_spent),
+            delta=f"{change:+.1f}% this year" if change is not None else None,
+            delta_color="inverse",
+        )
+
+    total_budget = budget_total(st.session_state.budget) * budget_scale
     total_spent = sum(spent_by_category.values())
     remaining = total_budget - total_spent
 
@@ -95,7 +189,7 @@ def main():
             <div class="metric-content">
                 <h3>Total Budget</h3>
                 <div class="metric-value">{format_currency(total_budget)}</div>
-                <div class="metric-change neutral">Monthly allocation</div>
+                <div class="metric-change neutral">{budget_label}</div>
             </div>
         </div>
         """, unsafe_allow_html=True)
@@ -129,6 +223,72 @@ def main():
     if remaining > 0 and suggestion:
         st.info(f"With your savings, you could afford {suggestion}.")
 
+    # Projected spend per category at the end of the month or semester
+    col_title, col_horizon = st.columns([2, 1])
+    with col_title:
+        st.markdown("#### 📈 Spending Forecast")
+    with col_horizon:
+        horizon = st.radio(
+            "Forecast to", list(FORECAST_PERIODS), horizontal=True, key="expense_forecast_period",
+            label_visibility="collapsed",
+        )
+    forecast = forecast_spend(ledger, today, horizon, reporting_currency)
+    forecast_start, forecast_end = period_bounds(FORECAST_PERIODS[horizon], today)
+    forecast_scale = 1.0 if horizon == "Month-end" else ((forecast_end - forecast_start).days + 1) / (365.25 / 12)
+    projected_by_node = rollup({category: projected for category, (_, projected) in forecast.items()})
+    forecast_cols = st.columns(3)
+    for i, (category, allocation) in enumerate(st.session_state.budget.items()):
+        projected = projected_by_node.get(category, 0.0)
+        limit = allocation * forecast_scale
+        with forecast_cols[i % 3]:
+            if projected > limit:
+                st.error(f"**{category}**: will overshoot by {format_currency(projected - limit)}")
+            else:
+                st.success(f"**{category}**: on track ({format_currency(projected)} of {format_currency(limit)})")
+
+    # Budget vs actual for the monthly budget and every weekly/monthly/semester budget,
+    # each over its own current window
+    st.markdown("#### 🗓️ Budget Periods")
+    course_start = st.session_state.get("course_start_date")
+    period_budgets = store.load(username, "budget_periods")
+    budgets = [
+        {"category": category, "period": "Monthly", "amount": amount, "start": today.replace(day=1)}
+        for category, amount in st.session_state.budget.items()
+    ] + [
+        {
+            "id": budget["id"],
+            "category": budget["category"],
+            "period": budget["period"],
+            "amount": budget["amount"],
+            # Semester budgets without a start date follow the Visa Planner's course start date
+            "start": calendar_date.fromisoformat(budget["start_date"]) if budget["start_date"]
+            else default_start(budget["period"], today, course_start),
+        }
+        for budget in period_budgets
+    ]
+    comparison = budget_vs_actual(ledger, budgets, today, reporting_currency)
+    st.dataframe(
+        pd.DataFrame({
+            "Category": [budget["category"] for budget in comparison],
+            "Period": [budget["period"] for budget in comparison],
+            "From": [budget["window_start"] for budget in comparison],
+            "To": [budget["window_end"] for budget in comparison],
+            "Spent": [budget["spent"] for budget in comparison],
+            "Budget": [budget["amount"] for budget in comparison],
+            "Used %": [budget["spent"] / budget["amount"] * 100 if budget["amount"] else 0.0 for budget in comparison],
+        }),
+        hide_index=True,
+        use_container_width=True,
+        column_config={
+            "Spent": st.column_config.NumberColumn(format="%.2f"),
+            "Budget": st.column_config.NumberColumn(format="%.2f"),
+            "Used %": st.column_config.ProgressColumn(format="%.0f%%", min_value=0, max_value=100),
+        },
+    )
+    waiting = [budget for budget in budgets if budget["start"] > today]
+    if waiting:
+        st.caption(", ".join(f"{b['category']} ({b['period'].lower()}) starts {b['start']:%b %d, %Y}" for b in waiting))
+
     st.markdown("---")
 
     # Two columns layout
@@ -136,20 +296,37 @@ def main():
 
     with col1:
         with st.expander("Add New Expense", expanded=False):
+            # Typed outside the form so the category suggestion follows the description
+            if st.session_state.pop("clear_expense_description", False):
+                st.session_state.expense_description = ""
+            description = st.text_input("Description", key="expense_description")
+            categories = list(st.session_state.budget.keys())
+            suggested = ledger.categorizer.suggest(description, choices=categories) if description.strip() else None
+            if suggested:
+                st.caption(f"Suggested category: {suggested}")
             with st.form("expense_form"):
                 date = st.date_input("Date", datetime.now())
-                category = st.selectbox("Category", list(st.session_state.budget.keys()))
-                amount = st.number_input(f"Amount ({currency_symbol})", min_value=0.01, step=0.01)
-                description = st.text_input("Description")
+                category = st.selectbox(
+                    "Category", categories, index=categories.index(suggested) if suggested else 0
+                )
+                amount = st.number_input("Amount", min_value=0.01, step=0.01)
+                currencies = get_exchange_rates().currencies
+                currency = st.selectbox(
+                    "Currency",
+                    currencies,
+                    index=currencies.index(reporting_currency) if reporting_currency in currencies else 0,
+                )
 
                 if st.form_submit_button("Add Expense", use_container_width=True):
                     new_expense = {
                         "date": date.strftime("%Y-%m-%d"),
                         "category": category,
                         "amount": float(amount),
-                        "description": description
+                        "description": description,
+                        "currency": currency,
                     }
-                    st.session_state.expenses.append(new_expense)
+                    ledger.add(new_expense)
+                    st.session_state.clear_expense_description = True
                     st.success("Expense added successfully!")
                     st.rerun()
     
@@ -158,78 +335,334 @@ def main():
             with st.form("budget_form"):
                 st.markdown("Update your monthly budget allocations:")
                 new_budget = {}
-                for category, current_amount in st.session_state.budget.items():
+                budget_tree = CategoryTree(st.session_state.budget)
+                for category, depth in budget_tree.walk():
+                    if category not in st.session_state.budget:
+                        continue
                     new_budget[category] = st.number_input(
-                        f"{category} ({currency_symbol})",
+                        f"{'↳ ' * depth}{category_label(category)} ({currency_symbol})",
                         min_value=0.0,
-                        value=float(current_amount),
+                        value=float(st.session_state.budget[category]),
                         step=10.0,
+                        key=f"budget_{category}",
                     )
+                new_category = normalize_category(
+                    st.text_input("Add a category", placeholder="e.g. Food > Groceries")
+                )
+                new_amount = st.number_input(f"Its budget ({currency_symbol})", min_value=0.0, step=10.0)
+                if new_category:
+                    new_budget[new_category] = new_amount
                 if st.form_submit_button("Update Budget", use_container_width=True):
+                    store.set_budget(username, new_budget)
                     st.session_state.budget = new_budget
-                    new_total = sum(new_budget.values())
+                    new_total = budget_total(new_budget)
                     st.toast(f"New total budget: {format_currency(new_total)}")
                     st.write("Updated Budget:")
                     st.json(new_budget)
                     st.success("Budget updated successfully!")
                     st.rerun()
 
+            st.markdown("**Weekly, monthly and semester budgets**")
+            for budget in period_budgets:
+                col_label, col_remove = st.columns([0.85, 0.15])
+                with col_label:
+                    starts = budget["start_date"] or "course start date"
+                    st.write(f"{budget['category']} - {format_currency(budget['amount'])} "
+                             f"{budget['period'].lower()} from {starts}")
+                with col_remove:
+                    if st.button("🗑️", key=f"remove_budget_period_{budget['id']}"):
+                        store.delete(username, "budget_periods", budget["id"])
+                        st.rerun()
+            with st.form("budget_period_form"):
+                period_category = st.selectbox("Category", list(st.session_state.budget.keys()), key="budget_period_category")
+                budget_period = st.selectbox("Period", list(BUDGET_PERIODS), key="budget_period")
+                period_amount = st.number_input(f"Amount ({currency_symbol})", min_value=0.0, step=10.0, key="budget_period_amount")
+                follow_course = st.checkbox(
+                    "Semester starts on my course start date",
+                    value=course_start is not None,
+                    help="Set the course start date in the Visa Planner.",
+                )
+                period_start = st.date_input("Starts on", default_start(budget_period, today))
+                if st.form_submit_button("Add Period Budget", use_container_width=True):
+                    store.add(username, "budget_periods", {
+                        "category": period_category,
+                        "period": budget_period,
+                        "amount": period_amount,
+                        "start_date": None if budget_period == "Semester" and follow_course else period_start.isoformat(),
+                    })
+                    st.rerun()
+
+    with st.expander("🔁 Recurring Expenses", expanded=False):
+        rules = store.load(username, "recurring_rules")
+        if rules:
+            st.markdown("**Active rules** — posted automatically when they fall due")
+            for rule in rules:
+                col_text, col_delete = st.columns([0.9, 0.1])
+                with col_text:
+                    st.write(
+                        f"{rule['description']} ({rule['category']}) - {format_amount(rule['amount'], rule['currency'])} "
+                        f"{rule['frequency']}, next on {rule['next_date']}"
+                    )
+                with col_delete:
+                    if st.button("🗑️", key=f"delete_rule_{rule['id']}", help="Stop this recurring expense"):
+                        store.delete(username, "recurring_rules", rule['id'])
+                        st.rerun()
+
+        candidates = detect_recurring(ledger, today, rules)
+        if candidates:
+            st.markdown("**Detected** — confirm to post future occurrences automatically")
+            for i, candidate in enumerate(candidates):
+                col_text, col_confirm = st.columns([0.8, 0.2])
+                with col_text:
+                    st.write(
+                        f"{candidate['description']} ({candidate['category']}) - "
+                        f"{format_amount(candidate['amount'], candidate['currency'])} {candidate['frequency']}, "
+                        f"seen {candidate['occurrences']} times, next on {candidate['next_date']}"
+                    )
+                with col_confirm:
+                    if st.button("Confirm", key=f"confirm_recurring_{i}", use_container_width=True):
+                        confirm_rule(username, candidate)
+                        post_due_expenses(username, ledger, today)
+                        st.rerun()
+        elif not rules:
+            st.caption("No recurring expenses found yet. Payments repeated at a regular interval will show up here.")
+
+    with st.expander("👥 Shared Expenses", expanded=False):
+        groups = get_groups(username)
+        with st.form("expense_group_form"):
+            st.markdown("Create a group for a shared flat, trip or anything else you split.")
+            group_name = st.text_input("Group name", placeholder="e.g. Flat 3B")
+            group_members = st.text_input("Other members", placeholder="Comma-separated names")
+            group_currencies = get_exchange_rates().currencies
+            group_currency = st.selectbox(
+                "Group currency",
+                group_currencies,
+                index=group_currencies.index(reporting_currency) if reporting_currency in group_currencies else 0,
+            )
+            if st.form_submit_button("Create Group", use_container_width=True) and group_name.strip():
+                others = [name.strip() for name in group_members.split(",") if name.strip()]
+                groups.create(group_name.strip(), [username] + others, group_currency)
+                st.rerun()
+
+        if groups.groups:
+            group = groups.groups[st.selectbox(
+                "Group", list(groups.groups), format_func=lambda group_id: groups.groups[group_id].name,
+                key="shared_group",
+            )]
+            with st.form("shared_expense_form"):
+                shared_description = st.text_input("Description", key="shared_description")
+                shared_amount = st.number_input(f"Amount ({group.currency})", min_value=0.01, step=0.01)
+                paid_by = st.selectbox("Paid by", group.members)
+                split_among = st.multiselect("Split equally among", group.members, default=group.members)
+                share_category = st.selectbox(
+                    "Category for your share", list(st.session_state.budget.keys()), key="shared_category"
+                )
+                if st.form_submit_button("Add Shared Expense", use_container_width=True) and split_among:
+                    groups.add_expense(
+                        group, today.isoformat(), shared_description, shared_amount, paid_by,
+                        {member: 1 for member in split_among},
+                    )
+                    if username in split_among:
+                        # Your own share also counts toward your personal spending
+                        ledger.add({
+                            "date": today.isoformat(),
+                            "category": share_category,
+                            "amount": round(shared_amount / len(split_among), 2),
+                            "description": f"{shared_description} ({group.name})",
+                            "currency": group.currency,
+                        })
+                    st.rerun()
+
+            st.markdown(f"**Balances** ({group.expense_count:,} shared expenses)")
+            st.dataframe(
+                pd.DataFrame({
+                    "Member": group.members,
+                    "Balance": [group.balance(member) for member in group.members],
+                }),
+                hide_index=True,
+                use_container_width=True,
+                column_config={"Balance": st.column_config.NumberColumn(format="%.2f")},
+            )
+            transfers = group.settle_up()
+            if transfers:
+                st.markdown("**Settle up**")
+                for i, (payer, payee, amount) in enumerate(transfers):
+                    col_text, col_paid = st.columns([0.75, 0.25])
+                    with col_text:
+                        st.write(f"{payer} pays {payee} {format_amount(amount, group.currency)}")
+                    with col_paid:
+                        if st.button("Mark paid", key=f"settle_{group.id}_{i}", use_container_width=True):
+                            groups.record_payment(group, today.isoformat(), payer, payee, amount)
+                            st.rerun()
+            else:
+                st.caption("Everyone is settled up.")
+            if st.button("Delete group", key=f"delete_group_{group.id}"):
+                groups.delete(group)
+                st.rerun()
+
+    with st.expander("Import Bank Statement", expanded=False):
+        st.markdown("Upload a CSV, OFX or QFX statement. Duplicates of existing expenses are skipped, and rows without a category are categorized from your past expenses.")
+        uploaded = st.file_uploader("Statement file", type=["csv", "ofx", "qfx"], key="statement_upload")
+        if uploaded is not None:
+            file_format = "ofx" if uploaded.name.lower().endswith((".ofx", ".qfx")) else "csv"
+            column_map = None
+            date_format = "%Y-%m-%d"
+            if file_format == "csv":
+                header = read_csv_header(uploaded)
+                optional = ["(none)"] + header
+
+                def guess(*names):
+                    for i, column in enumerate(header):
+                        if column.strip().lower() in names:
+                            return i
+                    return 0
+
+                col_a, col_b = st.columns(2)
+                with col_a:
+                    date_column = st.selectbox("Date column", header, index=guess("date", "posted date", "transaction date"))
+                    amount_column = st.selectbox("Amount column", header, index=guess("amount", "value"))
+                    date_format = st.text_input("Date format", "%Y-%m-%d", help="e.g. %m/%d/%Y or %d.%m.%Y")
+                with col_b:
+                    description_column = st.selectbox("Description column", header, index=guess("description", "name", "memo", "payee"))
+                    category_column = st.selectbox("Category column", optional)
+                column_map = {
+                    "date": date_column,
+                    "amount": amount_column,
+                    "description": description_column,
+                    "category": None if category_column == "(none)" else category_column,
+                }
+            currencies = get_exchange_rates().currencies
+            statement_currency = st.selectbox(
+                "Statement currency",
+                currencies,
+                index=currencies.index(reporting_currency) if reporting_currency in currencies else 0,
+            )
+            negative_is_spending = st.radio(
+                "Amount sign",
+                ["Negative amounts are spending", "All amounts are spending"],
+                horizontal=True,
+            ) == "Negative amounts are spending"
+
+            if st.button("Import Transactions", use_container_width=True):
+                try:
+                    with st.spinner("Importing..."):
+                        result = import_statement(
+                            ledger,
+                            uploaded,
+                            file_format,
+                            column_map=column_map,
+                            date_format=date_format,
+                            negative_is_spending=negative_is_spending,
+                            currency=statement_currency,
+                        )
+                except StatementImportError as e:
+                    st.error(str(e))
+                else:
+                    st.success(
+                        f"Imported {result['imported']:,} of {result['rows']:,} rows "
+                        f"({result['rows_per_sec']:,.0f} rows/sec)."
+                    )
+                    st.caption(
+                        f"Auto-categorized: {result['categorized']:,} | "
+                        f"Duplicates skipped: {result['duplicates']:,} | "
+                        f"Credits skipped: {result['credits_skipped']:,} | "
+                        f"Rejected rows: {result['rejected']:,}"
+                    )
+
     st.markdown("---")
 
-    if not df_expenses.empty:
+    if len(ledger) > 0:
         with st.expander("Category Breakdown", expanded=False):
-            categories = list(st.session_state.budget.keys())
-            cols = st.columns(len(categories))
-            for i, category in enumerate(categories):
-                with cols[i]:
-                    spent = spent_by_category.get(category, 0)
-                    budget = st.session_state.budget[category]
-                    percentage = (spent / budget * 100) if budget > 0 else 0
-                    status = "positive" if percentage <= 80 else "negative" if percentage > 100 else "neutral"
-                    st.markdown(f"""
-                    <div class="category-card">
-                        <h4>{category}</h4>
-                        <div class="category-amount">{format_currency(spent)} / {format_currency(budget)}</div>
-                        <div class="progress-bar">
-                            <div class="progress-fill {status}" style="width: {min(percentage, 100):.1f}%"></div>
-                        </div>
-                        <div class="category-percentage">{percentage:.1f}% used</div>
-                    </div>
-                    """, unsafe_allow_html=True)
+            # Budgeted categories first, then any others with spending in the period
+            tree = CategoryTree(list(st.session_state.budget) + list(spent_by_category))
+            allocations = tree.budgets(st.session_state.budget)
+            tree_cols = st.columns(min(len(tree.roots), 3) or 1)
+            for i, root in enumerate(tree.roots):
+                with tree_cols[i % len(tree_cols)]:
+                    st.markdown(
+                        category_tree_html(tree, [root], spent_by_node, allocations, budget_scale),
+                        unsafe_allow_html=True,
+                    )
             col1, col2 = st.columns(2)
             with col1:
                 st.subheader("Spending by Category")
                 if spent_by_category:
-                    fig_pie = px.pie(
-                        values=list(spent_by_category.values()),
-                        names=list(spent_by_category.keys()),
-                        color_discrete_sequence=px.colors.qualitative.Set3
+                    st.plotly_chart(
+                        category_sunburst(ledger, start, end, spent_by_category, reporting_currency),
+                        use_container_width=True,
                     )
-                    fig_pie.update_layout(font=dict(size=12), showlegend=True, height=400)
-                    st.plotly_chart(fig_pie, use_container_width=True)
             with col2:
-                st.subheader("Monthly Spending Trend")
-                daily_spending = current_month_expenses.groupby('date')['amount'].sum().reset_index()
-                if not daily_spending.empty:
-                    fig_line = px.line(
-                        daily_spending,
-                        x='date',
-                        y='amount',
-                        title='Daily Spending This Month',
+                st.subheader("Spending Trend")
+                resolution = st.radio(
+                    "Resolution", CHART_RESOLUTIONS, horizontal=True, key="expense_chart_resolution"
+                )
+                if len(period_rows) > 0:
+                    st.plotly_chart(
+                        spending_trend(ledger, period_rows, start, end, resolution, period, reporting_currency),
+                        use_container_width=True,
                     )
-                    fig_line.update_layout(font=dict(size=12), height=400, xaxis_title="Date", yaxis_title="Amount")
-                    st.plotly_chart(fig_line, use_container_width=True)
 
     st.markdown("---")
 
     # Recent transactions
     with st.expander("Recent Transactions", expanded=False):
-        if df_expenses.empty:
+        if len(ledger) == 0:
             st.info("No expenses recorded yet. Add your first expense above!")
         else:
-            recent_expenses = sorted(st.session_state.expenses, key=lambda x: x['date'], reverse=True)[:10]
+            col_category, col_search = st.columns([0.4, 0.6])
+            with col_category:
+                txn_category = st.selectbox("Category", ["All"] + ledger.categories, key="txn_category")
+            with col_search:
+                txn_search = st.text_input("Search descriptions", key="txn_search")
+
+            # Stack of page start offsets; a new filter starts again from the newest expense
+            txn_filter = (username, txn_category, txn_search)
+            if st.session_state.get("txn_filter") != txn_filter:
+                st.session_state.txn_filter = txn_filter
+                st.session_state.txn_offsets = [0]
+            offsets = st.session_state.txn_offsets
+
+            recent_expenses, next_offset = ledger.newest_page(
+                offsets[-1],
+                TRANSACTIONS_PAGE_SIZE,
+                category=None if txn_category == "All" else txn_category,
+                search=txn_search,
+            )
+            anomalies = detect_anomalies(ledger, reporting_currency)
+            for run in anomalies["days"][-3:]:
+                period_text = f"{run['start']:%b %d, %Y}" if run["start"] == run["end"] else (
+                    f"{run['start']:%b %d} - {run['end']:%b %d, %Y}"
+                )
+                st.warning(
+                    f"⚠️ High spending on {period_text}: {format_currency(run['total'])} "
+                    f"(usually about {format_currency(run['usual'])})"
+                )
+            if not recent_expenses:
+                st.info("No transactions match these filters.")
             for expense in recent_expenses:
-                st.write(f"{expense['date']} - {expense['description']} ({expense['category']}) - {format_currency(expense['amount'])}")
+                col_text, col_delete = st.columns([0.9, 0.1])
+                with col_text:
+                    amount_text = format_amount(expense['amount'], expense['currency'])
+                    flag = anomalies["transactions"].get(expense['id'])
+                    if flag:
+                        amount_text += f" ⚠️ {flag['ratio']:.1f}x usual"
+                    st.write(f"{expense['date']} - {expense['description']} ({expense['category']}) - {amount_text}")
+                with col_delete:
+                    if st.button("🗑️", key=f"delete_expense_{expense['id']}", help="Delete expense"):
+                        ledger.delete(expense['id'])
+                        st.rerun()
+
+            col_newer, col_page, col_older = st.columns([0.3, 0.4, 0.3])
+            with col_newer:
+                if st.button("← Newer", disabled=len(offsets) == 1, use_container_width=True):
+                    offsets.pop()
+                    st.rerun()
+            with col_page:
+                st.caption(f"Page {len(offsets)}")
+            with col_older:
+                if st.button("Older →", disabled=next_offset is None, use_container_width=True):
+                    offsets.append(next_offset)
+                    st.rerun()
     with st.expander("💡 Expense Tips", expanded=False):
         st.write("- Review your spending each week")
         st.write("- Compare expenses against your budget")
@@ -1,6 +1,7 @@
 import streamlit as st
 from datetime import datetime, timedelta
 from utils import load_css, check_authentication, get_country_info, render_sidebar
+from data_store import get_data_store
 
 # Page configuration
 st.set_page_config(page_title="Job Board", page_icon="💼", layout="wide")
@@ -118,8 +119,11 @@ if 'job_listings' not in st.session_state:
         }
     ]
 
+store = get_data_store()
+username = st.session_state.username
+
 if 'job_applications' not in st.session_state:
-    st.session_state.job_applications = []
+    st.session_state.job_applications = store.load(username, "job_applications")
 
 def main():
     st.markdown("""
@@ -260,6 +264,7 @@ def main():
                             "applied_date": datetime.now().strftime("%Y-%m-%d"),
                             "status": "Applied"
                         }
+                        application["id"] = store.add(username, "job_applications", application)
                         st.session_state.job_applications.append(application)
                         st.success("Application submitted successfully!")
                         st.rerun()
@@ -1,5 +1,5 @@
 import streamlit as st
-from utils import load_css, initialize_session_state, register_user
+from utils import load_css, initialize_session_state, register_user, AuthBusyError
 
 st.set_page_config(page_title="Register", page_icon="📝", layout="wide")
 
@@ -20,7 +20,10 @@ with st.form("registration_form"):
         elif password != confirm:
             st.error("Passwords do not match.")
         else:
-            success, msg = register_user(username, password)
+            try:
+                success, msg = register_user(username, password)
+            except AuthBusyError as e:
+                success, msg = False, str(e)
             if success:
                 st.success(msg)
             else:
@@ -2,6 +2,7 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime, timedelta
 from utils import load_css, check_authentication, format_currency, get_country_info, get_housing_options, render_sidebar
+from data_store import get_data_store
 
 # Page configuration
 st.set_page_config(page_title="Visa Planner", page_icon="📋", layout="wide")
@@ -15,26 +16,33 @@ check_authentication()
 if st.session_state.get("logged_in", False):
     render_sidebar()
 
-# Initialize visa data
+DEFAULT_VISA_DOCUMENTS = [
+    {"name": "Passport", "status": "completed", "deadline": "2024-02-01", "priority": "high"},
+    {"name": "Bank Statement", "status": "completed", "deadline": "2024-02-15", "priority": "high"},
+    {"name": "Letter of Acceptance", "status": "in_progress", "deadline": "2024-03-01", "priority": "high"},
+    {"name": "Health Insurance", "status": "pending", "deadline": "2024-03-15", "priority": "medium"},
+    {"name": "Accommodation Proof", "status": "pending", "deadline": "2024-04-01", "priority": "medium"},
+    {"name": "Financial Sponsorship Letter", "status": "pending", "deadline": "2024-04-15", "priority": "low"},
+]
+
+DEFAULT_VISA_TIMELINE = [
+    {"step": "Research Visa Requirements", "status": "completed", "date": "2024-01-01"},
+    {"step": "Gather Required Documents", "status": "in_progress", "date": "2024-02-01"},
+    {"step": "Submit Visa Application", "status": "pending", "date": "2024-03-01"},
+    {"step": "Attend Visa Interview", "status": "pending", "date": "2024-03-15"},
+    {"step": "Receive Visa Decision", "status": "pending", "date": "2024-04-01"},
+    {"step": "Book Flight Tickets", "status": "pending", "date": "2024-04-15"},
+]
+
+store = get_data_store()
+username = st.session_state.username
+
+# Load the user's visa data on first visit to this page
 if 'visa_documents' not in st.session_state:
-    st.session_state.visa_documents = [
-        {"name": "Passport", "status": "completed", "deadline": "2024-02-01", "priority": "high"},
-        {"name": "Bank Statement", "status": "completed", "deadline": "2024-02-15", "priority": "high"},
-        {"name": "Letter of Acceptance", "status": "in_progress", "deadline": "2024-03-01", "priority": "high"},
-        {"name": "Health Insurance", "status": "pending", "deadline": "2024-03-15", "priority": "medium"},
-        {"name": "Accommodation Proof", "status": "pending", "deadline": "2024-04-01", "priority": "medium"},
-        {"name": "Financial Sponsorship Letter", "status": "pending", "deadline": "2024-04-15", "priority": "low"},
-    ]
+    st.session_state.visa_documents = store.load(username, "visa_documents", default=DEFAULT_VISA_DOCUMENTS)
 
 if 'visa_timeline' not in st.session_state:
-    st.session_state.visa_timeline = [
-        {"step": "Research Visa Requirements", "status": "completed", "date": "2024-01-01"},
-        {"step": "Gather Required Documents", "status": "in_progress", "date": "2024-02-01"},
-        {"step": "Submit Visa Application", "status": "pending", "date": "2024-03-01"},
-        {"step": "Attend Visa Interview", "status": "pending", "date": "2024-03-15"},
-        {"step": "Receive Visa Decision", "status": "pending", "date": "2024-04-01"},
-        {"step": "Book Flight Tickets", "status": "pending", "date": "2024-04-15"},
-    ]
+    st.session_state.visa_timeline = store.load(username, "visa_timeline", default=DEFAULT_VISA_TIMELINE)
 
 def main():
     st.markdown("""
@@ -191,9 +199,8 @@ def main():
                         is_checked = st.checkbox("Complete", value=current_completed, key=checkbox_key, label_visibility="hidden")
                         if is_checked != current_completed:
                             # Update document status
-                            for j, document in enumerate(st.session_state.visa_documents):
-                                if document['name'] == doc['name']:
-                                    st.session_state.visa_documents[j]['status'] = 'completed' if is_checked else 'pending'
+                            doc['status'] = 'completed' if is_checked else 'pending'
+                            store.update(username, "visa_documents", doc['id'], status=doc['status'])
                             st.rerun()
                     
                     with col_content:
@@ -231,7 +238,8 @@ def main():
                 is_checked = st.checkbox("Complete", value=current_completed, key=checkbox_key, label_visibility="hidden")
                 if is_checked != current_completed:
                     # Update step status
-                    st.session_state.visa_timeline[i]['status'] = 'completed' if is_checked else 'pending'
+                    step['status'] = 'completed' if is_checked else 'pending'
+                    store.update(username, "visa_timeline", step['id'], status=step['status'])
                     st.rerun()
             
             with col_content:
@@ -279,6 +287,7 @@ def main():
                             "deadline": doc_deadline.strftime("%Y-%m-%d"),
                             "priority": doc_priority
                         }
+                        new_doc["id"] = store.add(username, "visa_documents", new_doc)
                         st.session_state.visa_documents.append(new_doc)
                         st.session_state.show_add_document = False
                         st.success("Document added successfully!")
@@ -304,6 +313,7 @@ def main():
                             "status": "pending",
                             "date": step_date.strftime("%Y-%m-%d")
                         }
+                        new_step["id"] = store.add(username, "visa_timeline", new_step)
                         st.session_state.visa_timeline.append(new_step)
                         st.session_state.show_add_step = False
                         st.success("Timeline step added successfully!")
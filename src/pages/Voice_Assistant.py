@@ -1,7 +1,9 @@
 import streamlit as st
 import os
 
-from utils import load_css, check_authentication, render_sidebar, format_currency
+from utils import load_css, check_authentication, render_sidebar, format_currency, get_reporting_currency
+from category_tree import budget_total
+from expense_ledger import get_ledger
 from voice_assistant import (
     record_audio,
     transcribe_audio,
@@ -48,10 +50,8 @@ if gemini_key_input:
 # Build context from budget and expenses if available
 context = ""
 if "budget" in st.session_state:
-    total_budget = sum(st.session_state.budget.values())
-    total_spent = 0.0
-    if "expenses" in st.session_state:
-        total_spent = sum(exp.get("amount", 0) for exp in st.session_state.expenses)
+    total_budget = budget_total(st.session_state.budget)
+    total_spent = get_ledger(st.session_state.username).total(get_reporting_currency())
     remaining = total_budget - total_spent
     context = (
         "Budget summary: "
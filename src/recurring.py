@@ -0,0 +1,156 @@
+"""Detect recurring expenses and post confirmed ones when they fall due."""
+import threading
+import weakref
+from datetime import date, timedelta
+
+import numpy as np
+
+from data_store import get_data_store
+from expense_ledger import description_hash, get_ledger, ordinals_to_dates, shift_months
+
+# Interval of each supported frequency as (days, months)
+FREQUENCIES = {
+    "weekly": (7, 0),
+    "biweekly": (14, 0),
+    "monthly": (0, 1),
+    "quarterly": (0, 3),
+    "yearly": (0, 12),
+}
+# Typical gap in days between occurrences, used to classify detected intervals
+FREQUENCY_DAYS = {"weekly": 7, "biweekly": 14, "monthly": 30.4, "quarterly": 91.3, "yearly": 365.25}
+# Only the last this many days are searched for recurring expenses
+DETECTION_DAYS = 400
+MIN_OCCURRENCES = 3
+# Allowed relative deviation of intervals and amounts from their medians
+INTERVAL_TOLERANCE = 0.2
+AMOUNT_TOLERANCE = 0.15
+
+_candidates = weakref.WeakKeyDictionary()
+_candidates_lock = threading.Lock()
+_post_lock = threading.Lock()
+
+
+def next_occurrence(day, frequency, anchor_day):
+    """Date of the occurrence after ``day``; monthly rules stay on ``anchor_day``"""
+    days, months = FREQUENCIES[frequency]
+    if days:
+        return day + timedelta(days=days)
+    return shift_months(day, months, anchor_day)
+
+
+def _classify(interval):
+    """Name of the frequency closest to a median interval in days, if any is close enough"""
+    for frequency, days in FREQUENCY_DAYS.items():
+        if abs(interval - days) <= max(INTERVAL_TOLERANCE * days, 3):
+            return frequency
+    return None
+
+
+def _rule_key(category, description):
+    return category, description_hash(description)
+
+
+def detect_recurring(ledger, today, rules=()):
+    """Find groups of expenses that look like a recurring payment.
+
+    Expenses from the last DETECTION_DAYS are grouped by category and
+    hashed description. A group qualifies when it has at least
+    MIN_OCCURRENCES entries, its gaps are close to a known frequency and
+    its amounts are close to their median. Groups already covered by one of
+    ``rules`` are skipped. Results are cached per ledger version.
+    """
+    covered = {_rule_key(rule["category"], rule["description"]) for rule in rules}
+    key = (ledger.version, today, frozenset(covered))
+    with _candidates_lock:
+        cached = _candidates.get(ledger)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    rows = ledger.rows_between(today - timedelta(days=DETECTION_DAYS), today)
+    candidates = []
+    if len(rows) >= MIN_OCCURRENCES:
+        codes = ledger.category_codes[rows].astype(np.uint64)
+        hashes = np.array([description_hash(ledger.descriptions[row]) for row in rows.tolist()], dtype=np.uint64)
+        _, group = np.unique(np.stack([codes, hashes]), axis=1, return_inverse=True)
+        group = group.ravel()
+        counts = np.bincount(group)
+        # Rows are in date order; a stable sort by group keeps each group's dates sorted
+        order = np.argsort(group, kind="stable")
+        bounds = np.concatenate([[0], np.cumsum(counts)])
+        dates, amounts = ledger.dates[rows], ledger.amounts[rows]
+        for g in np.flatnonzero(counts >= MIN_OCCURRENCES):
+            members = order[bounds[g]:bounds[g + 1]]
+            gaps = np.diff(dates[members])
+            interval = float(np.median(gaps))
+            frequency = _classify(interval) if interval > 0 else None
+            if frequency is None or np.any(np.abs(gaps - interval) > max(INTERVAL_TOLERANCE * interval, 3)):
+                continue
+            amount = float(np.median(amounts[members]))
+            if np.any(np.abs(amounts[members] - amount) > AMOUNT_TOLERANCE * amount):
+                continue
+            last = rows[members[-1]]
+            record = ledger.record(last)
+            if _rule_key(record["category"], record["description"]) in covered:
+                continue
+            last_date = ordinals_to_dates(ledger.dates[last]).item()
+            days = ordinals_to_dates(dates[members])
+            # Median day of month, so a rule paid on the 31st stays there after short months
+            anchor_day = int(np.median((days - days.astype("datetime64[M]")).astype(np.int64))) + 1
+            # Skip payments that seem to have stopped
+            if (today - last_date).days > 2 * FREQUENCY_DAYS[frequency]:
+                continue
+            candidates.append({
+                "description": record["description"],
+                "category": record["category"],
+                "amount": round(amount, 2),
+                "currency": record["currency"],
+                "frequency": frequency,
+                "anchor_day": anchor_day,
+                "next_date": next_occurrence(last_date, frequency, anchor_day).isoformat(),
+                "occurrences": len(members),
+                "last_date": last_date.isoformat(),
+            })
+    with _candidates_lock:
+        _candidates[ledger] = (key, candidates)
+    return candidates
+
+
+def confirm_rule(username, candidate):
+    """Save a detected candidate as a recurring rule and return its id"""
+    rule = {col: candidate[col] for col in ("description", "category", "amount", "currency", "frequency",
+                                            "anchor_day", "next_date")}
+    return get_data_store().add(username, "recurring_rules", rule)
+
+
+def post_due_expenses(username, today, ledger=None):
+    """Add every occurrence of the user's rules that is due by ``today``.
+
+    Only the rules are read: each keeps the date of its next occurrence, so
+    no expense history is scanned, and the ledger (``get_ledger`` unless one
+    is given) is only loaded when something is due. The expenses and the
+    advanced rules are written in one transaction, so a failure can neither
+    post twice nor skip an occurrence. Returns the number of expenses posted.
+    """
+    store = get_data_store()
+    with _post_lock:
+        due = [rule for rule in store.load(username, "recurring_rules") if rule["next_date"] <= today.isoformat()]
+        if not due:
+            return 0
+        expenses = []
+        advanced = []
+        for rule in due:
+            day = date.fromisoformat(rule["next_date"])
+            while day <= today:
+                expenses.append({
+                    "date": day.isoformat(),
+                    "category": rule["category"],
+                    "amount": rule["amount"],
+                    "description": rule["description"],
+                    "currency": rule["currency"],
+                })
+                day = next_occurrence(day, rule["frequency"], rule["anchor_day"])
+            advanced.append(("recurring_rules", rule["id"], {"next_date": day.isoformat()}))
+        if ledger is None:
+            ledger = get_ledger(username)
+        ledger.extend(expenses, advanced)
+        return len(expenses)
@@ -0,0 +1,226 @@
+"""Compressed full and incremental snapshots of a user's stored data.
+
+A snapshot is a gzip-compressed JSON-lines file. The first line is a header
+with the schema version, the snapshot kind and the store revisions it
+covers; every following line is one operation: a chunk of upserted records,
+a deleted record id, or the user's budget. A delta snapshot holds only what
+changed since the previous snapshot, so restoring replays the latest full
+snapshot followed by the deltas after it.
+"""
+import gzip
+import json
+import re
+import threading
+import time
+from datetime import date, datetime
+from pathlib import Path
+from urllib.parse import quote
+
+from data_store import get_data_store, COLLECTIONS, RestoreConflictError
+
+SNAPSHOT_SCHEMA_VERSION = 1
+SNAPSHOT_FORMAT = "studyabroad-snapshot"
+SNAPSHOT_DIR = Path(__file__).parent / "snapshots"
+SNAPSHOT_CHUNK_ROWS = 5000
+# Start a new full snapshot once a chain has this many deltas
+MAX_DELTA_CHAIN = 20
+# Minimum seconds between automatic snapshots of the same user
+AUTOSAVE_INTERVAL = 300
+
+_SNAPSHOT_NAME = re.compile(r"^(\d{12})-(full|delta)\.jsonl\.gz$")
+_DATE_FIELDS = {"date", "deadline", "applied_date", "next_date", "start_date"}
+_NUMERIC_FIELDS = {"amount", "job_id", "anchor_day", "auto_category", "group_id"}
+
+
+class SnapshotError(Exception):
+    """Raised when a snapshot file is missing, corrupt or fails validation."""
+
+
+_last_autosave = {}
+_autosave_lock = threading.Lock()
+
+
+def _user_dir(username):
+    # Percent-encoding is reversible, so distinct usernames never share a directory
+    safe = quote(username, safe="")
+    if not safe.strip("."):
+        raise SnapshotError(f"Cannot keep snapshots for the username {username!r}")
+    return SNAPSHOT_DIR / safe
+
+
+def list_snapshots(username):
+    """Return (rev, kind, path) for a user's snapshots, oldest first"""
+    try:
+        directory = _user_dir(username)
+    except SnapshotError:
+        return []
+    if not directory.exists():
+        return []
+    snapshots = []
+    for path in directory.iterdir():
+        match = _SNAPSHOT_NAME.match(path.name)
+        if match:
+            snapshots.append((int(match.group(1)), match.group(2), path))
+    return sorted(snapshots)
+
+
+def _restore_chain(username):
+    """The latest full snapshot and the deltas taken after it"""
+    snapshots = list_snapshots(username)
+    fulls = [i for i, (_, kind, _) in enumerate(snapshots) if kind == "full"]
+    if not fulls:
+        return []
+    return snapshots[fulls[-1]:]
+
+
+def create_snapshot(username, full=False):
+    """Write a snapshot of the user's data and return its path.
+
+    A delta is written when a previous snapshot exists, unless ``full`` is
+    set or the delta chain is already long. Returns None if nothing changed
+    since the previous snapshot.
+    """
+    store = get_data_store()
+    chain = _restore_chain(username)
+    rev = store.current_rev()
+    base_rev = chain[-1][0] if chain else 0
+    kind = "full" if full or not chain or len(chain) > MAX_DELTA_CHAIN else "delta"
+    if kind == "delta" and rev == base_rev:
+        return None
+
+    since = -1 if kind == "full" else base_rev
+    directory = _user_dir(username)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{rev:012d}-{kind}.jsonl.gz"
+    tmp_path = path.with_suffix(".tmp")
+    changes = 0
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        header = {
+            "format": SNAPSHOT_FORMAT,
+            "schema_version": SNAPSHOT_SCHEMA_VERSION,
+            "kind": kind,
+            "username": username,
+            "base_rev": None if kind == "full" else base_rev,
+            "rev": rev,
+            "created": datetime.now().isoformat(timespec="seconds"),
+        }
+        f.write(json.dumps(header) + "\n")
+        # Deletes go first: a deleted id that is live again must be restored
+        # as its current row, which the upserts below hold
+        if kind == "delta":
+            for collection, record_id in store.deleted_since(username, base_rev):
+                f.write(json.dumps({"collection": collection, "op": "delete", "id": record_id}) + "\n")
+                changes += 1
+        for collection in COLLECTIONS:
+            for records in store.iter_changes(username, collection, since, SNAPSHOT_CHUNK_ROWS):
+                f.write(json.dumps({"collection": collection, "op": "upsert", "records": records}) + "\n")
+                changes += len(records)
+        if kind == "full" or store.budget_changed_since(username, base_rev):
+            f.write(json.dumps({"collection": "budget", "op": "budget", "budget": store.load_budget(username)}) + "\n")
+            changes += 1
+    if kind == "delta" and changes == 0:
+        # Revisions moved because of other users' writes only
+        tmp_path.unlink()
+        return None
+    tmp_path.replace(path)
+    store.prune_tombstones(username, rev)
+    return path
+
+
+def autosave(username, interval=AUTOSAVE_INTERVAL):
+    """Take a delta snapshot if the user's last autosave is older than ``interval``"""
+    now = time.monotonic()
+    with _autosave_lock:
+        if now - _last_autosave.get(username, float("-inf")) < interval:
+            return None
+        _last_autosave[username] = now
+    try:
+        return create_snapshot(username)
+    except SnapshotError:
+        return None
+
+
+def _validate_record(collection, record):
+    if not isinstance(record, dict) or not isinstance(record.get("id"), int):
+        raise SnapshotError(f"Invalid {collection} record: missing integer id")
+    for field in COLLECTIONS[collection]:
+        value = record.get(field)
+        if value is None:
+            continue
+        if field in _NUMERIC_FIELDS and not isinstance(value, (int, float)):
+            raise SnapshotError(f"Invalid {collection} record {record['id']}: {field} must be a number")
+        if field in _DATE_FIELDS:
+            try:
+                date.fromisoformat(value)
+            except (TypeError, ValueError):
+                raise SnapshotError(f"Invalid {collection} record {record['id']}: bad {field} {value!r}")
+    return record
+
+
+def read_snapshot(path, username):
+    """Stream validated restore operations from one snapshot file"""
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            header = json.loads(f.readline() or "null")
+            if not isinstance(header, dict) or header.get("format") != SNAPSHOT_FORMAT:
+                raise SnapshotError(f"{Path(path).name} is not a snapshot file")
+            if header.get("schema_version") != SNAPSHOT_SCHEMA_VERSION:
+                raise SnapshotError(f"Unsupported snapshot schema version {header.get('schema_version')}")
+            if header.get("username") != username:
+                raise SnapshotError("Snapshot belongs to a different user")
+            for line in f:
+                entry = json.loads(line)
+                collection, op = entry.get("collection"), entry.get("op")
+                if op == "budget":
+                    budget = entry.get("budget")
+                    if not isinstance(budget, dict) or not all(
+                        isinstance(v, (int, float)) for v in budget.values()
+                    ):
+                        raise SnapshotError("Invalid budget in snapshot")
+                    yield collection, op, budget
+                elif collection not in COLLECTIONS:
+                    raise SnapshotError(f"Unknown collection {collection!r} in snapshot")
+                elif op == "delete":
+                    if not isinstance(entry.get("id"), int):
+                        raise SnapshotError("Invalid delete entry in snapshot")
+                    yield collection, op, entry["id"]
+                elif op == "upsert":
+                    yield collection, op, [_validate_record(collection, r) for r in entry.get("records", [])]
+                else:
+                    raise SnapshotError(f"Unknown snapshot operation {op!r}")
+    except (OSError, EOFError, json.JSONDecodeError, UnicodeDecodeError) as e:
+        raise SnapshotError(f"Could not read {Path(path).name}: {e}") from e
+
+
+def restore_latest(username):
+    """Restore the user's data from the latest full snapshot plus later deltas.
+
+    Returns the number of snapshot files replayed. The restore runs in one
+    transaction, so a corrupt file leaves the current data untouched.
+    """
+    from expense_groups import invalidate_groups
+    from expense_ledger import invalidate_ledger
+
+    chain = _restore_chain(username)
+    if not chain:
+        raise SnapshotError("No full snapshot to restore from")
+
+    def operations():
+        for _, _, path in chain:
+            yield from read_snapshot(path, username)
+
+    try:
+        get_data_store().apply_changes(username, operations(), reset=True)
+    except RestoreConflictError as e:
+        raise SnapshotError(str(e)) from e
+    invalidate_ledger(username)
+    invalidate_groups(username)
+    return len(chain)
+
+
+def snapshot_summary(username):
+    """Return rev, kind, size and file name of each snapshot, newest first"""
+    return [
+        {"rev": rev, "kind": kind, "size": path.stat().st_size, "file": path.name}
+        for rev, kind, path in reversed(list_snapshots(username))
+    ]
@@ -0,0 +1,192 @@
+"""Streaming import of bank statements (CSV, OFX/QFX) into the expense ledger."""
+import csv
+import io
+import re
+import time
+from datetime import date, datetime
+
+from exchange_rates import DEFAULT_CURRENCY
+from expense_ledger import description_hash
+
+IMPORT_BATCH_SIZE = 5000
+DEFAULT_IMPORT_CATEGORY = "Other"
+# Bytes read per step when scanning OFX files for transactions
+OFX_CHUNK_SIZE = 1 << 16
+
+_OFX_TRANSACTION = re.compile(r"<STMTTRN>(.*?)</STMTTRN>", re.IGNORECASE | re.DOTALL)
+_OFX_FIELD = re.compile(r"<(DTPOSTED|TRNAMT|NAME|MEMO)>([^<\r\n]*)", re.IGNORECASE)
+
+
+class StatementImportError(Exception):
+    """Raised when a statement file cannot be read at all."""
+
+
+def open_text(uploaded_file):
+    """Wrap a binary upload in a text stream without reading it into a string"""
+    uploaded_file.seek(0)
+    return io.TextIOWrapper(uploaded_file, encoding="utf-8-sig", errors="replace", newline="")
+
+
+def read_csv_header(uploaded_file):
+    """Return the column names of a CSV upload"""
+    text = open_text(uploaded_file)
+    try:
+        return next(csv.reader(text), [])
+    finally:
+        text.detach()
+        uploaded_file.seek(0)
+
+
+def _parse_amount(value):
+    cleaned = re.sub(r"[^\d,.\-()]", "", value or "").replace(",", "")
+    if cleaned.startswith("(") and cleaned.endswith(")"):
+        cleaned = "-" + cleaned[1:-1]
+    return float(cleaned)
+
+
+def _date_parser(date_format):
+    """Return a memoized date parser; statements repeat the same few dates a lot"""
+    cache = {}
+    if date_format == "%Y-%m-%d":
+        parse = date.fromisoformat
+    else:
+        def parse(value):
+            return datetime.strptime(value, date_format).date()
+
+    def parse_cached(value):
+        day = cache.get(value)
+        if day is None:
+            day = cache[value] = parse(value)
+        return day
+
+    return parse_cached
+
+
+def iter_csv_rows(text, column_map, date_format="%Y-%m-%d"):
+    """Yield (date, amount, description, category) tuples, or None for unreadable rows"""
+    reader = csv.DictReader(text)
+    if reader.fieldnames is None:
+        raise StatementImportError("The CSV file is empty.")
+    category_column = column_map.get("category")
+    parse_date = _date_parser(date_format)
+    for row in reader:
+        try:
+            day = parse_date(row[column_map["date"]].strip())
+            amount = _parse_amount(row[column_map["amount"]])
+        except (KeyError, ValueError, AttributeError):
+            yield None
+            continue
+        description = (row.get(column_map["description"]) or "").strip()
+        category = (row.get(category_column) or "").strip() if category_column else ""
+        yield day, amount, description, category
+
+
+def iter_ofx_rows(text):
+    """Yield transactions from an OFX/QFX stream, scanning it chunk by chunk"""
+    buffer = ""
+    parse_date = _date_parser("%Y%m%d")
+    while True:
+        chunk = text.read(OFX_CHUNK_SIZE)
+        buffer += chunk
+        last_end = 0
+        for match in _OFX_TRANSACTION.finditer(buffer):
+            last_end = match.end()
+            fields = {name.upper(): value.strip() for name, value in _OFX_FIELD.findall(match.group(1))}
+            try:
+                day = parse_date(fields["DTPOSTED"][:8])
+                amount = _parse_amount(fields["TRNAMT"])
+            except (KeyError, ValueError):
+                yield None
+                continue
+            description = fields.get("NAME") or fields.get("MEMO") or ""
+            yield day, amount, description, ""
+        buffer = buffer[last_end:]
+        if not chunk:
+            break
+
+
+def import_statement(
+    ledger,
+    uploaded_file,
+    file_format,
+    column_map=None,
+    date_format="%Y-%m-%d",
+    negative_is_spending=True,
+    default_category=DEFAULT_IMPORT_CATEGORY,
+    batch_size=IMPORT_BATCH_SIZE,
+    currency=DEFAULT_CURRENCY,
+):
+    """Stream a statement into the ledger in batches.
+
+    Rows already in the ledger (same date, amount and description) are
+    skipped, each ledger entry matching at most one row, as are credits when ``negative_is_spending`` is set. Rows
+    without a category get the ledger categorizer's prediction, one batch
+    at a time, or ``default_category`` if it has none. Returns a dict of
+    counts and throughput.
+    """
+    start = time.perf_counter()
+    stats = {"rows": 0, "imported": 0, "categorized": 0, "duplicates": 0, "rejected": 0, "credits_skipped": 0}
+    existing = ledger.dedup_keys()
+    batch = []
+    uncategorized = []
+
+    def flush():
+        if uncategorized:
+            records = [batch[i] for i in uncategorized]
+            predicted = ledger.categorizer.predict_many(
+                [record["description"] for record in records], [record["amount"] for record in records]
+            )
+            for record, category in zip(records, predicted):
+                record["category"] = category or default_category
+                stats["categorized"] += category is not None
+            uncategorized.clear()
+        ledger.extend(batch)
+        stats["imported"] += len(batch)
+        batch.clear()
+
+    text = open_text(uploaded_file)
+    try:
+        if file_format == "ofx":
+            rows = iter_ofx_rows(text)
+        else:
+            rows = iter_csv_rows(text, column_map, date_format)
+        for parsed in rows:
+            stats["rows"] += 1
+            if parsed is None:
+                stats["rejected"] += 1
+                continue
+            day, amount, description, category = parsed
+            if negative_is_spending:
+                if amount >= 0:
+                    stats["credits_skipped"] += 1
+                    continue
+                amount = -amount
+            if amount <= 0:
+                stats["rejected"] += 1
+                continue
+            key = (day.toordinal(), round(amount * 100), description_hash(description))
+            # Each ledger entry cancels one matching row, so repeated charges
+            # within the statement (two identical bus fares) are all kept
+            if existing[key]:
+                existing[key] -= 1
+                stats["duplicates"] += 1
+                continue
+            if not category:
+                uncategorized.append(len(batch))
+            batch.append({
+                "date": day.isoformat(),
+                "category": category,
+                "amount": amount,
+                "description": description,
+                "currency": currency,
+                "auto_category": 0 if category else 1,
+            })
+            if len(batch) >= batch_size:
+                flush()
+        flush()
+    finally:
+        text.detach()
+
+    stats["seconds"] = time.perf_counter() - start
+    stats["rows_per_sec"] = stats["rows"] / stats["seconds"] if stats["seconds"] else 0.0
+    return stats
@@ -1,17 +1,32 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime, timedelta
-import plotly.express as px
-import plotly.graph_objects as go
 from utils import (
     load_css,
     check_login,
+    AuthBusyError,
     initialize_session_state,
     format_currency,
     get_country_info,
+    get_reporting_currency,
     render_sidebar,
 )
 from app_config import configure_for_hf_spaces, check_dependencies
+from category_tree import budget_total
+from data_store import USER_SESSION_KEYS
+from expense_ledger import get_ledger
+from expense_anomalies import detect_anomalies
+from recurring import post_due_expenses
+from data_export import (
+    stream_export,
+    collect_export,
+    export_filename,
+    parquet_available,
+    EXPORT_DATASETS,
+    EXPORT_FORMATS,
+    ExportTooLargeError,
+)
+from snapshots import autosave, create_snapshot, restore_latest, snapshot_summary, SnapshotError
 
 def calculate_user_progress():
     """Calculate user progress for gamification"""
@@ -29,9 +44,9 @@ def calculate_user_progress():
         progress['visa_progress'] = int((completed_docs / total_docs) * 100) if total_docs > 0 else 0
     
     # Calculate budget health
-    if 'expenses' in st.session_state and 'budget' in st.session_state:
-        total_budget = sum(st.session_state.budget.values())
-        total_spent = sum([exp['amount'] for exp in st.session_state.expenses])
+    if 'budget' in st.session_state:
+        total_budget = budget_total(st.session_state.budget)
+        total_spent = get_ledger(st.session_state.username).total(get_reporting_currency())
         if total_budget > 0:
             budget_usage = (total_spent / total_budget) * 100
             progress['budget_health'] = max(0, int(100 - budget_usage)) if budget_usage > 0 else 100
@@ -93,12 +108,22 @@ def login_page():
             login_button = st.form_submit_button("Login", use_container_width=True)
             
             if login_button:
-                if check_login(username, password):
+                try:
+                    logged_in = check_login(username, password)
+                except AuthBusyError as e:
+                    st.warning(str(e))
+                    logged_in = None
+                if logged_in:
+                    # Drop data loaded for a previous user in this session
+                    for key in USER_SESSION_KEYS:
+                        st.session_state.pop(key, None)
                     st.session_state.logged_in = True
                     st.session_state.username = username
+                    # Post recurring expenses that fell due since the last visit
+                    st.session_state.recurring_posted = post_due_expenses(username, datetime.now().date())
                     st.success("Login successful! Redirecting...")
                     st.rerun()
-                else:
+                elif logged_in is False:
                     st.error("Invalid username or password.")
         st.page_link("pages/Register.py", label="Create a new account")
 
@@ -163,6 +188,22 @@ def dashboard():
     </div>
     """, unsafe_allow_html=True)
     
+    recurring_posted = st.session_state.pop('recurring_posted', 0)
+    if recurring_posted:
+        st.toast(f"🔁 Added {recurring_posted} recurring expense(s) that fell due")
+
+    # Alert on unusual spending over the last 30 days
+    anomalies = detect_anomalies(get_ledger(st.session_state.username), get_reporting_currency())
+    alert_since = datetime.now().date() - timedelta(days=30)
+    unusual_expenses = [flag for flag in anomalies["transactions"].values() if flag["date"] >= alert_since]
+    unusual_days = [run for run in anomalies["days"] if run["end"] >= alert_since]
+    if unusual_expenses or unusual_days:
+        st.warning(
+            f"⚠️ Unusual spending in the last 30 days: {len(unusual_expenses)} expense(s) well above "
+            f"your usual amount and {len(unusual_days)} high-spending period(s). "
+            "Review them under Recent Transactions in the Expense Tracker."
+        )
+
     # Quick stats cards
     col1, col2, col3, col4 = st.columns(4)
     
@@ -383,6 +424,80 @@ def dashboard():
         </div>
         """, unsafe_allow_html=True)
     
+    with st.expander("📦 Export Your Data", expanded=False):
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            export_dataset = st.selectbox(
+                "Data",
+                EXPORT_DATASETS,
+                format_func=lambda name: name.replace('_', ' ').title(),
+            )
+        with col2:
+            formats = [fmt for fmt in EXPORT_FORMATS if fmt != "parquet" or parquet_available()]
+            export_format = st.selectbox("Format", formats, format_func=str.upper)
+        with col3:
+            export_gzip = st.checkbox("Compress (gzip)")
+
+        if st.button("Prepare Export", use_container_width=True):
+            chunks = stream_export(
+                st.session_state.username,
+                export_dataset,
+                export_format,
+                compress=export_gzip,
+                community_posts=st.session_state.get('community_posts', []),
+            )
+            try:
+                data = collect_export(chunks)
+            except ExportTooLargeError as e:
+                st.error(str(e))
+            else:
+                st.download_button(
+                    "Download",
+                    data=data,
+                    file_name=export_filename(export_dataset, export_format, export_gzip),
+                    mime="application/gzip" if export_gzip else EXPORT_FORMATS[export_format],
+                    use_container_width=True,
+                )
+
+    with st.expander("💾 Backup & Restore", expanded=False):
+        username = st.session_state.username
+        autosave(username)
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            if st.button("Save Snapshot", use_container_width=True):
+                try:
+                    path = create_snapshot(username)
+                except SnapshotError as e:
+                    st.error(f"Snapshot failed: {e}")
+                else:
+                    st.success(f"Saved {path.name}" if path else "No changes since the last snapshot")
+        with col2:
+            if st.button("Save Full Snapshot", use_container_width=True):
+                try:
+                    st.success(f"Saved {create_snapshot(username, full=True).name}")
+                except SnapshotError as e:
+                    st.error(f"Snapshot failed: {e}")
+        with col3:
+            if st.button("Restore Latest", use_container_width=True):
+                try:
+                    replayed = restore_latest(username)
+                except SnapshotError as e:
+                    st.error(f"Restore failed: {e}")
+                else:
+                    for key in USER_SESSION_KEYS:
+                        st.session_state.pop(key, None)
+                    st.success(f"Restored from {replayed} snapshot file(s)")
+
+        snapshots = snapshot_summary(username)
+        if snapshots:
+            st.dataframe(
+                pd.DataFrame(snapshots).rename(columns={"size": "size (bytes)"}),
+                hide_index=True,
+                use_container_width=True,
+            )
+        else:
+            st.caption("No snapshots yet.")
+
     # Recent activity
     st.subheader("Recent Activity")
     
@@ -3,6 +3,12 @@ import os
 from pathlib import Path
 import json
 import hashlib
+import hmac
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 
 def load_css():
     """Load custom CSS styles"""
@@ -15,6 +21,22 @@ def load_css():
         st.warning("CSS file not found. Using default styling.")
 
 USERS_FILE = Path(__file__).parent / "users.json"
+USERS_DB = Path(__file__).parent / "users.db"
+
+# "sqlite" (default) or "json" for deployments that keep the flat users.json file
+USER_STORE_BACKEND = os.getenv("USER_STORE", "sqlite")
+
+# scrypt cost parameters for stored passwords; existing hashes are upgraded on login
+PASSWORD_HASH_PARAMS = {
+    "n": int(os.getenv("AUTH_SCRYPT_N", 2 ** 14)),
+    "r": int(os.getenv("AUTH_SCRYPT_R", 8)),
+    "p": int(os.getenv("AUTH_SCRYPT_P", 1)),
+}
+# Checked when a username is unknown. Verifying costs the same whatever the digest, so it needn't be real.
+DUMMY_PASSWORD_HASH = "scrypt${n}${r}${p}${salt}${digest}".format(**PASSWORD_HASH_PARAMS, salt="00" * 16, digest="00" * 64)
+# Hashing threads and the number of hashes allowed to wait for one
+AUTH_WORKERS = int(os.getenv("AUTH_WORKERS", 2))
+AUTH_MAX_PENDING = int(os.getenv("AUTH_MAX_PENDING", 32))
 
 def load_users():
     """Load user data from the JSON file"""
@@ -28,24 +50,304 @@ def save_users(users):
     with USERS_FILE.open("w") as f:
         json.dump(users, f, indent=4)
 
+_sqlite_local = threading.local()
+
+def sqlite_connection(path):
+    """Return a per-thread SQLite connection in WAL mode for the given database file"""
+    connections = getattr(_sqlite_local, "connections", None)
+    if connections is None:
+        connections = _sqlite_local.connections = {}
+    key = str(path)
+    conn = connections.get(key)
+    if conn is None:
+        conn = sqlite3.connect(key, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        connections[key] = conn
+    return conn
+
+class UserRepository(ABC):
+    """Storage backend for user accounts"""
+
+    @abstractmethod
+    def get_user(self, username):
+        """Return the stored user dict or None"""
+
+    @abstractmethod
+    def add_user(self, username, password_hash):
+        """Add a user. Returns False if the username is taken."""
+
+    @abstractmethod
+    def update_password(self, username, password_hash):
+        """Replace the stored password hash of an existing user"""
+
+class JsonUserRepository(UserRepository):
+    """User accounts kept in the flat users.json file.
+
+    The file is indexed by username in memory and only re-read when its
+    mtime or size changes, so repeated logins do not touch the disk.
+    """
+
+    def __init__(self, users_file=USERS_FILE):
+        self.users_file = Path(users_file)
+        self._index = {}
+        self._signature = None
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "reloads": 0}
+
+    def _file_signature(self):
+        try:
+            stat = self.users_file.stat()
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _refresh(self):
+        """Reload the index if the file changed since it was last read"""
+        signature = self._file_signature()
+        if signature == self._signature:
+            self.stats["hits"] += 1
+            return
+        users = []
+        if signature is not None:
+            with self.users_file.open("r") as f:
+                users = json.load(f)
+        self._index = {u["username"]: u for u in users}
+        self._signature = signature
+        self.stats["reloads"] += 1
+
+    def get_user(self, username):
+        with self._lock:
+            self._refresh()
+            return self._index.get(username)
+
+    def add_user(self, username, password_hash):
+        with self._lock:
+            self._refresh()
+            if username in self._index:
+                return False
+            self._index[username] = {"username": username, "password": password_hash}
+            with self.users_file.open("w") as f:
+                json.dump(list(self._index.values()), f, indent=4)
+            self._signature = self._file_signature()
+            return True
+
+    def update_password(self, username, password_hash):
+        with self._lock:
+            self._refresh()
+            if username not in self._index:
+                return
+            self._index[username]["password"] = password_hash
+            with self.users_file.open("w") as f:
+                json.dump(list(self._index.values()), f, indent=4)
+            self._signature = self._file_signature()
+
+class SQLiteUserRepository(UserRepository):
+    """User accounts in SQLite with a unique index on username"""
+
+    SCHEMA_VERSION = 1
+
+    def __init__(self, db_path=USERS_DB, legacy_file=USERS_FILE):
+        self.db_path = db_path
+        self.legacy_file = legacy_file
+        self._init_schema()
+
+    def _connection(self):
+        return sqlite_connection(self.db_path)
+
+    def _init_schema(self):
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS users ("
+                "id INTEGER PRIMARY KEY, "
+                "username TEXT NOT NULL UNIQUE, "
+                "password TEXT NOT NULL)"
+            )
+        if conn.execute("PRAGMA user_version").fetchone()[0] < self.SCHEMA_VERSION:
+            self._migrate_from_json(conn)
+
+    def _migrate_from_json(self, conn):
+        """One-time import of accounts from the legacy users.json file"""
+        users = []
+        if self.legacy_file is not None and Path(self.legacy_file).exists():
+            with Path(self.legacy_file).open("r") as f:
+                users = json.load(f)
+        with conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO users (username, password) VALUES (?, ?)",
+                ((u["username"], u["password"]) for u in users),
+            )
+            conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+
+    def get_user(self, username):
+        row = self._connection().execute(
+            "SELECT username, password FROM users WHERE username = ?", (username,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def add_user(self, username, password_hash):
+        conn = self._connection()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT INTO users (username, password) VALUES (?, ?)",
+                    (username, password_hash),
+                )
+        except sqlite3.IntegrityError:
+            return False
+        return True
+
+    def update_password(self, username, password_hash):
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "UPDATE users SET password = ? WHERE username = ?",
+                (password_hash, username),
+            )
+
+_user_repository = None
+_user_repository_lock = threading.Lock()
+
+def get_user_repository():
+    """Return the process-wide user repository for the configured backend"""
+    global _user_repository
+    if _user_repository is None:
+        with _user_repository_lock:
+            if _user_repository is None:
+                if USER_STORE_BACKEND == "json":
+                    _user_repository = JsonUserRepository()
+                else:
+                    _user_repository = SQLiteUserRepository()
+    return _user_repository
+
+def get_user_store_stats():
+    """Return cache hit/reload counters for the JSON user index, if in use"""
+    return dict(getattr(get_user_repository(), "stats", {}))
+
+class AuthBusyError(Exception):
+    """Raised when too many password hashes are already waiting for a worker."""
+
+def hash_password(password, salt=None, params=None):
+    """Hash a password with scrypt and a per-user salt"""
+    params = params or PASSWORD_HASH_PARAMS
+    salt = salt or os.urandom(16)
+    n, r, p = params["n"], params["r"], params["p"]
+    digest = hashlib.scrypt(
+        password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r * p
+    )
+    return f"scrypt${n}${r}${p}${salt.hex()}${digest.hex()}"
+
+def verify_password(password, stored_hash):
+    """Check a password against a stored hash. Returns (valid, needs_rehash)."""
+    if not stored_hash.startswith("scrypt$"):
+        # Legacy unsalted sha256 entry
+        legacy = hashlib.sha256(password.encode()).hexdigest()
+        return hmac.compare_digest(legacy, stored_hash), True
+    _, n, r, p, salt, digest = stored_hash.split("$")
+    params = {"n": int(n), "r": int(r), "p": int(p)}
+    candidate = hash_password(password, bytes.fromhex(salt), params)
+    valid = hmac.compare_digest(candidate.rsplit("$", 1)[1], digest)
+    return valid, params != PASSWORD_HASH_PARAMS
+
+class PasswordHasher:
+    """Runs password hashing on a bounded worker pool off the script thread"""
+
+    def __init__(self, workers=AUTH_WORKERS, max_pending=AUTH_MAX_PENDING):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="auth")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._hashes = 0
+        self._total_ms = 0.0
+        self._last_ms = 0.0
+
+    def _timed(self, func, *args):
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            with self._lock:
+                self._hashes += 1
+                self._total_ms += elapsed
+                self._last_ms = elapsed
+
+    def _release(self, _future):
+        with self._lock:
+            self._pending -= 1
+        self._slots.release()
+
+    def _run(self, func, *args):
+        if not self._slots.acquire(blocking=False):
+            raise AuthBusyError("Too many login attempts in progress. Please try again.")
+        with self._lock:
+            self._pending += 1
+        future = self._executor.submit(self._timed, func, *args)
+        future.add_done_callback(self._release)
+        return future.result()
+
+    def hash(self, password):
+        """Hash a password on the worker pool"""
+        return self._run(hash_password, password)
+
+    def verify(self, password, stored_hash):
+        """Verify a password on the worker pool. Returns (valid, needs_rehash)."""
+        return self._run(verify_password, password, stored_hash)
+
+    def stats(self):
+        """Return queue depth and hash latency figures"""
+        with self._lock:
+            return {
+                "queue_depth": self._pending,
+                "hashes": self._hashes,
+                "last_ms": self._last_ms,
+                "avg_ms": self._total_ms / self._hashes if self._hashes else 0.0,
+            }
+
+_password_hasher = None
+
+def get_password_hasher():
+    """Return the process-wide password hashing pool"""
+    global _password_hasher
+    if _password_hasher is None:
+        with _user_repository_lock:
+            if _password_hasher is None:
+                _password_hasher = PasswordHasher()
+    return _password_hasher
+
+def get_auth_stats():
+    """Return queue depth and per-hash latency of the auth worker pool"""
+    return get_password_hasher().stats()
+
 def register_user(username, password):
     """Register a new user. Returns (success, message)."""
-    users = load_users()
-    if any(u["username"] == username for u in users):
+    repository = get_user_repository()
+    if repository.get_user(username) is not None:
+        return False, "Username already exists."
+    hashed = get_password_hasher().hash(password)
+    if not repository.add_user(username, hashed):
         return False, "Username already exists."
-    hashed = hashlib.sha256(password.encode()).hexdigest()
-    users.append({"username": username, "password": hashed})
-    save_users(users)
     return True, "Registration successful."
 
 def check_login(username, password):
-    """Check login credentials"""
-    users = load_users()
-    hashed = hashlib.sha256(password.encode()).hexdigest()
-    for user in users:
-        if user["username"] == username and user["password"] == hashed:
-            return True
-    return False
+    """Check login credentials, upgrading outdated password hashes on success"""
+    repository = get_user_repository()
+    user = repository.get_user(username)
+    hasher = get_password_hasher()
+    if user is None:
+        # Pay the same scrypt cost as for a real account, so timing doesn't reveal which names exist
+        hasher.verify(password, DUMMY_PASSWORD_HASH)
+        return False
+    valid, needs_rehash = hasher.verify(password, user["password"])
+    if valid and needs_rehash:
+        try:
+            repository.update_password(username, hasher.hash(password))
+        except AuthBusyError:
+            # The upgrade is opportunistic; it is retried on a later login
+            pass
+    return valid
 
 def check_authentication():
     """Check if user is authenticated, redirect to login if not"""
@@ -99,45 +401,54 @@ def format_currency(amount, country=None):
     symbol = currency_symbols.get(country, '$')
     return f"{symbol}{amount:,.2f}"
 
+def get_reporting_currency(country=None):
+    """Currency code totals are converted to for a country"""
+    if country is None:
+        country = st.session_state.get('selected_country', 'United States')
+    return get_country_info().get(country, {}).get('currency', 'USD')
+
+# Built once at import; callers share it and must not modify it
+COUNTRY_INFO = {
+    "United States": {
+        "currency": "USD",
+        "symbol": "$",
+        "cities": ["New York", "Los Angeles", "Chicago", "Boston", "San Francisco", "Washington DC"],
+        "visa_processing_time": "3-5 months",
+        "popular_programs": ["MBA", "Computer Science", "Engineering", "Medicine"]
+    },
+    "United Kingdom": {
+        "currency": "GBP",
+        "symbol": "£",
+        "cities": ["London", "Manchester", "Edinburgh", "Birmingham", "Oxford", "Cambridge"],
+        "visa_processing_time": "3-4 months",
+        "popular_programs": ["Business", "Law", "Engineering", "Medicine"]
+    },
+    "Canada": {
+        "currency": "CAD",
+        "symbol": "C$",
+        "cities": ["Toronto", "Vancouver", "Montreal", "Calgary", "Ottawa", "Waterloo"],
+        "visa_processing_time": "4-6 months",
+        "popular_programs": ["Engineering", "Business", "Computer Science", "Healthcare"]
+    },
+    "Australia": {
+        "currency": "AUD",
+        "symbol": "A$",
+        "cities": ["Sydney", "Melbourne", "Brisbane", "Perth", "Adelaide", "Canberra"],
+        "visa_processing_time": "2-4 months",
+        "popular_programs": ["Engineering", "Business", "Medicine", "Information Technology"]
+    },
+    "Germany": {
+        "currency": "EUR",
+        "symbol": "€",
+        "cities": ["Berlin", "Munich", "Hamburg", "Frankfurt", "Cologne", "Stuttgart"],
+        "visa_processing_time": "6-8 weeks",
+        "popular_programs": ["Engineering", "Computer Science", "Business", "Research"]
+    }
+}
+
 def get_country_info():
     """Get comprehensive country information"""
-    return {
-        "United States": {
-            "currency": "USD",
-            "symbol": "$",
-            "cities": ["New York", "Los Angeles", "Chicago", "Boston", "San Francisco", "Washington DC"],
-            "visa_processing_time": "3-5 months",
-            "popular_programs": ["MBA", "Computer Science", "Engineering", "Medicine"]
-        },
-        "United Kingdom": {
-            "currency": "GBP",
-            "symbol": "£",
-            "cities": ["London", "Manchester", "Edinburgh", "Birmingham", "Oxford", "Cambridge"],
-            "visa_processing_time": "3-4 months",
-            "popular_programs": ["Business", "Law", "Engineering", "Medicine"]
-        },
-        "Canada": {
-            "currency": "CAD",
-            "symbol": "C$",
-            "cities": ["Toronto", "Vancouver", "Montreal", "Calgary", "Ottawa", "Waterloo"],
-            "visa_processing_time": "4-6 months",
-            "popular_programs": ["Engineering", "Business", "Computer Science", "Healthcare"]
-        },
-        "Australia": {
-            "currency": "AUD",
-            "symbol": "A$",
-            "cities": ["Sydney", "Melbourne", "Brisbane", "Perth", "Adelaide", "Canberra"],
-            "visa_processing_time": "2-4 months",
-            "popular_programs": ["Engineering", "Business", "Medicine", "Information Technology"]
-        },
-        "Germany": {
-            "currency": "EUR",
-            "symbol": "€",
-            "cities": ["Berlin", "Munich", "Hamburg", "Frankfurt", "Cologne", "Stuttgart"],
-            "visa_processing_time": "6-8 weeks",
-            "popular_programs": ["Engineering", "Computer Science", "Business", "Research"]
-        }
-    }
+    return COUNTRY_INFO
 
 def get_housing_options(city, country):
     """Get housing options for specific city"""
@@ -308,13 +619,10 @@ def create_notification(message, type="info"):
 
 def export_data_to_csv(data, filename):
     """Export data to CSV format"""
-    import pandas as pd
-    import io
-    
-    df = pd.DataFrame(data)
-    csv_buffer = io.StringIO()
-    df.to_csv(csv_buffer, index=False)
-    return csv_buffer.getvalue()
+    from data_export import csv_chunks
+
+    columns = list(dict.fromkeys(key for item in data for key in item))
+    return b"".join(csv_chunks([data], columns)).decode()
 
 def validate_email(email):
     """Simple email validation"""
@@ -328,22 +636,44 @@ def generate_random_color():
     colors = ['#6366F1', '#10B981', '#F59E0B', '#EF4444', '#8B5CF6', '#06B6D4', '#84CC16', '#F97316']
     return random.choice(colors)
 
-def create_backup_data():
-    """Create a backup of session state data"""
+def create_backup_data(username=None):
+    """Create a backup of the user's stored data"""
+    from data_store import get_data_store
+
+    username = username or st.session_state.get('username', '')
+    store = get_data_store()
     backup_data = {
-        'expenses': st.session_state.get('expenses', []),
-        'budget': st.session_state.get('budget', {}),
-        'visa_documents': st.session_state.get('visa_documents', []),
-        'visa_timeline': st.session_state.get('visa_timeline', []),
+        'expenses': store.load(username, 'expenses'),
+        'budget': store.load_budget(username),
+        'visa_documents': store.load(username, 'visa_documents'),
+        'visa_timeline': store.load(username, 'visa_timeline'),
         'community_posts': st.session_state.get('community_posts', []),
-        'job_applications': st.session_state.get('job_applications', [])
+        'job_applications': store.load(username, 'job_applications')
     }
     return backup_data
 
-def restore_backup_data(backup_data):
+def restore_backup_data(backup_data, username=None):
     """Restore data from backup"""
+    from data_store import get_data_store, COLLECTIONS
+    from expense_groups import invalidate_groups
+    from expense_ledger import invalidate_ledger
+
+    username = username or st.session_state.get('username', '')
+    store = get_data_store()
     for key, value in backup_data.items():
-        st.session_state[key] = value
+        if key in COLLECTIONS:
+            store.replace_all(username, key, value)
+        elif key == 'budget':
+            store.set_budget(username, value)
+        else:
+            # Not kept in the store, e.g. community posts
+            st.session_state[key] = value
+            continue
+        # Pages reload stored data from the store on their next run
+        st.session_state.pop(key, None)
+    # Only after the writes, so no session caches the data being replaced
+    invalidate_ledger(username)
+    invalidate_groups(username)
 
 def render_sidebar():
     """Render navigation and quick action links in the sidebar."""
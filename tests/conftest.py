@@ -0,0 +1,21 @@
+"""Shared test setup: import the app modules from src/ and give each test its own store."""
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import data_store  # noqa: E402
+import expense_groups  # noqa: E402
+import expense_ledger  # noqa: E402
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """A fresh UserDataStore installed as the process-wide store, with empty per-user caches"""
+    fresh = data_store.UserDataStore(tmp_path / "app_data.db")
+    monkeypatch.setattr(data_store, "_data_store", fresh)
+    monkeypatch.setattr(expense_ledger, "_ledgers", {})
+    monkeypatch.setattr(expense_groups, "_groups", {})
+    return fresh
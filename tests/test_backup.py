@@ -0,0 +1,30 @@
+"""Restoring a backup replaces the stored data and what the pages cache."""
+import streamlit as st
+
+from expense_ledger import get_ledger
+from utils import create_backup_data, restore_backup_data
+
+
+def test_restore_replaces_cached_ledger_and_session_copies(store, monkeypatch):
+    session = {}
+    monkeypatch.setattr(st, "session_state", session)
+    store.add("alice", "expenses", {"date": "2026-10-01", "category": "Food", "amount": 5.0, "description": "old"})
+    backup = create_backup_data("alice")
+    backup["expenses"] = [{"date": "2026-10-02", "category": "Food", "amount": 7.0, "description": "restored"}]
+    assert get_ledger("alice").total() == 5.0
+    session["visa_documents"] = [{"name": "stale"}]
+
+    # Another session reloads the ledger while the restore is writing
+    replace_all = store.replace_all
+
+    def replace_and_reload(username, collection, records):
+        get_ledger(username)
+        return replace_all(username, collection, records)
+
+    monkeypatch.setattr(store, "replace_all", replace_and_reload)
+    restore_backup_data(backup, "alice")
+
+    assert get_ledger("alice").total() == 7.0
+    assert "visa_documents" not in session
+    assert session["community_posts"] == []
+    assert store.load_budget("alice") == backup["budget"]
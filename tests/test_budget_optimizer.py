@@ -0,0 +1,37 @@
+"""Sharing a monthly budget across the calculator categories."""
+import numpy as np
+import pytest
+
+from budget_optimizer import allocate, water_fill
+
+# Slider steps and maximums of the Expense Calculator categories
+STEPS = [50, 10, 25, 25, 10, 25]
+MAXIMUMS = [3000, 400, 500, 800, 300, 400]
+
+
+def test_water_fill_is_proportional_within_bounds():
+    amounts = water_fill(1000, [1, 1, 2], [0, 0, 0], [1000, 100, 1000])
+    assert amounts.tolist() == pytest.approx([300, 100, 600])
+    with pytest.raises(ValueError):
+        water_fill(5000, [1, 1, 2], [0, 0, 0], [1000, 100, 1000])
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_rounded_total_equals_the_target(seed):
+    rng = np.random.default_rng(seed)
+    for _ in range(100):
+        locked = rng.random(6) < 0.3
+        current = [step * rng.integers(0, top // step + 1) for step, top in zip(STEPS, MAXIMUMS)]
+        lows = np.where(locked, current, 0)
+        highs = np.where(locked, current, MAXIMUMS)
+        # Any on-grid amounts within the ranges add up to a reachable target
+        total = sum(rng.choice(np.arange(low, high + 1, step)) for low, high, step in zip(lows, highs, STEPS))
+        allocation = allocate(total, rng.integers(0, 11, 6), lows, highs, STEPS)
+        assert allocation.sum() == total
+        assert np.all(allocation % STEPS == lows % STEPS)
+        assert np.all((allocation >= lows) & (allocation <= highs))
+
+
+def test_unreachable_totals_stay_below_the_target():
+    allocation = allocate(1005, [1, 1], [0, 0], [1000, 1000], [10, 10])
+    assert allocation.sum() == 1000
@@ -0,0 +1,34 @@
+"""Monte Carlo cost simulation."""
+import numpy as np
+import pytest
+
+from budget_simulation import EMERGENCY_MONTHS, exceed_probability, percentiles, simulate_costs
+
+COSTS = ((900.0, 0.02), (300.0, 0.15), (0.0, 0.3), (150.0, 0.35))
+
+
+def test_means_match_the_inputs_plus_expected_shocks():
+    result = simulate_costs(COSTS, 0.05, 500.0, samples=50_000)
+    monthly, yearly = result["monthly"], result["yearly"]
+    assert np.all(np.diff(monthly) >= 0) and np.all(np.diff(yearly) >= 0)
+    assert monthly.mean() == pytest.approx(1350 + 0.05 * 500, rel=0.01)
+    assert yearly.mean() == pytest.approx(12 * (1350 + 0.05 * 500), rel=0.01)
+    # A category with no amount is never drawn
+    assert not result["category_ranges"][2].any()
+
+
+def test_results_are_cached_and_read_only():
+    result = simulate_costs(COSTS, 0.05, 500.0, samples=1000)
+    assert simulate_costs(COSTS, 0.05, 500.0, samples=1000) is result
+    with pytest.raises(ValueError):
+        result["yearly"][0] = 0
+
+
+def test_emergency_fund_and_budget_odds():
+    result = simulate_costs(COSTS, 0.0, 0.0, samples=20_000)
+    assert result["emergency_fund"] > EMERGENCY_MONTHS * 1350
+    low, median, high = percentiles(result["monthly"])
+    assert low < median < high
+    assert exceed_probability(result["monthly"], median) == pytest.approx(0.5, abs=0.01)
+    assert exceed_probability(result["monthly"], 0) == 1.0
+    assert exceed_probability(result["monthly"], 10 * high) == 0.0
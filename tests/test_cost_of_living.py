@@ -0,0 +1,55 @@
+"""Loading and querying the cost-of-living data file."""
+import json
+
+import pytest
+
+from cost_of_living import COST_OF_LIVING_FORMAT, SCHEMA_VERSION, CostOfLiving, CostOfLivingError
+
+
+def write_data(path, **overrides):
+    data = {
+        "format": COST_OF_LIVING_FORMAT,
+        "schema_version": SCHEMA_VERSION,
+        "data_version": "test",
+        "lifestyles": ["Budget", "Comfortable"],
+        "categories": ["rent", "food"],
+        "currencies": {"A": "USD", "B": "USD"},
+        "cities": [
+            {"country": "A", "city": "Alpha", "costs": {"Budget": [800, 300], "Comfortable": [1200, 450]}},
+            {"country": "B", "city": "Beta", "costs": {"Budget": [500, 350], "Comfortable": [900, 500]}},
+            {"country": "A", "city": "Gamma", "costs": {"Budget": [600, 200], "Comfortable": [1000, 300]}},
+        ],
+    }
+    data.update(overrides)
+    path.write_text(json.dumps(data))
+    return path
+
+
+def test_lookups_and_comparison(tmp_path):
+    table = CostOfLiving(write_data(tmp_path / "col.json"))
+    row = table.city_index("A", "Gamma")
+    assert table.city_costs(row, "Comfortable") == {"rent": 1000.0, "food": 300.0}
+    assert table.cities_in("A").tolist() == [0, 2]
+
+    rows, costs, totals = table.compare("Budget", "USD")
+    assert [table.cities[r] for r in rows] == ["Gamma", "Beta", "Alpha"]
+    assert totals.tolist() == [800.0, 850.0, 1100.0]
+    rows, _, _ = table.compare("Budget", "USD", max_total=1000, countries=["A"])
+    assert [table.cities[r] for r in rows] == ["Gamma"]
+    rows, _, _ = table.compare("Budget", "USD", sort_by="food", top=2)
+    assert [table.cities[r] for r in rows] == ["Gamma", "Alpha"]
+
+
+def test_rejects_other_versions_and_malformed_costs(tmp_path):
+    with pytest.raises(CostOfLivingError):
+        CostOfLiving(write_data(tmp_path / "old.json", schema_version=SCHEMA_VERSION + 1))
+    with pytest.raises(CostOfLivingError):
+        CostOfLiving(write_data(tmp_path / "bad.json", cities=[{"country": "A", "city": "Alpha", "costs": {}}]))
+    with pytest.raises(CostOfLivingError):
+        CostOfLiving(tmp_path / "missing.json")
+
+
+def test_bundled_file_loads():
+    table = CostOfLiving()
+    assert len(table.cities) >= 200
+    assert table.costs.shape == (len(table.cities), len(table.lifestyles), len(table.categories))
@@ -0,0 +1,54 @@
+"""Upgrade paths of the per-user data store."""
+import sqlite3
+
+from data_store import COLLECTIONS, UserDataStore
+
+
+def _v2_database(path):
+    """A database left by a v2 store that predates the newer collections"""
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute(
+            "CREATE TABLE expenses (id INTEGER PRIMARY KEY, username TEXT NOT NULL, date TEXT, "
+            "category TEXT, amount REAL, description TEXT, rev INTEGER NOT NULL DEFAULT 0)"
+        )
+        conn.execute(
+            "CREATE TABLE budgets (username TEXT NOT NULL, category TEXT NOT NULL, amount REAL NOT NULL, "
+            "rev INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (username, category))"
+        )
+        conn.execute(
+            "CREATE TABLE tombstones (username TEXT NOT NULL, collection TEXT NOT NULL, "
+            "record_id INTEGER NOT NULL, rev INTEGER NOT NULL)"
+        )
+        conn.execute("CREATE TABLE revision (value INTEGER NOT NULL)")
+        conn.execute("INSERT INTO revision (value) VALUES (7)")
+        # Created after the v2 upgrade by the old schema code, without a rev column
+        conn.execute(
+            "CREATE TABLE recurring_rules (id INTEGER PRIMARY KEY, username TEXT NOT NULL, "
+            "description TEXT, category TEXT, amount REAL)"
+        )
+        conn.execute("PRAGMA user_version = 2")
+    conn.close()
+
+
+def test_tables_added_after_v2_get_revisions(tmp_path):
+    path = tmp_path / "app_data.db"
+    _v2_database(path)
+    store = UserDataStore(path)
+
+    conn = sqlite3.connect(path)
+    for table in list(COLLECTIONS) + ["budgets"]:
+        assert "rev" in {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}, table
+    conn.close()
+
+    rule_id = store.add("alice", "recurring_rules", {"description": "Rent", "amount": 900.0})
+    store.add("alice", "budget_periods", {"category": "Food", "period": "Weekly", "amount": 50.0})
+    store.add("alice", "expense_groups", {"name": "Flat", "members": "[]", "currency": "EUR"})
+    assert [rule["id"] for rule in store.load("alice", "recurring_rules")] == [rule_id]
+    assert store.current_rev() == 10
+
+
+def test_new_database_has_revisions(tmp_path):
+    store = UserDataStore(tmp_path / "app_data.db")
+    store.add("alice", "shared_expenses", {"group_id": 1, "amount": 12.5, "split": "{}"})
+    assert store.current_rev() == 1
@@ -0,0 +1,56 @@
+"""Anomaly flags must not depend on how or when a row was scored."""
+from datetime import date, timedelta
+
+import numpy as np
+
+import expense_anomalies
+from expense_anomalies import detect_anomalies
+from expense_ledger import ExpenseLedger
+
+
+def _ledger(store, rows=400, seed=0):
+    rng = np.random.default_rng(seed)
+    start = date(2026, 1, 1)
+    categories = ["Food", "Travel", "Books"]
+    ledger = ExpenseLedger("alice", store=store).load()
+    ledger.extend([
+        {
+            "date": (start + timedelta(days=i // 3)).isoformat(),
+            "category": categories[i % 3],
+            "amount": float(np.round(rng.lognormal(3, 0.3), 2)),
+            "description": f"item {i}",
+        }
+        for i in range(rows)
+    ])
+    return ledger
+
+
+def _rescan(ledger):
+    expense_anomalies._anomalies.pop(ledger, None)
+    return detect_anomalies(ledger)
+
+
+def test_incremental_matches_full_scan(store):
+    ledger = _ledger(store)
+    detect_anomalies(ledger)
+    for amount in (500.0, 20.0, 900.0, 21.0, 19.0, 800.0):
+        ledger.extend([{"date": "2026-06-01", "category": "Food", "amount": amount, "description": "new"}])
+        incremental = detect_anomalies(ledger)
+        assert incremental == _rescan(ledger)
+    assert any(flag["ratio"] > 10 for flag in incremental["transactions"].values())
+
+
+def test_flags_ignore_other_categories(store):
+    ledger = _ledger(store)
+    for amount in (600.0, 25.0, 700.0):
+        ledger.extend([{"date": "2026-06-01", "category": "Books", "amount": amount, "description": "books"}])
+    books = [row for row in range(len(ledger)) if ledger.categories[ledger.category_codes[row]] == "Books"]
+
+    def books_flags():
+        flags = _rescan(ledger)["transactions"]
+        return {int(ledger.ids[row]): flags.get(int(ledger.ids[row])) for row in books}
+
+    before = books_flags()
+    assert any(before.values())
+    ledger.extend([{"date": "2026-01-01", "category": "Food", "amount": 30.0, "description": "lunch"}])
+    assert books_flags() == before
@@ -0,0 +1,42 @@
+"""Category suggestions learned from labeled expenses."""
+from expense_categorizer import MIN_TRAINING, ExpenseCategorizer
+
+TRAINING = [
+    ("Tesco groceries", 42.0, "Food"),
+    ("Lidl groceries weekly shop", 35.0, "Food"),
+    ("Coffee at cafe", 3.5, "Food"),
+    ("Metro monthly pass", 60.0, "Transport"),
+    ("Bus ticket", 2.0, "Transport"),
+    ("Train ticket home", 45.0, "Transport"),
+]
+
+
+def trained():
+    categorizer = ExpenseCategorizer(capacity=4)
+    categorizer.learn_many(*zip(*TRAINING))
+    return categorizer
+
+
+def test_suggests_the_category_of_similar_descriptions():
+    categorizer = trained()
+    assert categorizer.predict_many(["groceries", "Bus ticket to campus"], [30.0, 2.5]) == ["Food", "Transport"]
+
+
+def test_unknown_descriptions_and_small_histories_get_no_suggestion():
+    assert trained().suggest("Dentist appointment") is None
+    small = ExpenseCategorizer()
+    small.learn_many(*zip(*TRAINING[:MIN_TRAINING - 1]))
+    assert small.suggest("Tesco groceries", 42.0) is None
+
+
+def test_forget_undoes_learn():
+    categorizer = trained()
+    categorizer.learn("Textbook", 80.0, "Books")
+    assert categorizer.suggest("Textbook", 80.0) == "Books"
+    categorizer.forget("Textbook", 80.0, "Books")
+    assert len(categorizer) == len(TRAINING)
+    assert categorizer.suggest("Textbook", 80.0) is None
+
+
+def test_choices_limit_suggestions():
+    assert trained().suggest("groceries", 30.0, choices={"Transport", "Rent"}) != "Food"
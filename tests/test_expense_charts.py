@@ -0,0 +1,24 @@
+"""LTTB downsampling of long spending series."""
+import numpy as np
+
+from expense_charts import lttb
+
+
+def test_keeps_endpoints_and_order():
+    rng = np.random.default_rng(1)
+    x = np.arange(5000)
+    y = rng.gamma(2.0, 20.0, len(x))
+    kept = lttb(x, y, 400)
+    assert len(kept) == 400
+    assert kept[0] == 0 and kept[-1] == len(x) - 1
+    assert np.all(np.diff(kept) > 0)
+
+
+def test_keeps_a_single_spike():
+    y = np.ones(1000)
+    y[637] = 500.0
+    assert 637 in lttb(np.arange(1000), y, 50)
+
+
+def test_short_series_are_left_alone():
+    assert lttb(np.arange(10), np.ones(10), 400).tolist() == list(range(10))
@@ -0,0 +1,15 @@
+"""Spend forecasts for ledgers with unusual histories."""
+from datetime import date
+
+from expense_forecast import forecast_spend
+from expense_ledger import ExpenseLedger
+
+
+def test_only_recurring_expenses(store):
+    store.add_many("alice", "expenses", [
+        {"date": f"2026-{month:02d}-01", "category": "Rent", "amount": 900.0, "description": "Rent", "currency": "USD"}
+        for month in range(6, 11)
+    ])
+    ledger = ExpenseLedger("alice", store=store).load()
+    assert forecast_spend(ledger, date(2026, 10, 18)) == {"Rent": (900.0, 900.0)}
+    assert forecast_spend(ledger, date(2026, 10, 18), "Semester-end") == {"Rent": (3600.0, 5400.0)}
@@ -0,0 +1,43 @@
+"""Shared expense balances and settle-up transfers."""
+import random
+
+from expense_groups import ExpenseGroup, ExpenseGroups, settle_up, split_cents
+
+MEMBERS = ["ana", "ben", "chloe", "dev", "eli"]
+
+
+def test_uneven_split_sums_to_zero():
+    changes = split_cents(10.00, "ana", {"ana": 1, "ben": 1, "chloe": 1})
+    assert sum(changes.values()) == 0
+    assert sorted(changes.values()) == [-333, -333, 666]
+
+
+def test_balances_sum_to_zero_and_transfers_clear_them():
+    rng = random.Random(7)
+    group = ExpenseGroup(1, "Flat", MEMBERS, "EUR")
+    for _ in range(200):
+        split = {member: rng.choice([1, 1, 2]) for member in rng.sample(MEMBERS, rng.randint(1, len(MEMBERS)))}
+        group.apply({"amount": round(rng.uniform(0.01, 300), 2), "paid_by": rng.choice(MEMBERS), "split": split})
+        assert sum(group.balances.values()) == 0
+
+    transfers = settle_up(group.balances)
+    assert len(transfers) <= len(MEMBERS) - 1
+    remaining = dict(group.balances)
+    for debtor, creditor, cents in transfers:
+        assert cents > 0
+        remaining[debtor] += cents
+        remaining[creditor] -= cents
+    assert not any(remaining.values())
+
+
+def test_recorded_payments_settle_the_group(store):
+    groups = ExpenseGroups("ana", store=store).load()
+    group = groups.create("Trip", ["ana", "ben", "chloe"], "EUR")
+    groups.add_expense(group, "2026-10-01", "Hostel", 100.00, "ana", {"ana": 1, "ben": 1, "chloe": 1})
+    groups.add_expense(group, "2026-10-02", "Dinner", 45.50, "ben", {"ben": 1, "chloe": 1})
+    for payer, payee, amount in group.settle_up():
+        groups.record_payment(group, "2026-10-03", payer, payee, amount)
+    assert group.settle_up() == []
+
+    reloaded = ExpenseGroups("ana", store=store).load().groups[group.id]
+    assert not any(reloaded.balances.values())
@@ -0,0 +1,62 @@
+"""Incrementally maintained ledger totals match a ledger loaded from scratch."""
+import random
+from datetime import date, timedelta
+
+import pytest
+
+from expense_ledger import ExpenseLedger
+
+CATEGORIES = ["Food", "Food > Groceries", "Food > Cafes", "Rent", "Travel > Flights", "Books"]
+
+
+def random_expense(rng):
+    return {
+        "date": (date(2026, 1, 1) + timedelta(days=rng.randrange(300))).isoformat(),
+        "category": rng.choice(CATEGORIES),
+        "amount": round(rng.uniform(1, 400), 2),
+        "description": rng.choice(["Tesco", "Flat", "Flight home", "Textbook", ""]),
+        "currency": "USD",
+    }
+
+
+def assert_same_totals(live, fresh):
+    for name in ("month_totals", "category_totals", "subtree_totals"):
+        expected = {key: value for key, value in getattr(fresh, name).items() if abs(value) > 1e-6}
+        actual = {key: value for key, value in getattr(live, name).items() if abs(value) > 1e-6}
+        assert actual == pytest.approx(expected), name
+    assert live.total == pytest.approx(fresh.total)
+    for year, month in fresh.month_totals:
+        assert live.month(year, month) == pytest.approx(fresh.month(year, month))
+        assert live.subtree_month(year, month) == pytest.approx(fresh.subtree_month(year, month))
+    # Months emptied by edits and deletes are dropped rather than left at zero
+    assert set(live.month_totals) == set(fresh.month_totals)
+
+
+def test_aggregates_match_a_reload_after_edits_and_deletes(store):
+    rng = random.Random(3)
+    ledger = ExpenseLedger("alice", store=store).load()
+    ledger.extend([random_expense(rng) for _ in range(300)])
+    for _ in range(20):
+        ledger.add(random_expense(rng))
+    for expense_id in rng.sample(ledger.ids.tolist(), 120):
+        change = random_expense(rng)
+        fields = {field: change[field] for field in rng.sample(["date", "category", "amount"], rng.randint(1, 3))}
+        ledger.update(expense_id, **fields)
+    for expense_id in rng.sample(ledger.ids.tolist(), 150):
+        ledger.delete(expense_id)
+
+    fresh = ExpenseLedger("alice", store=store).load()
+    assert len(fresh) == len(ledger) == 170
+    assert_same_totals(ledger.aggregates, fresh.aggregates)
+    assert ledger.total() == pytest.approx(fresh.total())
+
+
+def test_deleting_everything_leaves_no_totals(store):
+    rng = random.Random(5)
+    ledger = ExpenseLedger("alice", store=store).load()
+    ledger.extend([random_expense(rng) for _ in range(50)])
+    for expense_id in ledger.ids.tolist():
+        ledger.delete(expense_id)
+    assert not ledger.aggregates.month_totals
+    assert ledger.aggregates.month(2026, 3) == {}
+    assert ledger.aggregates.total == pytest.approx(0, abs=1e-6)
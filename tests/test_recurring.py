@@ -0,0 +1,38 @@
+"""Posting recurring expenses that fell due."""
+from datetime import date
+
+import pytest
+
+import expense_ledger
+from recurring import post_due_expenses
+
+RULE = {"description": "Rent", "category": "Rent", "amount": 900.0, "currency": "USD",
+        "frequency": "monthly", "anchor_day": 31, "next_date": "2026-08-31"}
+
+
+def test_posts_every_due_occurrence_and_advances_the_rule(store):
+    store.add("alice", "recurring_rules", RULE)
+    assert post_due_expenses("alice", date(2026, 10, 18)) == 2
+    ledger = expense_ledger.get_ledger("alice")
+    assert sorted(record["date"] for record in ledger.records(range(len(ledger)))) == ["2026-08-31", "2026-09-30"]
+    assert store.load("alice", "recurring_rules")[0]["next_date"] == "2026-10-31"
+    assert post_due_expenses("alice", date(2026, 10, 18)) == 0
+
+
+def test_ledger_is_not_loaded_when_nothing_is_due(store):
+    store.add("alice", "recurring_rules", dict(RULE, next_date="2026-10-31"))
+    assert post_due_expenses("alice", date(2026, 10, 18)) == 0
+    assert expense_ledger._ledgers == {}
+
+
+def test_failed_rule_update_posts_nothing(store, monkeypatch):
+    store.add("alice", "recurring_rules", RULE)
+
+    def fail(*args):
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(store, "_update", fail)
+    with pytest.raises(RuntimeError):
+        post_due_expenses("alice", date(2026, 10, 18))
+    assert store.load("alice", "expenses") == []
+    assert store.load("alice", "recurring_rules")[0]["next_date"] == "2026-08-31"
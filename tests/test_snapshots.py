@@ -0,0 +1,83 @@
+"""Snapshot and restore round trips."""
+import sqlite3
+
+import pytest
+
+import snapshots
+from data_store import RestoreConflictError, UserDataStore
+
+
+@pytest.fixture(autouse=True)
+def snapshot_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshots, "SNAPSHOT_DIR", tmp_path / "snapshots")
+
+
+def _expense(description):
+    return {"date": "2026-10-01", "category": "Food", "amount": 5.0, "description": description, "currency": "USD"}
+
+
+def _descriptions(store, username="alice"):
+    return sorted(record["description"] for record in store.load(username, "expenses"))
+
+
+def test_restore_after_delete_and_re_add(store):
+    store.add("alice", "expenses", _expense("first"))
+    snapshots.create_snapshot("alice", full=True)
+    second = store.add("alice", "expenses", _expense("second"))
+    store.delete("alice", "expenses", second)
+    third = store.add("alice", "expenses", _expense("third"))
+    assert third != second
+    snapshots.create_snapshot("alice")
+
+    snapshots.restore_latest("alice")
+    assert _descriptions(store) == ["first", "third"]
+
+
+def test_delta_deletes_apply_before_upserts(store):
+    # A deleted id that is live again, as legacy tables without AUTOINCREMENT allowed
+    snapshots.create_snapshot("alice", full=True)
+    store.apply_changes("alice", [("expenses", "upsert", [dict(_expense("old"), id=7)])])
+    store.delete("alice", "expenses", 7)
+    store.apply_changes("alice", [("expenses", "upsert", [dict(_expense("new"), id=7)])])
+    with store._connection() as conn:
+        conn.execute("UPDATE expenses SET rev = (SELECT value FROM revision) + 1")
+        conn.execute("UPDATE revision SET value = value + 1")
+    snapshots.create_snapshot("alice")
+
+    snapshots.restore_latest("alice")
+    assert _descriptions(store) == ["new"]
+
+
+def test_legacy_tables_stop_reusing_ids(tmp_path):
+    path = tmp_path / "app_data.db"
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute(
+            "CREATE TABLE expenses (id INTEGER PRIMARY KEY, username TEXT NOT NULL, date TEXT, "
+            "category TEXT, amount REAL, description TEXT)"
+        )
+        conn.execute("INSERT INTO expenses (id, username, description) VALUES (1, 'alice', 'kept'), (2, 'alice', 'gone')")
+        conn.execute("DELETE FROM expenses WHERE id = 2")
+        conn.execute("INSERT INTO expenses (id, username, description) VALUES (2, 'alice', 'gone')")
+    conn.close()
+    store = UserDataStore(path)
+    store.delete("alice", "expenses", 2)
+    assert store.add("alice", "expenses", _expense("new")) == 3
+    assert _descriptions(store) == ["kept", "new"]
+
+
+def test_restore_fails_when_an_id_belongs_to_another_user(store):
+    bob_id = store.add("bob", "expenses", _expense("bob's"))
+    with pytest.raises(RestoreConflictError):
+        store.apply_changes("alice", [("expenses", "upsert", [dict(_expense("alice's"), id=bob_id)])])
+    assert _descriptions(store, "bob") == ["bob's"]
+    assert _descriptions(store) == []
+
+
+def test_user_directories_are_distinct_and_contained():
+    assert snapshots._user_dir("a b") != snapshots._user_dir("a_b")
+    assert snapshots._user_dir("../x").parent == snapshots.SNAPSHOT_DIR
+    for name in (".", "..", ""):
+        with pytest.raises(snapshots.SnapshotError):
+            snapshots._user_dir(name)
+    assert snapshots.list_snapshots("..") == []
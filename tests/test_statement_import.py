@@ -0,0 +1,35 @@
+"""Statement imports against an existing ledger."""
+import io
+
+from expense_ledger import ExpenseLedger
+from statement_import import import_statement
+
+COLUMNS = {"date": "Date", "amount": "Amount", "description": "Description", "category": "Category"}
+STATEMENT = (
+    "Date,Amount,Description,Category\n"
+    "2026-10-01,-2.50,Bus fare,Travel\n"
+    "2026-10-01,-2.50,Bus fare,Travel\n"
+    "2026-10-02,-40.00,Groceries,Food\n"
+).encode()
+
+
+def _import(ledger):
+    return import_statement(ledger, io.BytesIO(STATEMENT), "csv", COLUMNS)
+
+
+def test_repeated_rows_in_one_file_are_all_imported(store):
+    ledger = ExpenseLedger("alice", store=store).load()
+    stats = _import(ledger)
+    assert stats["imported"] == 3 and stats["duplicates"] == 0
+    assert ledger.total() == 45.0
+
+
+def test_rows_already_in_the_ledger_are_skipped(store):
+    ledger = ExpenseLedger("alice", store=store).load()
+    ledger.extend([{"date": "2026-10-01", "category": "Travel", "amount": 2.5, "description": "Bus fare"}])
+    stats = _import(ledger)
+    assert stats["imported"] == 2 and stats["duplicates"] == 1
+
+    stats = _import(ledger)
+    assert stats["imported"] == 0 and stats["duplicates"] == 3
+    assert len(ledger) == 3
@@ -0,0 +1,26 @@
+"""Both user account backends implement the same repository interface."""
+import pytest
+
+from utils import JsonUserRepository, SQLiteUserRepository, UserRepository
+
+
+def test_repository_must_implement_every_method():
+    class Partial(UserRepository):
+        def get_user(self, username):
+            return None
+
+    with pytest.raises(TypeError):
+        Partial()
+
+
+@pytest.mark.parametrize("make", [
+    lambda tmp_path: JsonUserRepository(tmp_path / "users.json"),
+    lambda tmp_path: SQLiteUserRepository(tmp_path / "users.db", legacy_file=None),
+])
+def test_add_get_and_update_user(make, tmp_path):
+    repository = make(tmp_path)
+    assert repository.add_user("alice", "hash1")
+    assert not repository.add_user("alice", "hash2")
+    repository.update_password("alice", "hash3")
+    assert repository.get_user("alice")["password"] == "hash3"
+    assert repository.get_user("bob") is None